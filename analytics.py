@@ -0,0 +1,293 @@
+"""Dependency analysis over a board's connections.
+
+A connection A -> B means B depends on A. DependencyAnalytics keeps, and
+updates edge by edge as the board changes:
+
+- a topological order of the shapes (Pearce-Kelly: an added edge only
+  reorders the shapes between its two ends),
+- the connections that close a cycle, which are left out of the order,
+- for every shape, how many of its predecessors are unfinished, so
+  "blocked" is a lookup,
+- the longest chain of unfinished tasks ending at every shape, from which
+  the critical path is read off; a change only re-walks the shapes
+  downstream of it.
+
+Everything is built from scratch only after the board is replaced (see
+invalidate). No Qt dependency.
+"""
+from collections import deque
+import heapq
+import itertools
+
+DONE = "Done"
+
+
+class DependencyAnalytics:
+    def __init__(self, graph, shapes):
+        self.graph = graph  # GraphIndex
+        self.shapes = shapes  # {uid: shape} registry of the scene
+        self.stale = True
+        self.order = {}  # shape -> position in the topological order
+        self.cycle_edges = set()  # Connections closing a cycle, left out of the order
+        self.status = {}  # shape -> status as last seen
+        self.unfinished = {}  # shape -> number of unfinished predecessors
+        self.length = {}  # shape -> unfinished tasks on the longest chain ending at it
+        self.via = {}  # shape -> previous shape on that chain
+        self._critical_path = None
+        self._counter = itertools.count()
+
+    def invalidate(self):
+        """Rebuild from scratch on the next query (after the board was replaced)"""
+        self.stale = True
+
+    def ensure(self):
+        if self.stale:
+            self.rebuild()
+
+    def rebuild(self):
+        shapes = list(self.shapes.values())
+        self.status = {shape: shape.status for shape in shapes}
+        self.cycle_edges = set()
+
+        # Depth-first topological sort; edges back into the current path close a cycle
+        order = []
+        state = {}  # shape -> 1 while on the path, 2 when done
+        for root in shapes:
+            if root in state:
+                continue
+            state[root] = 1
+            stack = [(root, iter(self.graph.out_edges.get(root, {}).items()))]
+            while stack:
+                shape, children = stack[-1]
+                for child, connection in children:
+                    child_state = state.get(child)
+                    if child_state == 1:
+                        self.cycle_edges.add(connection)
+                    elif child_state is None:
+                        state[child] = 1
+                        stack.append((child, iter(self.graph.out_edges.get(child, {}).items())))
+                        break
+                else:
+                    stack.pop()
+                    state[shape] = 2
+                    order.append(shape)
+        order.reverse()
+        self.order = {shape: position for position, shape in enumerate(order)}
+        self._counter = itertools.count(len(order))
+
+        self.unfinished = dict.fromkeys(shapes, 0)
+        for shape in shapes:
+            if self.status[shape] != DONE:
+                for child in self.graph.successors(shape):
+                    self.unfinished[child] += 1
+
+        self.length = {}
+        self.via = {}
+        for shape in order:
+            self._update_length(shape)
+        self._critical_path = None
+        self.stale = False
+
+    # Board changes
+
+    def shape_added(self, shape):
+        if self.stale:
+            return
+        self.order[shape] = next(self._counter)  # No edges yet, so last is fine
+        self.status[shape] = shape.status
+        self.unfinished[shape] = 0
+        self._update_length(shape)
+        self._critical_path = None
+
+    def shape_removed(self, shape):
+        """Called after all of the shape's connections were removed"""
+        if self.stale:
+            return
+        for table in (self.order, self.status, self.unfinished, self.length, self.via):
+            table.pop(shape, None)
+        self._critical_path = None
+
+    def edge_added(self, connection):
+        if self.stale:
+            return
+        start, end = connection.start_item, connection.end_item
+        if self.status[start] != DONE:
+            self.unfinished[end] += 1
+        if self._insert(connection):
+            self._propagate([end])
+        else:
+            self.cycle_edges.add(connection)
+
+    def edge_removed(self, connection):
+        if self.stale:
+            return
+        start, end = connection.start_item, connection.end_item
+        if self.status.get(start) != DONE and end in self.unfinished:
+            self.unfinished[end] -= 1
+        if connection in self.cycle_edges:
+            self.cycle_edges.discard(connection)
+            return
+        if end in self.order:
+            self._propagate([end])
+        # Without this edge, some cycle may be broken
+        for cycle_edge in list(self.cycle_edges):
+            if self._insert(cycle_edge):
+                self.cycle_edges.discard(cycle_edge)
+                self._propagate([cycle_edge.end_item])
+
+    def status_changed(self, shape):
+        if self.stale or shape not in self.status:
+            return
+        old, new = self.status[shape], shape.status
+        self.status[shape] = new
+        if (old == DONE) == (new == DONE):
+            return
+        delta = 1 if old == DONE else -1
+        for child in self.graph.successors(shape):
+            self.unfinished[child] += delta
+        self._propagate([shape])
+
+    # Queries
+
+    def is_blocked(self, shape):
+        """An unfinished task with at least one unfinished predecessor"""
+        self.ensure()
+        return self.unfinished.get(shape, 0) > 0 and self.status.get(shape) != DONE
+
+    def blocked_shapes(self):
+        self.ensure()
+        return [shape for shape, count in self.unfinished.items() if count and self.status[shape] != DONE]
+
+    def topological_order(self):
+        """Shapes so that every connection outside cycle_edges points forward"""
+        self.ensure()
+        return sorted(self.order, key=self.order.get)
+
+    def cycles(self):
+        """One connection per cycle that closes it"""
+        self.ensure()
+        return list(self.cycle_edges)
+
+    def downstream(self, shape):
+        """Every shape that depends on shape, directly or not"""
+        return self._reach(shape, self.graph.successors)
+
+    def upstream(self, shape):
+        """Every shape shape depends on, directly or not"""
+        return self._reach(shape, self.graph.predecessors)
+
+    def reaches(self, start, end):
+        """Whether end depends on start"""
+        self.ensure()
+        if not self.cycle_edges and self.order[start] > self.order[end]:
+            return False
+        limit = self.order[end]
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            shape = queue.popleft()
+            for child in self.graph.successors(shape):
+                if child is end:
+                    return True
+                # Without cycles, nothing after end in the order leads back to it
+                if child not in seen and (self.cycle_edges or self.order[child] < limit):
+                    seen.add(child)
+                    queue.append(child)
+        return False
+
+    def critical_path(self):
+        """The longest chain of unfinished tasks, first task first"""
+        self.ensure()
+        if self._critical_path is None:
+            path = []
+            if self.length:
+                shape = max(self.length, key=self.length.get)
+                if self.length[shape] > 0:
+                    while shape is not None:
+                        path.append(shape)
+                        shape = self.via.get(shape)
+            path.reverse()
+            self._critical_path = path
+        return self._critical_path
+
+    # Internals
+
+    def _weight(self, shape):
+        return 0 if self.status[shape] == DONE else 1
+
+    def _forward(self, connection):
+        return connection not in self.cycle_edges
+
+    def _update_length(self, shape):
+        """Recompute a shape's chain length from its predecessors; True if it changed"""
+        best, best_via = 0, None
+        for parent, connection in self.graph.in_edges.get(shape, {}).items():
+            if self._forward(connection) and self.length.get(parent, 0) > best:
+                best, best_via = self.length[parent], parent
+        length = best + self._weight(shape)
+        changed = self.length.get(shape) != length or self.via.get(shape) is not best_via
+        self.length[shape] = length
+        self.via[shape] = best_via
+        return changed
+
+    def _propagate(self, shapes):
+        """Recompute chain lengths from shapes onwards, in topological order, while they change"""
+        heap = [(self.order[shape], next(self._counter), shape) for shape in shapes]
+        heapq.heapify(heap)
+        queued = set(shapes)
+        while heap:
+            _, _, shape = heapq.heappop(heap)
+            queued.discard(shape)
+            if not self._update_length(shape):
+                continue
+            self._critical_path = None
+            for child, connection in self.graph.out_edges.get(shape, {}).items():
+                if self._forward(connection) and child not in queued:
+                    queued.add(child)
+                    heapq.heappush(heap, (self.order[child], next(self._counter), child))
+
+    def _insert(self, connection):
+        """Fit a new edge into the order (Pearce-Kelly); False if it closes a cycle"""
+        start, end = connection.start_item, connection.end_item
+        lower, upper = self.order[end], self.order[start]
+        if lower > upper:
+            return True
+
+        # Shapes after end that come no later than start; reaching start means a cycle
+        forward = self._search(end, self.graph.out_edges, lambda shape: self.order[shape] <= upper, start)
+        if forward is None:
+            return False
+        backward = self._search(start, self.graph.in_edges, lambda shape: self.order[shape] >= lower)
+
+        # Reuse their positions: everything start needs first, then everything after end
+        shapes = sorted(backward, key=self.order.get) + sorted(forward, key=self.order.get)
+        positions = sorted(self.order[shape] for shape in shapes)
+        for shape, position in zip(shapes, positions):
+            self.order[shape] = position
+        return True
+
+    def _search(self, origin, edges, inside, stop=None):
+        """Shapes reachable from origin over forward edges while inside(); None if stop is reached"""
+        seen = {origin}
+        stack = [origin]
+        while stack:
+            shape = stack.pop()
+            for other, connection in edges.get(shape, {}).items():
+                if not self._forward(connection):
+                    continue
+                if other is stop:
+                    return None
+                if other not in seen and inside(other):
+                    seen.add(other)
+                    stack.append(other)
+        return seen
+
+    def _reach(self, shape, neighbors):
+        seen = set()
+        queue = deque([shape])
+        while queue:
+            for other in neighbors(queue.popleft()):
+                if other not in seen and other is not shape:
+                    seen.add(other)
+                    queue.append(other)
+        return seen
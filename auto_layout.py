@@ -0,0 +1,164 @@
+from PyQt6.QtCore import QObject, QThread, QTimer, pyqtSignal
+
+from layout import LayoutCancelled, compute_layout
+from shapes import FrameShape
+
+ANIMATE_MAX = 500  # Boards with more shapes jump straight to the result
+ANIMATION_STEPS = 12
+ANIMATION_INTERVAL_MS = 16
+
+
+class _LayoutThread(QThread):
+    """Runs compute_layout on plain arrays off the GUI thread"""
+    def __init__(self, boxes, is_frame, edges, algorithm, parent=None):
+        super().__init__(parent)
+        self.boxes = boxes
+        self.is_frame = is_frame
+        self.edges = edges
+        self.algorithm = algorithm
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = compute_layout(self.boxes, self.is_frame, self.edges, self.algorithm, self._check)
+        except LayoutCancelled:
+            pass
+        except (ValueError, MemoryError) as e:
+            self.error = str(e)
+
+    def _check(self):
+        if self.isInterruptionRequested():
+            raise LayoutCancelled()
+
+
+class AutoLayout(QObject):
+    """Rearranges a TaskScene with one of the algorithms in layout.py.
+
+    Only the snapshot of shape boxes and connections is taken on the GUI
+    thread. The result is applied through TaskScene.move_shapes, in one
+    update or, on small boards, as a short animation; shapes deleted in the
+    meantime are skipped and shapes added in the meantime stay where they are.
+    """
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, scene, algorithm):
+        super().__init__(scene)
+        self.scene = scene
+        self.algorithm = algorithm
+        self._shapes = []
+        self._thread = None
+        self._running = False
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(ANIMATION_INTERVAL_MS)
+        self._timer.timeout.connect(self._animate)
+        self._step = 0
+        self._start_boxes = None
+        self._end_boxes = None
+        self._changing = False  # An undo step is open on the scene (see TaskScene.begin_change)
+
+    def start(self):
+        scene = self.scene
+        scene.flush_connections()
+        self._shapes = [scene.shapes_by_id[uid] for uid in sorted(scene.shapes_by_id)]
+        index = {shape: i for i, shape in enumerate(self._shapes)}
+        boxes = [self._box(shape) for shape in self._shapes]
+        is_frame = [isinstance(shape, FrameShape) for shape in self._shapes]
+        edges = [(index[connection.start_item], index[connection.end_item])
+                 for connection in scene.connections_by_id.values()]
+
+        self._running = True
+        self._thread = _LayoutThread(boxes, is_frame, edges, self.algorithm, self)
+        self._thread.finished.connect(self._on_computed)
+        self._thread.start()
+
+    def is_running(self):
+        return self._running
+
+    def cancel(self):
+        """Stop without moving anything further"""
+        if not self._running:
+            return
+        self._running = False
+        self._timer.stop()
+        self._thread.requestInterruption()
+        self._thread.wait()
+        self._end_change()  # What moved so far is undone as one step
+        self.cancelled.emit()
+        self._release()
+
+    def _release(self):
+        """Done: drop the snapshot of the board and let Qt delete the layouter and its thread"""
+        self._shapes = []
+        self._start_boxes = None
+        self._end_boxes = None
+        self._thread.deleteLater()
+        self.deleteLater()
+
+    def _box(self, shape):
+        outline = shape.outline()
+        pos = shape.scenePos()
+        return (pos.x() + outline.cx - outline.rx, pos.y() + outline.cy - outline.ry, 2 * outline.rx, 2 * outline.ry)
+
+    def _on_computed(self):
+        thread = self._thread
+        if not self._running:
+            return
+        if thread.error is not None or thread.result is None:
+            self._running = False
+            self.failed.emit(thread.error or "Layout stopped")
+            self._release()
+            return
+
+        # Only shapes still on the board; the scene may have changed while computing
+        alive = [i for i, shape in enumerate(self._shapes) if self.scene.shapes_by_id.get(shape.uid) is shape]
+        self._shapes = [self._shapes[i] for i in alive]
+        self._start_boxes = [self._box(shape) for shape in self._shapes]
+        self._end_boxes = thread.result[alive].tolist()
+        # The whole layout is one undo step; frames change size as well as position
+        self.scene.begin_change("Auto Layout", [shape for shape in self._shapes if isinstance(shape, FrameShape)])
+        self._changing = True
+        if len(self._shapes) > ANIMATE_MAX:
+            self._step = ANIMATION_STEPS - 1
+            self._animate()
+        else:
+            self._step = 0
+            self._timer.start()
+
+    def _animate(self):
+        self._step += 1
+        t = self._step / ANIMATION_STEPS
+        t = t * t * (3 - 2 * t)  # Ease in and out
+        positions = {}
+        for shape, start, end in zip(self._shapes, self._start_boxes, self._end_boxes):
+            box = [a + (b - a) * t for a, b in zip(start, end)]
+            if isinstance(shape, FrameShape):
+                # Frames grow or shrink around their members; their rect starts at the origin again
+                shape.setRect(0, 0, box[2], box[3])
+                self.scene.schedule_connection_update(shape)
+            else:
+                outline = shape.outline()
+                box[0] -= outline.cx - outline.rx
+                box[1] -= outline.cy - outline.ry
+            positions[shape] = (box[0], box[1])
+        self.scene.move_shapes(positions)
+
+        if self._step >= ANIMATION_STEPS:
+            self._timer.stop()
+            self._running = False
+            for shape, start, end in zip(self._shapes, self._start_boxes, self._end_boxes):
+                if isinstance(shape, FrameShape) and list(start[2:]) != end[2:]:
+                    self.scene.shape_changed(shape)  # Saves and journals the new size
+            self._end_change()
+            # Fit the scene to the new layout, larger or smaller than the old one
+            self.scene.fit_scene_rect()
+            self.finished.emit()
+            self._release()
+
+    def _end_change(self):
+        if self._changing:
+            self._changing = False
+            self.scene.end_change()
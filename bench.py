@@ -0,0 +1,346 @@
+"""Microbenchmarks for hot paths.
+
+    python bench.py            # run everything
+    python bench.py paint      # run one benchmark
+
+Runs offscreen, so it works without a display.
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication, QStyleOptionGraphicsItem
+from PyQt6.QtGui import QImage, QPainter, QColor
+
+from shapes import RectangleShape, CircleShape, DiamondShape, TriangleShape, FrameShape, _build_body_style
+from render_cache import render_cache
+
+
+def timed(func, repeat=5):
+    """Best wall time of several runs, in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def make_shapes(count):
+    classes = (RectangleShape, CircleShape, DiamondShape, TriangleShape, FrameShape)
+    statuses = ("Todo", "In Progress", "Done")
+    shapes = []
+    for i in range(count):
+        shape = classes[i % len(classes)](0, 0)
+        shape.status = statuses[i % len(statuses)]
+        if i % 7 == 0:
+            shape.custom_bg_color = QColor("#336699")
+        shapes.append(shape)
+    return shapes
+
+
+def bench_paint(count=500, scale=1.0, label="paint", cached=True):
+    """Per-item cost of TaskShape.paint at a given zoom, with or without render cache hits"""
+    shapes = make_shapes(count)
+    image = QImage(400, 300, QImage.Format.Format_ARGB32_Premultiplied)
+    option = QStyleOptionGraphicsItem()
+    painter = QPainter(image)
+    painter.scale(scale, scale)
+
+    def run():
+        if not cached:
+            render_cache.clear()
+        for shape in shapes:
+            painter.save()
+            shape.paint(painter, option, None)
+            painter.restore()
+
+    elapsed = timed(run, repeat=10)
+    painter.end()
+    print("%s: %.1f us per item (%d items)" % (label, elapsed / count * 1e6, count))
+
+
+def bench_paint_uncached(count=500):
+    render_cache.reset_stats()
+    bench_paint(count, label="paint, cache misses", cached=False)
+    print("render cache:", render_cache.stats())
+
+
+def bench_paint_zoomed_out(count=500):
+    bench_paint(count, scale=0.5, label="paint at 50%")
+    bench_paint(count, scale=0.2, label="paint at 20%")
+
+
+def bench_paint_style(count=2000):
+    """Per-item cost of picking brush and pen: shared styles (TaskShape.setup_body)
+    against a new pen and brush for every shape on every paint, as before they were shared"""
+    shapes = [shape for shape in make_shapes(count) if not isinstance(shape, FrameShape)]
+    image = QImage(1, 1, QImage.Format.Format_ARGB32_Premultiplied)
+    painter = QPainter(image)
+
+    def run_shared():
+        for shape in shapes:
+            shape.setup_body(painter, 1.0)
+
+    def run_per_shape():
+        for shape in shapes:
+            brush, pen = _build_body_style(shape.STYLE.base_color, shape.status,
+                                           shape.custom_bg_color, shape.isSelected())
+            painter.setBrush(brush)
+            painter.setPen(pen)
+
+    shared = timed(run_shared, repeat=20)
+    per_shape = timed(run_per_shape, repeat=20)
+    painter.end()
+    print("paint style: %.2f us per item shared, %.2f us built per shape, %.1fx (%d items)"
+          % (shared / len(shapes) * 1e6, per_shape / len(shapes) * 1e6, per_shape / shared, len(shapes)))
+
+
+def bench_drag(count=2000):
+    """One drag step of count selected shapes, each connected to the next"""
+    from canvas import TaskScene
+    scene = TaskScene()
+    shapes = []
+    for i, shape in enumerate(make_shapes(count)):
+        shape.setPos((i % 50) * 200, (i // 50) * 200)
+        scene.addItem(shape)
+        if shapes:
+            scene.add_connection(shapes[-1], shape)
+        shapes.append(shape)
+
+    def run():
+        for shape in shapes:
+            shape.moveBy(3, 2)
+        scene.flush_connections()
+
+    elapsed = timed(run)
+    print("drag: %.1f ms per step (%d shapes, %d connections)" % (elapsed * 1e3, count, count - 1))
+
+
+def bench_edge_points(count=20000):
+    """Connection anchor points: one get_edge_point call at a time, then as one batch"""
+    import random
+    from PyQt6.QtCore import QPointF
+    import geometry
+    random.seed(0)
+    shapes = make_shapes(100)
+    pairs = [(random.choice(shapes), QPointF(random.uniform(-500, 500), random.uniform(-500, 500)))
+             for _ in range(count)]
+
+    elapsed = timed(lambda: [shape.get_edge_point(target) for shape, target in pairs])
+    print("get_edge_point: %.2f us per call" % (elapsed / count * 1e6))
+    if hasattr(geometry, "edge_points"):
+        elapsed = timed(lambda: geometry.edge_points(pairs))
+        print("edge_points batch: %.2f us per pair (%d pairs)" % (elapsed / count * 1e6, count))
+
+
+def bench_layout(count=5000):
+    """Auto-layout of a board where every task depends on one or two earlier ones"""
+    import random
+    import layout
+    random.seed(0)
+    boxes = [(random.uniform(0, 5000), random.uniform(0, 5000), 150, 80) for _ in range(count)]
+    edges = [(random.randrange(max(0, i - 50), i), i) for i in range(1, count) for _ in range(random.choice((1, 2)))]
+    for algorithm in (layout.LAYERED, layout.FORCE):
+        elapsed = timed(lambda: layout.compute_layout(boxes, [False] * count, edges, algorithm), repeat=1)
+        print("layout %s: %.2f s (%d shapes, %d connections)" % (algorithm, elapsed, count, len(edges)))
+
+
+def bench_routing(count=2000):
+    """Routing every connection of a gridded board, then only those a moved shape affects"""
+    import random
+    from routing import BoxIndex, route_edge
+    random.seed(0)
+    columns = 50
+    obstacles = BoxIndex()
+    for i in range(count):
+        x, y = (i % columns) * 250 + random.uniform(0, 60), (i // columns) * 180 + random.uniform(0, 60)
+        obstacles.insert(i, (x, y, x + 150, y + 80))
+    edges = [(i, random.randrange(max(0, i - 2 * columns), i)) for i in range(1, count)]
+    areas = BoxIndex()
+
+    def route_all():
+        for key, (start, end) in enumerate(edges):
+            areas.insert(key, route_edge(obstacles, obstacles.boxes[start], obstacles.boxes[end], (start, end))[1])
+
+    elapsed = timed(route_all, repeat=1)
+    print("routing: %.2f s (%d shapes, %d connections)" % (elapsed, count, len(edges)))
+
+    x1, y1, x2, y2 = obstacles.boxes[count // 2]
+    obstacles.insert(count // 2, (x1 + 100, y1 + 60, x2 + 100, y2 + 60))
+    affected = areas.query((x1, y1, x2 + 100, y2 + 60))
+    elapsed = timed(lambda: [route_edge(obstacles, obstacles.boxes[edges[key][0]], obstacles.boxes[edges[key][1]],
+                                        edges[key]) for key in affected])
+    print("routing after one move: %.1f ms (%d of %d connections)" % (elapsed * 1000, len(affected), len(edges)))
+
+
+def bench_snapping(count=50000):
+    """One smart-guide lookup on a large board, and one shape moving in the index"""
+    import random
+    from snapping import AlignmentIndex
+    random.seed(0)
+    index = AlignmentIndex()
+    boxes = {}
+    for i in range(count):
+        x, y = random.uniform(0, 50000), random.uniform(0, 50000)
+        boxes[i] = (x, y, x + 150, y + 80)
+    print("snapping index: %.1f ms to build (%d shapes)" % (timed(lambda: index.update(boxes), repeat=1) * 1000, count))
+
+    probes = [(x + 3, y - 5, x + 153, y + 75) for x, y, _, _ in random.sample(list(boxes.values()), 1000)]
+    elapsed = timed(lambda: [index.snap(box, 8, (i,)) for i, box in enumerate(probes)])
+    print("snapping lookup: %.1f us per drag step" % (elapsed / len(probes) * 1e6))
+
+    elapsed = timed(lambda: [index.insert(i, (x + 1, y, x + 151, y + 80)) for i, (x, y, _, _) in enumerate(probes)])
+    print("snapping move: %.1f us per shape" % (elapsed / len(probes) * 1e6))
+
+
+def bench_virtual(count=200000):
+    """Opening a board too large for one item per task, then panning across it"""
+    import tracemalloc
+    from canvas import TaskCanvas
+    columns = int(count ** 0.5)
+    data = {
+        "shapes": [{"id": i, "type": "RectangleShape", "x": (i % columns) * 220.0, "y": (i // columns) * 160.0,
+                    "title": "Task %d" % i, "status": "Todo"} for i in range(count)],
+        "connections": [{"id": count + i, "start": i - 1, "end": i} for i in range(1, count)],
+        "descriptions": {},
+    }
+    view = TaskCanvas()
+    view.resize(1200, 900)
+    scene = view.scene
+    elapsed = timed(lambda: scene.load_board_data(data), repeat=1)
+    tracemalloc.start()
+    scene.load_board_data(data)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print("virtual load: %.2f s, %d bytes per task (%d tasks, %d items)" % (
+        elapsed, memory / count, count, len(scene.shapes_by_id)))
+
+    def pan():
+        for step in range(20):
+            view.centerOn(step * 400, step * 300)
+            scene.update_viewport()
+
+    elapsed = timed(pan)
+    print("virtual pan: %.1f ms per step (%d items)" % (elapsed / 20 * 1000, len(scene.shapes_by_id)))
+
+
+def _rss():
+    """Resident memory of this process in bytes, None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def bench_memory(count=10000):
+    """Memory held per 10k shapes of each type: Python objects (tracemalloc) and resident size"""
+    import gc
+    import tracemalloc
+    shapes = [RectangleShape(0, 0) for _ in range(count)]  # Warm up the allocators, so the first type is not charged for them
+    del shapes
+    for cls in (RectangleShape, CircleShape, DiamondShape, TriangleShape, FrameShape):
+        gc.collect()
+        rss = _rss()
+        tracemalloc.start()
+        shapes = [cls(i, i) for i in range(count)]
+        traced = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        resident = "n/a" if rss is None else "%.1f MB" % ((_rss() - rss) * 10000 / count / 2 ** 20)
+        print("memory %s: %.2f MB Python, %s resident per 10k shapes" % (
+            cls.__name__, traced * 10000 / count / 2 ** 20, resident))
+        del shapes
+
+
+def bench_paged(count=200000):
+    """Opening a tiled board, then panning across it under a small memory cap"""
+    import tempfile
+    from canvas import TaskCanvas
+    from tiled_board import RECORD_BYTES, write_tiled
+    columns = int(count ** 0.5)
+    data = {
+        "shapes": [{"id": i, "type": "RectangleShape", "x": (i % columns) * 220.0, "y": (i // columns) * 160.0,
+                    "title": "Task %d" % i, "status": "Todo"} for i in range(count)],
+        "connections": [{"id": count + i, "start": i - 1, "end": i} for i in range(1, count)],
+        "descriptions": {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "board.ssjt")
+        write_tiled(data, filename)
+        view = TaskCanvas()
+        view.resize(1200, 900)
+        scene = view.scene
+        cap = 5000 * RECORD_BYTES
+        elapsed = timed(lambda: scene.open_tiled(filename, cap), repeat=1)
+        print("paged open: %.3f s (%d tasks on disk, %d in memory)" % (elapsed, count, len(scene.model)))
+
+        loaded = []
+
+        def pan():
+            for step in range(20):
+                view.centerOn(step * 1500, step * 1100)
+                scene.update_viewport()
+                loaded.append(len(scene.model))
+
+        elapsed = timed(pan)
+        print("paged pan: %.1f ms per step (at most %d tasks in memory, cap %d)" % (
+            elapsed / 20 * 1000, max(loaded), cap // RECORD_BYTES))
+        scene.clear()
+
+
+def bench_undo(count=5000):
+    """Deleting count connected shapes, then undoing and redoing that as one step each"""
+    from PyQt6.QtCore import QEvent, Qt
+    from PyQt6.QtGui import QKeyEvent
+    from canvas import TaskScene
+    scene = TaskScene()
+    shapes = []
+    for i, shape in enumerate(make_shapes(count)):
+        shape.setPos((i % 50) * 400, (i // 50) * 300)
+        scene.addItem(shape)
+        if shapes:
+            scene.add_connection(shapes[-1], shape)
+        shapes.append(shape)
+    scene.flush_connections()
+    for shape in shapes:
+        shape.setSelected(True)
+    start = time.perf_counter()
+    scene.keyPressEvent(QKeyEvent(QEvent.Type.KeyPress, Qt.Key.Key_Delete, Qt.KeyboardModifier.NoModifier))
+    delete = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scene.undo()
+    undo = time.perf_counter() - start
+    start = time.perf_counter()
+    scene.redo()
+    redo = time.perf_counter() - start
+    print("undo: delete %.0f ms, undo %.0f ms, redo %.0f ms (%d shapes, %d connections, %.1f MB of history)" % (
+        delete * 1e3, undo * 1e3, redo * 1e3, count, count - 1, scene.history.size / 2 ** 20))
+
+
+BENCHMARKS = {
+    "paint": bench_paint,
+    "paint_uncached": bench_paint_uncached,
+    "paint_style": bench_paint_style,
+    "paint_zoomed_out": bench_paint_zoomed_out,
+    "drag": bench_drag,
+    "edge_points": bench_edge_points,
+    "layout": bench_layout,
+    "routing": bench_routing,
+    "snapping": bench_snapping,
+    "memory": bench_memory,
+    "virtual": bench_virtual,
+    "paged": bench_paged,
+    "undo": bench_undo,
+}
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv[:1])
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
@@ -0,0 +1,597 @@
+"""On-disk board formats.
+
+Boards are exchanged as plain dictionaries shaped like the JSON file:
+{"shapes": [shape records], "connections": [{"id": n, "start": a, "end": b}],
+ "descriptions": {key: text}}
+where start/end are shape IDs and each shape's description_ref is a key
+into descriptions (see descriptions.py). Files saved before shapes had IDs
+omit them; a shape's index in the list then serves as its ID. Older files
+also keep the text inline in each shape's "description".
+This module has no Qt dependency so it can be used from tools and worker
+threads alike.
+
+Binary layout (little-endian, sections padded to 8 bytes):
+    header       magic, version, flags, shape/connection/string counts, payload size,
+                 description count, offset of the description blobs
+    strings      u32 offsets[count + 1] followed by the UTF-8 blob
+    shapes       f64 x, y, width, height
+                 u32 title, category, description, custom_bg_color, custom_text_color, id
+                 u16 border_width, u8 type, u8 status, u8 presence bits
+    connections  u32 start, end, id
+    descriptions u64 blob offsets, u32 blob lengths, 20-byte SHA-1 keys
+    (blobs)      one UTF-8 text per description, after the payload
+The payload (strings to descriptions) is zlib-compressed as a whole when
+FLAG_COMPRESSED is set, and each blob separately, so a single description
+can still be read without touching the rest of the file.
+Version 1 files have no id columns. Versions 1 and 2 have a shorter header
+and keep descriptions in the string table.
+"""
+from array import array
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+from descriptions import description_key, required_text
+
+MAGIC = b"SSJB"
+VERSION = 3
+FLAG_COMPRESSED = 1
+BINARY_EXTENSION = ".ssjb"
+
+SHAPE_TYPES = ("RectangleShape", "CircleShape", "DiamondShape", "TriangleShape", "FrameShape")
+STATUSES = ("Todo", "In Progress", "Done")
+
+HEADER = struct.Struct("<4sHHIIIQIQ")
+HEADER_V2 = struct.Struct("<4sHHIIIQ4x")  # Versions 1 and 2, padded so the payload is 8-byte aligned
+NO_STRING = 0xFFFFFFFF
+NO_ID = 0xFFFFFFFF
+
+# Presence bits for optional shape fields
+HAS_SIZE = 1
+HAS_BORDER = 2
+
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def is_binary_board(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def detect_format(filename):
+    """(binary, compressed) for an existing board file"""
+    with open(filename, 'rb') as f:
+        header = f.read(HEADER_V2.size)
+    if len(header) < HEADER_V2.size or header[:len(MAGIC)] != MAGIC:
+        return False, False
+    flags = HEADER_V2.unpack(header)[2]
+    return True, bool(flags & FLAG_COMPRESSED)
+
+
+def read_board(filename):
+    """Read a board file in either format, descriptions split out of the shapes"""
+    if is_binary_board(filename):
+        return split_descriptions(read_binary(filename))
+    return split_descriptions(read_json(filename))
+
+
+def write_board(data, filename, binary=None, compress=False):
+    """Write a board, picking the format from the extension unless given.
+
+    Returns where to read its descriptions from from now on (see
+    DescriptionStore.rebind).
+    """
+    if binary is None:
+        binary = filename.lower().endswith(BINARY_EXTENSION)
+    payload, source = encode_saved(data, filename, binary, compress)
+    atomic_write(filename, payload)
+    return source
+
+
+def encode_board(data, binary=False, compress=False):
+    if binary:
+        return encode_binary(data, compress)
+    return json.dumps(materialize_descriptions(data), indent=2).encode("utf-8")
+
+
+def encode_saved(data, filename, binary=False, compress=False):
+    """encode_board, plus the descriptions as read back from filename once the payload is written there"""
+    if binary:
+        payload, table = _encode_binary(data, compress)
+        return payload, BinaryDescriptions(filename, table)
+    data = materialize_descriptions(data)
+    return json.dumps(data, indent=2).encode("utf-8"), data["descriptions"]
+
+
+def split_descriptions(data):
+    """Move inline descriptions of older files into the descriptions section"""
+    if not any("description" in shape_data for shape_data in data["shapes"]):
+        if "descriptions" in data:
+            return data
+        return dict(data, descriptions={})
+
+    descriptions = dict(data.get("descriptions") or {})
+    shapes = []
+    for shape_data in data["shapes"]:
+        if "description" in shape_data:
+            shape_data = dict(shape_data)
+            text = shape_data.pop("description")
+            shape_data["description_ref"] = None
+            if text:
+                shape_data["description_ref"] = key = description_key(text)
+                descriptions[key] = text
+        shapes.append(shape_data)
+    return dict(data, shapes=shapes, descriptions=descriptions)
+
+
+def materialize_descriptions(data):
+    """Board data with the texts of all referenced descriptions in a plain dict.
+
+    Unreferenced texts are dropped, referenced ones read from lazy sources.
+    """
+    data = split_descriptions(data)
+    source = data["descriptions"]
+    descriptions = {}
+    for shape_data in data["shapes"]:
+        key = shape_data.get("description_ref")
+        if key and key not in descriptions:
+            descriptions[key] = required_text(source, key)
+    return dict(data, descriptions=descriptions)
+
+
+def atomic_write(filename, payload):
+    """Write to a temp file, fsync it and rename it over the target.
+
+    Readers see either the old file or the complete new one, never a
+    truncated mix.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    tmp_path = filename + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filename)
+
+    # Persist the rename itself where the platform allows it
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def read_json(filename):
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def write_json(data, filename):
+    atomic_write(filename, encode_board(data))
+
+
+def convert_board(src, dst, compress=False):
+    """Losslessly convert between JSON and binary, by destination extension"""
+    write_board(read_board(src), dst, compress=compress)
+
+
+class _StringTable:
+    """Interns strings so repeated titles, categories and colors are stored once"""
+    def __init__(self):
+        self.index = {}
+        self.strings = []
+
+    def add(self, value):
+        if value is None:
+            return NO_STRING
+        i = self.index.get(value)
+        if i is None:
+            i = self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return i
+
+
+def _pad(buf):
+    buf.extend(b"\0" * (-len(buf) % 8))
+
+
+def _append_column(buf, typecode, values):
+    column = array(typecode, values)
+    if not _LITTLE_ENDIAN:
+        column.byteswap()
+    buf.extend(column.tobytes())
+
+
+def encode_binary(data, compress=False):
+    return _encode_binary(data, compress)[0]
+
+
+def _encode_binary(data, compress):
+    """The file's bytes and its description table, as _decode_view would read it"""
+    data = split_descriptions(data)
+    shapes = data["shapes"]
+    connections = data["connections"]
+    source = data["descriptions"]
+    strings = _StringTable()
+    description_index = {}  # key -> position in the description table
+
+    xs, ys, widths, heights = array('d'), array('d'), array('d'), array('d')
+    titles, categories, descriptions = array('I'), array('I'), array('I')
+    bg_colors, text_colors, ids = array('I'), array('I'), array('I')
+    borders, types, statuses, presence = array('H'), array('B'), array('B'), array('B')
+
+    for index, shape_data in enumerate(shapes):
+        # Both are stored as their position in these tuples
+        if shape_data.get("type") not in SHAPE_TYPES:
+            raise ValueError("Cannot encode shape %r: unknown type %r"
+                             % (shape_data.get("id", index), shape_data.get("type")))
+        if shape_data.get("status") not in STATUSES:
+            raise ValueError("Cannot encode shape %r: unknown status %r"
+                             % (shape_data.get("id", index), shape_data.get("status")))
+        types.append(SHAPE_TYPES.index(shape_data["type"]))
+        statuses.append(STATUSES.index(shape_data["status"]))
+        xs.append(shape_data["x"])
+        ys.append(shape_data["y"])
+
+        bits = 0
+        if "width" in shape_data:
+            bits |= HAS_SIZE
+            widths.append(shape_data["width"])
+            heights.append(shape_data["height"])
+        else:
+            widths.append(0.0)
+            heights.append(0.0)
+        if "border_width" in shape_data:
+            bits |= HAS_BORDER
+            borders.append(shape_data["border_width"])
+        else:
+            borders.append(0)
+        presence.append(bits)
+
+        titles.append(strings.add(shape_data["title"]))
+        categories.append(strings.add(shape_data.get("category", "General")))
+        key = shape_data.get("description_ref")
+        if key is None:
+            descriptions.append(NO_STRING)
+        else:
+            descriptions.append(description_index.setdefault(key, len(description_index)))
+        bg_colors.append(strings.add(shape_data.get("custom_bg_color")))
+        text_colors.append(strings.add(shape_data.get("custom_text_color")))
+        ids.append(shape_data.get("id", NO_ID))
+
+    payload = bytearray()
+
+    # String table
+    blob = bytearray()
+    offsets = array('I', [0])
+    for value in strings.strings:
+        blob.extend(value.encode("utf-8"))
+        offsets.append(len(blob))
+    _append_column(payload, 'I', offsets)
+    payload.extend(blob)
+    _pad(payload)
+
+    # Shape columns, widest first so every column stays aligned
+    for typecode, column in (('d', xs), ('d', ys), ('d', widths), ('d', heights),
+                             ('I', titles), ('I', categories), ('I', descriptions),
+                             ('I', bg_colors), ('I', text_colors), ('I', ids),
+                             ('H', borders), ('B', types), ('B', statuses), ('B', presence)):
+        _append_column(payload, typecode, column)
+    _pad(payload)
+
+    # Connections
+    _append_column(payload, 'I', (c["start"] for c in connections))
+    _append_column(payload, 'I', (c["end"] for c in connections))
+    _append_column(payload, 'I', (c.get("id", NO_ID) for c in connections))
+    _pad(payload)
+
+    # Description table; the blobs themselves go after the payload
+    blobs = []
+    blob_offsets, blob_lengths = array('Q'), array('I')
+    position = 0
+    for key in description_index:
+        text = required_text(source, key).encode("utf-8")
+        if compress:
+            text = zlib.compress(text)
+        blobs.append(text)
+        blob_offsets.append(position)
+        blob_lengths.append(len(text))
+        position += len(text)
+    _append_column(payload, 'Q', blob_offsets)
+    _append_column(payload, 'I', blob_lengths)
+    for key in description_index:
+        payload.extend(bytes.fromhex(key))
+
+    flags = FLAG_COMPRESSED if compress else 0
+    payload_size = len(payload)
+    if compress:
+        payload = zlib.compress(bytes(payload))
+    blob_offset = HEADER.size + len(payload)
+    header = HEADER.pack(MAGIC, VERSION, flags, len(shapes), len(connections),
+                         len(strings.strings), payload_size,
+                         len(description_index), blob_offset)
+    table = (list(description_index), blob_offsets.tolist(), blob_lengths.tolist(), blob_offset, compress)
+    return b"".join([header, bytes(payload)] + blobs), table
+
+
+def write_binary(data, filename, compress=False):
+    atomic_write(filename, encode_binary(data, compress))
+
+
+class _ColumnReader:
+    """Sequentially reads little-endian columns out of a buffer"""
+    def __init__(self, buf, offset=0):
+        self.buf = buf
+        self.offset = offset
+
+    def column(self, typecode, count):
+        size = array(typecode).itemsize * count
+        start = self._advance(size)
+        if _LITTLE_ENDIAN:
+            view = self.buf[start:start + size].cast(typecode)
+            values = view.tolist()
+            view.release()
+            return values
+        column = array(typecode)
+        column.frombytes(self.buf[start:start + size])
+        column.byteswap()
+        return column.tolist()
+
+    def raw(self, size):
+        start = self._advance(size)
+        return self.buf[start:start + size]
+
+    def _advance(self, size):
+        start = self.offset
+        if start + size > len(self.buf):
+            raise ValueError("Truncated binary board file")
+        self.offset += size
+        return start
+
+    def align(self):
+        self.offset += -self.offset % 8
+
+
+def decode_binary(buf):
+    """Decode a binary board from any buffer (bytes, mmap...), descriptions included"""
+    error = None
+    with memoryview(buf) as view:
+        try:
+            data, table = _decode_view(view)
+            if table:
+                keys, offsets, lengths, blob_offset, compressed = table
+                descriptions = {}
+                for key, offset, length in zip(keys, offsets, lengths):
+                    start = blob_offset + offset
+                    if start + length > len(view):
+                        raise ValueError("Truncated binary board file")
+                    descriptions[key] = _decode_blob(view[start:start + length], compressed)
+                data["descriptions"] = descriptions
+            return data
+        except (ValueError, zlib.error) as e:
+            # Raised below, once the traceback no longer holds slices of view
+            error = str(e)
+    raise ValueError(error)
+
+
+def _decode_blob(blob, compressed):
+    if compressed:
+        blob = zlib.decompress(blob)
+    return str(blob, "utf-8")
+
+
+def _read_header(buf):
+    version = struct.unpack_from("<H", buf, len(MAGIC))[0]
+    if version >= 3:
+        return HEADER.unpack_from(buf, 0), HEADER.size
+    return HEADER_V2.unpack_from(buf, 0) + (0, 0), HEADER_V2.size
+
+
+def _decode_view(buf):
+    """Shapes and connections, plus the description table for version 3 files.
+
+    Anything wrong with the file is raised as ValueError. Callers holding
+    buf open must let the exception go before closing it: its traceback
+    still refers to slices of buf.
+    """
+    try:
+        return _decode_columns(buf)
+    except (IndexError, KeyError, struct.error, zlib.error) as e:
+        raise ValueError("Corrupt binary board file (%s)" % e)
+
+
+def _decode_columns(buf):
+    if len(buf) < HEADER_V2.size:
+        raise ValueError("Truncated binary board file")
+    header, header_size = _read_header(buf)
+    magic, version, flags, shape_count, conn_count, string_count, payload_size, desc_count, blob_offset = header
+    if magic != MAGIC:
+        raise ValueError("Not a binary board file")
+    if version > VERSION:
+        raise ValueError("Unsupported binary board version %d" % version)
+
+    compressed = bool(flags & FLAG_COMPRESSED)
+    if compressed:
+        end = blob_offset if version >= 3 else len(buf)
+        payload = memoryview(zlib.decompress(buf[header_size:end]))
+    else:
+        payload = buf[header_size:header_size + payload_size]
+    if len(payload) != payload_size:
+        raise ValueError("Truncated binary board file")
+
+    reader = _ColumnReader(payload)
+    offsets = reader.column('I', string_count + 1)
+    if any(offsets[i] > offsets[i + 1] for i in range(string_count)):
+        raise ValueError("Corrupt string table in binary board file")
+    blob = reader.raw(offsets[-1])
+    strings = [str(blob[offsets[i]:offsets[i + 1]], "utf-8") for i in range(string_count)]
+    strings.append(None)  # NO_STRING resolves to the last slot
+    reader.align()
+
+    def string_column():
+        # strings[string_count] is the None slot; anything past it is corrupt (IndexError)
+        return [strings[i] if i != NO_STRING else None for i in reader.column('I', shape_count)]
+
+    xs = reader.column('d', shape_count)
+    ys = reader.column('d', shape_count)
+    widths = reader.column('d', shape_count)
+    heights = reader.column('d', shape_count)
+    titles = string_column()
+    categories = string_column()
+    descriptions = reader.column('I', shape_count)
+    bg_colors = string_column()
+    text_colors = string_column()
+    ids = reader.column('I', shape_count) if version >= 2 else [NO_ID] * shape_count
+    borders = reader.column('H', shape_count)
+    types = reader.column('B', shape_count)
+    statuses = reader.column('B', shape_count)
+    presence = reader.column('B', shape_count)
+    reader.align()
+    starts = reader.column('I', conn_count)
+    ends = reader.column('I', conn_count)
+    conn_ids = reader.column('I', conn_count) if version >= 2 else [NO_ID] * conn_count
+
+    table = None
+    if version >= 3:
+        reader.align()
+        blob_offsets = reader.column('Q', desc_count)
+        blob_lengths = reader.column('I', desc_count)
+        digests = reader.raw(20 * desc_count)
+        keys = [digests[i * 20:(i + 1) * 20].hex() for i in range(desc_count)]
+        digests.release()
+        # Blobs are read lazily (BinaryDescriptions); a file cut short must fail here, not on a later lookup
+        if blob_offset + max((o + n for o, n in zip(blob_offsets, blob_lengths)), default=0) > len(buf):
+            raise ValueError("Truncated binary board file")
+        table = (keys, blob_offsets, blob_lengths, blob_offset, compressed)
+        keys.append(None)  # NO_STRING resolves to the last slot
+        descriptions = [keys[i] if i != NO_STRING else None for i in descriptions]
+        keys.pop()
+    else:
+        descriptions = [strings[i] if i != NO_STRING else None for i in descriptions]
+    blob.release()
+    payload.release()
+
+    shapes = []
+    for i in range(shape_count):
+        shape_data = {}
+        if ids[i] != NO_ID:
+            shape_data["id"] = ids[i]
+        shape_data.update({
+            "type": SHAPE_TYPES[types[i]],
+            "x": xs[i],
+            "y": ys[i],
+            "title": titles[i],
+            "category": categories[i],
+            "status": STATUSES[statuses[i]],
+            "custom_bg_color": bg_colors[i],
+            "custom_text_color": text_colors[i]
+        })
+        if version >= 3:
+            shape_data["description_ref"] = descriptions[i]
+        else:
+            shape_data["description"] = descriptions[i]
+        if presence[i] & HAS_SIZE:
+            shape_data["width"] = widths[i]
+            shape_data["height"] = heights[i]
+        if presence[i] & HAS_BORDER:
+            shape_data["border_width"] = borders[i]
+        shapes.append(shape_data)
+
+    connections = []
+    for conn_id, start, end in zip(conn_ids, starts, ends):
+        conn_data = {"id": conn_id} if conn_id != NO_ID else {}
+        conn_data["start"] = start
+        conn_data["end"] = end
+        connections.append(conn_data)
+    return {"shapes": shapes, "connections": connections}, table
+
+
+class BinaryDescriptions:
+    """Reads description texts out of a binary board file one at a time.
+
+    The file is opened per lookup and not held open, so it can be replaced
+    by a save. Texts are checked against their key; if the file changed
+    underneath, the table is re-read from it once.
+    """
+    def __init__(self, filename, table):
+        self.filename = filename
+        self._set_table(table)
+
+    def _set_table(self, table):
+        keys, offsets, lengths, self.blob_offset, self.compressed = table
+        self.index = {key: (offset, length) for key, offset, length in zip(keys, offsets, lengths)}
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def reference(self):
+        """Where the texts are, for an autosave snapshot to read them back from (see journal.py)"""
+        return {"file": self.filename}
+
+    def __len__(self):
+        return len(self.index)
+
+    def keys(self):
+        return self.index.keys()
+
+    def get(self, key, default=None):
+        for attempt in range(2):
+            entry = self.index.get(key)
+            if entry is None:
+                return default
+            try:
+                text = self._read(*entry)
+                if description_key(text) == key:
+                    return text
+            except (OSError, ValueError, zlib.error):
+                pass
+            if attempt == 0:
+                self._reload()
+        return default
+
+    def _read(self, offset, length):
+        with open(self.filename, 'rb') as f:
+            f.seek(self.blob_offset + offset)
+            return _decode_blob(f.read(length), self.compressed)
+
+    def _reload(self):
+        try:
+            table = _decode_file(self.filename)[1]
+        except (OSError, ValueError):
+            return
+        if table:
+            self._set_table(table)
+
+
+def _decode_file(filename):
+    """_decode_view over a mapped file; ValueError if it is corrupt"""
+    error = None
+    with open(filename, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                try:
+                    return _decode_view(view)
+                except ValueError as e:
+                    # Raised below: the mapping cannot close while the traceback holds slices of it
+                    error = str(e)
+    raise ValueError(error)
+
+
+def read_binary(filename):
+    """Read a binary board; descriptions are loaded lazily from the file"""
+    data, table = _decode_file(filename)
+    if table:
+        data["descriptions"] = BinaryDescriptions(filename, table)
+    return data
+
+
+if __name__ == "__main__":
+    # python board_format.py board.json board.ssjb [--compress]
+    args = [a for a in sys.argv[1:] if a != "--compress"]
+    if len(args) != 2:
+        sys.exit("usage: board_format.py SRC DST [--compress]")
+    convert_board(args[0], args[1], compress="--compress" in sys.argv)
@@ -0,0 +1,205 @@
+"""SQLite storage for many boards in one database.
+
+Shapes and connections are rows keyed by (board, id), so a board can be
+updated by upserting only the items that changed, and questions across
+boards ("every In Progress SQL task") are answered from indexes without
+building a scene. Descriptions are shared by key across all boards.
+No Qt dependency.
+"""
+import os
+import sqlite3
+import threading
+from urllib.request import pathname2url
+
+from descriptions import required_text
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS boards (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS shapes (
+    board_id INTEGER NOT NULL REFERENCES boards(id) ON DELETE CASCADE,
+    id INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    width REAL,
+    height REAL,
+    border_width INTEGER,
+    title TEXT,
+    category TEXT,
+    status TEXT,
+    description_ref TEXT,
+    custom_bg_color TEXT,
+    custom_text_color TEXT,
+    PRIMARY KEY (board_id, id)
+);
+CREATE INDEX IF NOT EXISTS shapes_by_status ON shapes (status, category);
+CREATE INDEX IF NOT EXISTS shapes_by_category ON shapes (category);
+CREATE TABLE IF NOT EXISTS connections (
+    board_id INTEGER NOT NULL REFERENCES boards(id) ON DELETE CASCADE,
+    id INTEGER NOT NULL,
+    start_id INTEGER NOT NULL,
+    end_id INTEGER NOT NULL,
+    PRIMARY KEY (board_id, id)
+);
+CREATE TABLE IF NOT EXISTS descriptions (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL
+);
+"""
+
+SHAPE_COLUMNS = ("id", "type", "x", "y", "width", "height", "border_width", "title", "category",
+                 "status", "description_ref", "custom_bg_color", "custom_text_color")
+# Keys that only some shape types carry; absent rather than None when NULL
+OPTIONAL_COLUMNS = ("width", "height", "border_width")
+
+
+class BoardStore:
+    def __init__(self, path, read_only=False):
+        self.path = path
+        # Lazy description lookups may come from a save worker thread
+        self._lock = threading.RLock()
+        if read_only:
+            # Never creates or changes the file; a missing one fails to open
+            uri = "file:%s?mode=ro" % pathname2url(os.path.abspath(path))
+            self.db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            return
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+    def boards(self):
+        with self._lock:
+            return [name for (name,) in self.db.execute("SELECT name FROM boards ORDER BY name")]
+
+    def _board_id(self, name, create=False):
+        row = self.db.execute("SELECT id FROM boards WHERE name = ?", (name,)).fetchone()
+        if row:
+            return row[0]
+        if not create:
+            raise KeyError(name)
+        return self.db.execute("INSERT INTO boards (name) VALUES (?)", (name,)).lastrowid
+
+    def save_board(self, name, data):
+        """Replace a board with the given board data"""
+        with self._lock, self.db:
+            board_id = self._board_id(name, create=True)
+            self.db.execute("DELETE FROM shapes WHERE board_id = ?", (board_id,))
+            self.db.execute("DELETE FROM connections WHERE board_id = ?", (board_id,))
+            self._upsert(board_id, data["shapes"], data["connections"], data.get("descriptions") or {})
+
+    def upsert(self, name, shapes=(), connections=(), deleted_ids=(), descriptions=None):
+        """Write only changed shapes/connections and drop deleted IDs"""
+        with self._lock, self.db:
+            board_id = self._board_id(name, create=True)
+            deleted = [(board_id, uid) for uid in deleted_ids]
+            self.db.executemany("DELETE FROM shapes WHERE board_id = ? AND id = ?", deleted)
+            self.db.executemany("DELETE FROM connections WHERE board_id = ? AND id = ?", deleted)
+            self._upsert(board_id, shapes, connections, descriptions or {})
+
+    def _upsert(self, board_id, shapes, connections, descriptions):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO shapes (board_id, %s) VALUES (?, %s)"
+            % (", ".join(SHAPE_COLUMNS), ", ".join("?" * len(SHAPE_COLUMNS))),
+            [(board_id,) + tuple(shape_data.get(column) for column in SHAPE_COLUMNS) for shape_data in shapes])
+        self.db.executemany(
+            "INSERT OR REPLACE INTO connections (board_id, id, start_id, end_id) VALUES (?, ?, ?, ?)",
+            [(board_id, c["id"], c["start"], c["end"]) for c in connections])
+
+        # Descriptions are content-addressed: a known key already has the right text
+        keys = {shape_data.get("description_ref") for shape_data in shapes} - {None}
+        known = set()
+        for key in keys:
+            if self.db.execute("SELECT 1 FROM descriptions WHERE key = ?", (key,)).fetchone():
+                known.add(key)
+        self.db.executemany("INSERT INTO descriptions (key, text) VALUES (?, ?)",
+                            [(key, required_text(descriptions, key)) for key in keys - known])
+
+    def delete_board(self, name):
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM boards WHERE name = ?", (name,))
+
+    def load_board(self, name):
+        """Board data for a board; descriptions are fetched lazily"""
+        with self._lock:
+            board_id = self._board_id(name)
+            cursor = self.db.execute(
+                "SELECT %s FROM shapes WHERE board_id = ? ORDER BY id" % ", ".join(SHAPE_COLUMNS), (board_id,))
+            shapes = [_shape_from_row(row) for row in cursor]
+            connections = [{"id": conn_id, "start": start, "end": end} for conn_id, start, end in self.db.execute(
+                "SELECT id, start_id, end_id FROM connections WHERE board_id = ? ORDER BY id", (board_id,))]
+        return {"shapes": shapes, "connections": connections, "descriptions": StoreDescriptions(self)}
+
+    def get_description(self, key):
+        with self._lock:
+            row = self.db.execute("SELECT text FROM descriptions WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def query_shapes(self, status=None, category=None, board=None, type=None):
+        """Shape records matching every given filter, each with its "board" name"""
+        conditions = []
+        params = []
+        for column, value in (("shapes.status", status), ("shapes.category", category),
+                              ("boards.name", board), ("shapes.type", type)):
+            if value is not None:
+                conditions.append("%s = ?" % column)
+                params.append(value)
+        sql = ("SELECT boards.name, %s FROM shapes JOIN boards ON boards.id = shapes.board_id"
+               % ", ".join("shapes." + column for column in SHAPE_COLUMNS))
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY boards.name, shapes.id"
+
+        results = []
+        with self._lock:
+            for row in self.db.execute(sql, params):
+                shape_data = _shape_from_row(row[1:])
+                shape_data["board"] = row[0]
+                results.append(shape_data)
+        return results
+
+    def count_shapes(self, group_by="status", board=None):
+        """{value: count} for status, category or type, optionally for one board"""
+        if group_by not in ("status", "category", "type"):
+            raise ValueError("Cannot group by %r" % group_by)
+        sql = "SELECT shapes.%s, COUNT(*) FROM shapes" % group_by
+        params = ()
+        if board is not None:
+            sql += " JOIN boards ON boards.id = shapes.board_id WHERE boards.name = ?"
+            params = (board,)
+        sql += " GROUP BY shapes.%s" % group_by
+        with self._lock:
+            return dict(self.db.execute(sql, params).fetchall())
+
+
+class StoreDescriptions:
+    """Lazy description lookups against a BoardStore"""
+    def __init__(self, store):
+        self.store = store
+
+    def get(self, key, default=None):
+        text = self.store.get_description(key)
+        return text if text is not None else default
+
+    def __contains__(self, key):
+        return self.store.get_description(key) is not None
+
+    def reference(self):
+        """Where the texts are, for an autosave snapshot to read them back from (see journal.py)"""
+        return {"store": self.store.path}
+
+
+def _shape_from_row(row):
+    shape_data = {}
+    for column, value in zip(SHAPE_COLUMNS, row):
+        if value is None and column in OPTIONAL_COLUMNS:
+            continue
+        shape_data[column] = value
+    return shape_data
@@ -0,0 +1,336 @@
+"""Command-line tool for board files that never imports Qt.
+
+    python -m boardtool stats boards/*.json
+    python -m boardtool validate --jobs 8 archive/**/*.ssjb
+    python -m boardtool convert board.json board.ssjb --compress
+    python -m boardtool convert --format binary --out-dir converted boards/*.json
+    python -m boardtool convert huge.ssjb huge.ssjt
+    python -m boardtool merge a.json b.ssjb -o merged.json
+    python -m boardtool query boards.sqlite --status "In Progress" --category SQL
+
+Commands that take many files process them across a process pool.
+"""
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import json
+import os
+import sys
+
+from board_format import BINARY_EXTENSION, SHAPE_TYPES, STATUSES, materialize_descriptions, read_board, write_board
+from descriptions import required_text
+from tiled_board import TILED_EXTENSION, is_tiled_board, read_tiled, write_tiled
+
+# A file that cannot be read or decoded: corrupt binaries raise ValueError
+# (see board_format._decode_view), JSON of the wrong shape TypeError and the like
+READ_ERRORS = (OSError, ValueError, KeyError, IndexError, TypeError, AttributeError)
+
+
+def expand_paths(patterns):
+    """Expand globs ourselves so patterns also work where the shell doesn't"""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        paths.extend(matches if matches else [pattern])
+    return paths
+
+
+def map_files(func, paths, jobs):
+    """func over paths, in order, in worker processes when it pays off"""
+    if jobs == 1 or len(paths) < 2:
+        return [func(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunksize = max(1, len(paths) // ((jobs or os.cpu_count() or 1) * 4))
+        return list(executor.map(func, paths, chunksize=chunksize))
+
+
+def load_board(path):
+    """Read a JSON, binary or tiled board"""
+    if is_tiled_board(path):
+        return read_tiled(path)
+    return read_board(path)
+
+
+def save_board(data, path, compress=False):
+    if is_tiled_board(path):
+        write_tiled(data, path)
+    else:
+        write_board(data, path, compress=compress)
+
+
+def board_stats(path):
+    try:
+        data = load_board(path)
+        return {
+            "path": path,
+            "shapes": len(data["shapes"]),
+            "connections": len(data["connections"]),
+            "status": Counter(shape_data.get("status") for shape_data in data["shapes"]),
+            "category": Counter(shape_data.get("category") for shape_data in data["shapes"]),
+            "type": Counter(shape_data.get("type") for shape_data in data["shapes"]),
+        }
+    except READ_ERRORS as e:
+        # Also records of the wrong shape, such as a shape that is not an object
+        return {"path": path, "error": "%s: %s" % (type(e).__name__, e)}
+
+
+def validate_board(path):
+    """List of problems found in a board file (empty when it is fine)"""
+    try:
+        data = load_board(path)
+    except READ_ERRORS as e:
+        return {"path": path, "problems": ["unreadable: %s" % e]}
+
+    problems = []
+    shape_ids = set()
+    try:
+        for index, shape_data in enumerate(data["shapes"]):
+            try:
+                problems.extend(_shape_problems(index, shape_data, shape_ids, data["descriptions"]))
+            except READ_ERRORS as e:
+                problems.append("shape %d: malformed record (%s: %s)" % (index, type(e).__name__, e))
+        for index, conn_data in enumerate(data["connections"]):
+            try:
+                problems.extend(_connection_problems(index, conn_data, shape_ids))
+            except READ_ERRORS as e:
+                problems.append("connection %d: malformed record (%s: %s)" % (index, type(e).__name__, e))
+    except READ_ERRORS as e:
+        # No list of shapes or connections at all
+        problems.append("malformed board (%s: %s)" % (type(e).__name__, e))
+    return {"path": path, "problems": problems}
+
+
+def _shape_problems(index, shape_data, shape_ids, descriptions):
+    problems = []
+    uid = shape_data.get("id", index)
+    if uid in shape_ids:
+        problems.append("shape %d: duplicate id %r" % (index, uid))
+    shape_ids.add(uid)
+    if shape_data.get("type") not in SHAPE_TYPES:
+        problems.append("shape %d: unknown type %r" % (index, shape_data.get("type")))
+    if shape_data.get("status") not in STATUSES:
+        problems.append("shape %d: unknown status %r" % (index, shape_data.get("status")))
+    key = shape_data.get("description_ref")
+    if key is not None and descriptions.get(key) is None:
+        problems.append("shape %d: missing description %s" % (index, key))
+    return problems
+
+
+def _connection_problems(index, conn_data, shape_ids):
+    problems = []
+    for end in ("start", "end"):
+        if conn_data.get(end) not in shape_ids:
+            problems.append("connection %d: dangling %s %r" % (index, end, conn_data.get(end)))
+    return problems
+
+
+def _read_for_merge(path):
+    """A board with the texts it refers to in a plain dict, so a worker can send it back"""
+    try:
+        return materialize_descriptions(load_board(path)), None
+    except READ_ERRORS as e:
+        return None, "%s: %s" % (path, e)
+
+
+def merge_boards(paths, jobs=1):
+    """One board holding every shape and connection, with IDs renumbered to stay unique.
+
+    Boards are read in worker processes. Raises ValueError naming every
+    board that could not be read or merged, such as one missing a
+    description its shapes refer to.
+    """
+    boards = map_files(_read_for_merge, paths, jobs)
+    errors = [error for _, error in boards if error]
+    if errors:
+        raise ValueError("\n".join(errors))
+
+    merged = {"shapes": [], "connections": [], "descriptions": {}}
+    next_id = 0
+    for path, (data, _) in zip(paths, boards):
+        try:
+            id_map = {}
+            for index, shape_data in enumerate(data["shapes"]):
+                shape_data = dict(shape_data)
+                id_map[shape_data.get("id", index)] = shape_data["id"] = next_id
+                next_id += 1
+                key = shape_data.get("description_ref")
+                if key is not None and key not in merged["descriptions"]:
+                    merged["descriptions"][key] = required_text(data["descriptions"], key)
+                merged["shapes"].append(shape_data)
+            for conn_data in data["connections"]:
+                if conn_data["start"] in id_map and conn_data["end"] in id_map:
+                    merged["connections"].append({
+                        "id": next_id,
+                        "start": id_map[conn_data["start"]],
+                        "end": id_map[conn_data["end"]]
+                    })
+                    next_id += 1
+        except READ_ERRORS as e:
+            raise ValueError("%s: malformed record (%s: %s)" % (path, type(e).__name__, e)) from None
+    return merged
+
+
+def _convert_one(job):
+    src, dst, compress = job
+    try:
+        save_board(load_board(src), dst, compress)
+    except READ_ERRORS as e:
+        return "%s: %s" % (src, e)
+    return None
+
+
+def cmd_stats(args):
+    results = map_files(board_stats, expand_paths(args.files), args.jobs)
+    totals = {"boards": 0, "shapes": 0, "connections": 0,
+              "status": Counter(), "category": Counter(), "type": Counter()}
+    failed = 0
+    for result in results:
+        if "error" in result:
+            print("%s: %s" % (result["path"], result["error"]), file=sys.stderr)
+            failed += 1
+            continue
+        totals["boards"] += 1
+        for key in ("shapes", "connections"):
+            totals[key] += result[key]
+        for key in ("status", "category", "type"):
+            totals[key].update(result[key])
+
+    if args.json:
+        json.dump(totals, sys.stdout, indent=2)
+        print()
+    else:
+        print("boards: %d  shapes: %d  connections: %d"
+              % (totals["boards"], totals["shapes"], totals["connections"]))
+        for key in ("status", "category", "type"):
+            print("%s:" % key)
+            for value, count in totals[key].most_common():
+                print("  %-24s %d" % (value, count))
+    return 1 if failed else 0
+
+
+def cmd_validate(args):
+    bad = 0
+    for result in map_files(validate_board, expand_paths(args.files), args.jobs):
+        if result["problems"]:
+            bad += 1
+            for problem in result["problems"]:
+                print("%s: %s" % (result["path"], problem))
+    if not args.quiet:
+        print("%d board(s) with problems" % bad, file=sys.stderr)
+    return 1 if bad else 0
+
+
+def cmd_convert(args):
+    paths = expand_paths(args.files)
+    if args.format is None:
+        # convert SRC DST
+        if len(paths) != 2:
+            sys.exit("convert: give SRC DST, or --format with one or more files")
+        jobs = [(paths[0], paths[1], args.compress)]
+    else:
+        extension = {"binary": BINARY_EXTENSION, "tiled": TILED_EXTENSION}.get(args.format, ".json")
+        jobs = []
+        for src in paths:
+            dst = os.path.splitext(src)[0] + extension
+            if args.out_dir:
+                os.makedirs(args.out_dir, exist_ok=True)
+                dst = os.path.join(args.out_dir, os.path.basename(dst))
+            jobs.append((src, dst, args.compress))
+
+    errors = [error for error in map_files(_convert_one, jobs, args.jobs) if error]
+    for error in errors:
+        print(error, file=sys.stderr)
+    return 1 if errors else 0
+
+
+def cmd_merge(args):
+    try:
+        merged = merge_boards(expand_paths(args.files), args.jobs)
+        save_board(merged, args.output, compress=args.compress)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        print("merge: nothing written to %s" % args.output, file=sys.stderr)
+        return 1
+    print("merged %d shapes, %d connections into %s"
+          % (len(merged["shapes"]), len(merged["connections"]), args.output))
+    return 0
+
+
+def cmd_query(args):
+    import sqlite3
+    from board_store import BoardStore
+    if not os.path.isfile(args.database):
+        sys.exit("query: no such database: %s" % args.database)
+    try:
+        store = BoardStore(args.database, read_only=True)
+        try:
+            rows = store.query_shapes(status=args.status, category=args.category, board=args.board, type=args.type)
+        finally:
+            store.close()
+    except sqlite3.Error as e:
+        # Not a board database, or not one at all
+        sys.exit("query: cannot read %s: %s" % (args.database, e))
+    if args.json:
+        json.dump(rows, sys.stdout, indent=2)
+        print()
+    else:
+        for shape_data in rows:
+            print("%s\t%s\t%s\t%s\t%s" % (shape_data["board"], shape_data["id"], shape_data["status"],
+                                          shape_data["category"], shape_data["title"]))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="boardtool", description="Work with task board files without the GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_jobs(command):
+        command.add_argument("-j", "--jobs", type=int, default=None,
+                             help="worker processes (default: one per CPU, 1 disables the pool)")
+
+    stats = commands.add_parser("stats", help="counts per status, category and type")
+    stats.add_argument("files", nargs="+")
+    stats.add_argument("--json", action="store_true")
+    add_jobs(stats)
+    stats.set_defaults(func=cmd_stats)
+
+    validate = commands.add_parser("validate", help="check for dangling connections and unknown values")
+    validate.add_argument("files", nargs="+")
+    validate.add_argument("-q", "--quiet", action="store_true")
+    add_jobs(validate)
+    validate.set_defaults(func=cmd_validate)
+
+    convert = commands.add_parser("convert", help="convert between JSON, binary and tiled")
+    convert.add_argument("files", nargs="+", help="SRC DST, or files to convert with --format")
+    convert.add_argument("--format", choices=("json", "binary", "tiled"))
+    convert.add_argument("--out-dir")
+    convert.add_argument("--compress", action="store_true")
+    add_jobs(convert)
+    convert.set_defaults(func=cmd_convert)
+
+    merge = commands.add_parser("merge", help="merge boards into one")
+    merge.add_argument("files", nargs="+")
+    merge.add_argument("-o", "--output", required=True)
+    merge.add_argument("--compress", action="store_true")
+    add_jobs(merge)
+    merge.set_defaults(func=cmd_merge)
+
+    query = commands.add_parser("query", help="query shapes in a board database")
+    query.add_argument("database")
+    query.add_argument("--status")
+    query.add_argument("--category")
+    query.add_argument("--board")
+    query.add_argument("--type")
+    query.add_argument("--json", action="store_true")
+    query.set_defaults(func=cmd_query)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
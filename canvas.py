@@ -1,16 +1,215 @@
+import math
+
 from PyQt6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsLineItem
-from PyQt6.QtCore import Qt, QPointF, QLineF
+from PyQt6.QtCore import Qt, QPointF, QLineF, QRectF, QTimer, pyqtSignal
 from PyQt6.QtGui import QPainter, QTransform, QPen, QColor
-from shapes import RectangleShape, CircleShape, DiamondShape, TriangleShape, TaskShape, ConnectionLine, FrameShape
-import json
+from shapes import LOD_FLAT, RectangleShape, CircleShape, DiamondShape, TriangleShape, TaskShape, ConnectionLine, FrameShape
+from loader import BoardLoader
+from board_format import read_board, write_board
+from descriptions import DescriptionStore
+from render_cache import render_cache
+from edge_layer import EdgeLayer
+from geometry import shape_box, update_connections
+from graph import GraphIndex
+from analytics import DependencyAnalytics
+from auto_layout import AutoLayout
+from edge_router import EdgeRouter
+from containment import ContainmentIndex
+from snapping import AlignmentIndex, SNAP_DISTANCE, snap_to_grid
+from task_model import SHAPE_SIZES, VIRTUALIZE_MIN, TaskModel, TaskRecord
+from tiled_board import MEMORY_CAP, PagedModel, TiledBoard, write_tiled
+from scene_bounds import EMPTY_SCENE, SCENE_GROWTH, SCENE_MARGIN, SceneBounds, bsp_depth, contains
+from routing import grow, union
+from history import ChangeCommand, ItemsCommand, UndoHistory
+
+# Removing or moving at least this many items at once rebuilds the scene index
+# once instead of updating it per item
+BULK_EDIT_MIN = 500
+
+# Virtual boards (see TaskScene.update_viewport)
+VIEW_MARGIN = 0.5  # Items are kept this many viewport sizes beyond the visible area
+MATERIALIZE_MAX = 4000  # Zoomed out past this many tasks, a virtual board is drawn as an overview
+POOL_MAX = 1000  # Spare items kept per shape type for reuse
+VIEWPORT_DELAY_MS = 30  # Panning and zooming settle this long before items are rebuilt
+
+FIT_PADDING = 40  # Scene units around what zoom to fit and zoom to selection show
 
 class TaskScene(QGraphicsScene):
+    history_changed = pyqtSignal()  # Something was done, undone or redone, or the history was cleared
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setSceneRect(0, 0, 5000, 5000) # Large canvas
         self.current_tool = "Select"
         self.connecting_line = None
         self.start_item = None
+        self.mouse_pos = None  # Last scene position of the mouse, for deleting the connection under it
+        self.journal = None  # EditJournal recording edits for autosave
+        self.descriptions = DescriptionStore()  # Texts behind each shape's description_ref
+        self.edge_layer = None  # EdgeLayer drawing connections when batched (see set_batched_edges)
+        self.router = None  # EdgeRouter laying connections around shapes (see set_routed_edges)
+        self.graph = GraphIndex()  # Incoming and outgoing connections of every shape
+        self.containment = ContainmentIndex()  # Which frame every shape lies in
+        self.moved_shapes = set()  # Shapes moved since the last flush, for containment
+        self._placing = False  # Positions are being set by the scene itself, which keeps containment up to date
+
+        # Snapping dragged and new shapes to the grid and to other shapes' edges and centers
+        self.snap_grid = False
+        self.smart_guides = False
+        self.alignment = AlignmentIndex()  # Shape boxes by ID as of the last flush, kept only while smart_guides is on
+        self.unaligned = {}  # ID -> shape added or moved since the last flush, None if removed
+        self.guides = []  # QLineFs drawn while a drag is lined up (see TaskCanvas.drawForeground)
+        self._snap_exclude = None  # (dragged shape, IDs it must not line up with)
+
+        # Virtual boards keep every task in a TaskModel and items only near the viewport
+        self.model = None  # TaskModel, None for an ordinary board where every task is an item
+        self.item_pool = {}  # Shape type name -> items taken off the board, reused for others
+        self.overview = False  # Too far out for items; TaskCanvas draws the model's density instead
+        self._paging = False  # Items are being added or taken away for the viewport, nothing was edited
+        
+        # Connections whose shapes moved, recomputed together (see flush_connections)
+        self.dirty_connections = set()
+        self.connection_timer = QTimer(self)
+        self.connection_timer.setSingleShot(True)
+        self.connection_timer.timeout.connect(self.flush_connections)
+        
+        # Registry of persistent IDs; shapes and connections share one ID space
+        self.shapes_by_id = {}
+        self.connections_by_id = {}
+        self.next_uid = 0
+        
+        # Blocked tasks, cycles and critical path, drawn over the board when show_analysis is on
+        self.analytics = DependencyAnalytics(self.graph, self.shapes_by_id)
+        self.show_analysis = False
+        
+        # Changes since the last save to a BoardStore, for incremental upserts
+        self.store_binding = None  # (database path, board name) the scene was last synced with
+        self.dirty_ids = set()
+        self.deleted_ids = set()
+
+        # The scene rect follows the board: grown as shapes reach past it, fitted on load
+        self.bounds = SceneBounds()  # Around every shape's box, as of the last flush
+        self._room = None  # sceneRect as (x1, y1, x2, y2)
+        self._outgrown = None  # Box around shapes past _room since the last flush
+        self._set_scene_box(EMPTY_SCENE)
+
+        # Undo and redo; edits between begin_change and end_change become one command
+        self.history = UndoHistory()
+        self._change_depth = 0  # Nested begin_change calls not yet ended
+        self._change_label = None
+        self._change_records = {}  # uid -> record before the change, for shapes being edited
+        self._change_positions = {}  # uid -> (x, y) before the change, for shapes that moved
+        self._press_change = False  # The change begun by the last mouse press is still open
+
+    def addItem(self, item):
+        if isinstance(item, (TaskShape, ConnectionLine)):
+            self._register(item)
+        super().addItem(item)
+
+    def removeItem(self, item):
+        if isinstance(item, (TaskShape, ConnectionLine)):
+            self._unregister(item)
+            render_cache.invalidate(item)
+        super().removeItem(item)
+
+    def clear(self):
+        self.shapes_by_id.clear()
+        self.connections_by_id.clear()
+        self.next_uid = 0
+        self.store_binding = None
+        self.dirty_ids.clear()
+        self.deleted_ids.clear()
+        self.dirty_connections.clear()
+        self.containment.clear()
+        self.moved_shapes.clear()
+        self.alignment.clear()
+        self.unaligned.clear()
+        self.guides = []
+        self._snap_exclude = None
+        self.model = None
+        self.item_pool.clear()
+        self.overview = False
+        if self.router:
+            self.router.clear()
+        self.graph.clear()
+        self.analytics.invalidate()
+        self.descriptions.reset()
+        render_cache.clear()
+        super().clear()
+        if self.edge_layer:
+            # Its buckets went with the other items
+            self.edge_layer = EdgeLayer(self)
+        self.bounds.clear()
+        self._outgrown = None
+        self._set_scene_box(EMPTY_SCENE)
+        self.history.clear()
+        self._change_depth = 0
+        self._change_label = None
+        self._change_records = {}
+        self._change_positions = {}
+        self._press_change = False
+        self.history_changed.emit()
+
+    def _register(self, item):
+        # Keep a saved ID unless it is already taken, otherwise hand out a new one
+        if item.uid is None or self._uid_taken(item.uid):
+            item.uid = self.next_uid
+        self.next_uid = max(self.next_uid, item.uid + 1)
+        if isinstance(item, TaskShape):
+            self.shapes_by_id[item.uid] = item
+            self.analytics.shape_added(item)
+            box = shape_box(item)
+            self._track_bounds(item, box)
+            self.containment.add(item, box, isinstance(item, FrameShape))
+            if self.smart_guides:
+                self.unaligned[item.uid] = item
+            self._schedule_flush()
+            if self.router:
+                self.router.shape_added(item)
+                self._schedule_flush()
+        else:
+            self.connections_by_id[item.uid] = item
+        if self._paging:
+            return
+        self.dirty_ids.add(item.uid)
+        self.deleted_ids.discard(item.uid)
+        if self.model is not None:
+            if isinstance(item, TaskShape):
+                self.model.update(self.shape_to_data(item))
+            else:
+                self.model.add_connection(item.uid, item.start_item.uid, item.end_item.uid)
+
+    def _unregister(self, item):
+        if isinstance(item, TaskShape):
+            self.shapes_by_id.pop(item.uid, None)
+            self.analytics.shape_removed(item)
+            self._track_bounds(item, None)
+            self.containment.remove(item)
+            self.moved_shapes.discard(item)
+            if self.smart_guides:
+                self.unaligned[item.uid] = None
+            if self.router:
+                self.router.shape_removed(item)
+                self._schedule_flush()
+        else:
+            self.connections_by_id.pop(item.uid, None)
+        if self._paging:
+            return
+        removed = [item.uid]
+        if self.model is not None:
+            if isinstance(item, TaskShape):
+                # Along with its connections to tasks that are not on screen
+                removed += self.model.remove(item.uid)
+            else:
+                self.model.remove_connection(item.uid)
+        for uid in removed:
+            self.dirty_ids.discard(uid)
+            self.deleted_ids.add(uid)
+
+    def _uid_taken(self, uid):
+        if uid in self.shapes_by_id or uid in self.connections_by_id:
+            return True
+        # Items built for the viewport keep their task's ID
+        return self.model is not None and not self._paging and (uid in self.model.records or uid in self.model.connections)
 
     def set_tool(self, tool_name):
         self.current_tool = tool_name
@@ -28,14 +227,23 @@ class TaskScene(QGraphicsScene):
             elif self.current_tool != "Select":
                 pos = event.scenePos()
                 self.add_shape_at(pos.x(), pos.y())
+            else:
+                # A drag (or a frame resize) until the release is one undo step
+                if self._press_change:
+                    self.end_change()  # The last release never came
+                self.begin_change(None)
+                self._press_change = True
         super().mousePressEvent(event)
 
     def mouseMoveEvent(self, event):
+        self.mouse_pos = event.scenePos()
         if self.connecting_line:
             line = self.connecting_line.line()
             line.setP2(event.scenePos())
             self.connecting_line.setLine(line)
         super().mouseMoveEvent(event)
+        # Every dragged shape has moved by now; update their connections once
+        self.flush_connections()
 
     def mouseReleaseEvent(self, event):
         if self.connecting_line:
@@ -48,15 +256,24 @@ class TaskScene(QGraphicsScene):
                     break
             
             if target_item:
-                connection = ConnectionLine(self.start_item, target_item)
-                self.addItem(connection)
-                self.start_item.add_connection(connection)
-                target_item.add_connection(connection)
+                connection = self.add_connection(self.start_item, target_item)
+                if connection:
+                    conn_data = self.connection_to_data(connection)
+                    self.push_command(ItemsCommand("Connect", [], [conn_data], True))
+                    if self.journal:
+                        self.journal.record_connect(conn_data)
             
             self.removeItem(self.connecting_line)
             self.connecting_line = None
             self.start_item = None
         super().mouseReleaseEvent(event)
+        self._snap_exclude = None
+        self._set_guides([])
+        if self._press_change:
+            self._press_change = False
+            self.end_change()
+        if self.unaligned:
+            self._schedule_flush()
 
     def add_shape_at(self, x, y):
         shape = None
@@ -72,133 +289,940 @@ class TaskScene(QGraphicsScene):
             shape = FrameShape(x, y)
         
         if shape:
+            if self.snap_grid or self.smart_guides:
+                self.flush_connections()  # Line up with where everything is now
+                dx, dy, _ = self._snap_offset(shape_box(shape), ())
+                shape.moveBy(dx, dy)
             self.addItem(shape)
+            label = "Add Frame" if isinstance(shape, FrameShape) else "Add Task"
+            self.push_command(ItemsCommand(label, [self.shape_to_data(shape)], [], True))
+            if self.journal:
+                self._journal_description(shape)
+                self.journal.record_add(self.shape_to_data(shape))
+
+    def shape_moved(self, shape):
+        if not self._placing:
+            self.moved_shapes.add(shape)
+        if self.smart_guides:
+            self.unaligned[shape.uid] = shape
+        self._schedule_flush()
+        if self.model is not None:
+            pos = shape.scenePos()
+            self.model.move(shape.uid, pos.x(), pos.y())
+        self.schedule_connection_update(shape)
+        self.dirty_ids.add(shape.uid)
+        if self.journal:
+            pos = shape.scenePos()
+            self.journal.record_move(shape, pos.x(), pos.y())
+
+    def schedule_connection_update(self, shape):
+        """Mark a shape's connections for the next flush_connections"""
+        connections = self.graph.incident(shape)
+        if self.router:
+            self.router.shape_moved(shape)  # Other connections may have to go around it
+        elif not connections:
+            return
+        self.dirty_connections.update(connections)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if not self.connection_timer.isActive():
+            # Flushed after the current event at the latest
+            self.connection_timer.start(0)
+
+    def shape_resized(self, shape):
+        """Called while a frame is resized by its handles"""
+        self.moved_shapes.add(shape)
+        if self.model is not None:
+            self.model.update(self.shape_to_data(shape))
+        self.schedule_connection_update(shape)
+
+    def flush_connections(self):
+        self.connection_timer.stop()
+        if self.moved_shapes:
+            self._update_containment()
+        if self.unaligned and self.mouseGrabberItem() is None:
+            # Not mid-drag: whatever is being dragged is never lined up with anyway
+            self._update_alignment()
+        if self._outgrown is not None:
+            self._grow_scene()
+        else:
+            self._adapt_index()
+        if self.dirty_connections:
+            connections = self.dirty_connections
+            self.dirty_connections = set()
+            update_connections(connections)
+        if self.router:
+            self.router.flush()
+
+    def _update_alignment(self):
+        boxes, removed = {}, []
+        for uid, shape in self.unaligned.items():
+            if shape is None:
+                removed.append(uid)
+            elif self.shapes_by_id.get(uid) is shape:
+                boxes[uid] = shape_box(shape)
+        self.unaligned = {}
+        self.alignment.update(boxes, removed)
+
+    def snap_position(self, shape, pos):
+        """Where a shape being dragged to pos goes instead, with snapping on.
+
+        Only a shape dragged on its own snaps; a multi-selection keeps its
+        layout and moves freely. The shape lines up with the nearest edge or
+        center of another shape within SNAP_DISTANCE screen pixels, and
+        otherwise with the grid.
+        """
+        if not (self.snap_grid or self.smart_guides) or self.mouseGrabberItem() is not shape \
+                or getattr(shape, "resizing", False) or len(self.selectedItems()) > 1:
+            return pos
+        if self._snap_exclude is None or self._snap_exclude[0] is not shape:
+            # Not with itself, nor with whatever it takes along (frame contents)
+            exclude = {shape.uid}
+            exclude.update(member.uid for member in self.containment.descendants(shape))
+            self._snap_exclude = (shape, exclude)
+        x1, y1, x2, y2 = shape_box(shape)
+        dx, dy = pos.x() - shape.pos().x(), pos.y() - shape.pos().y()
+        snap_x, snap_y, guides = self._snap_offset((x1 + dx, y1 + dy, x2 + dx, y2 + dy), self._snap_exclude[1])
+        self._set_guides(guides)
+        return QPointF(pos.x() + snap_x, pos.y() + snap_y)
+
+    def _snap_offset(self, box, exclude):
+        """How far to move box to snap it, and the guide lines that show why"""
+        x_match = y_match = None
+        if self.smart_guides:
+            x_match, y_match = self.alignment.snap(box, SNAP_DISTANCE / self._view_scale(), exclude)
+        dx = x_match[0] if x_match else (snap_to_grid(box[0]) - box[0] if self.snap_grid else 0)
+        dy = y_match[0] if y_match else (snap_to_grid(box[1]) - box[1] if self.snap_grid else 0)
+        x1, y1, x2, y2 = box[0] + dx, box[1] + dy, box[2] + dx, box[3] + dy
+
+        # Each guide runs from the snapped box to the box it lines up with
+        guides = []
+        if x_match:
+            other = self.alignment.boxes[x_match[2]]
+            guides.append(QLineF(x_match[1], min(y1, other[1]), x_match[1], max(y2, other[3])))
+        if y_match:
+            other = self.alignment.boxes[y_match[2]]
+            guides.append(QLineF(min(x1, other[0]), y_match[1], max(x2, other[2]), y_match[1]))
+        return dx, dy, guides
+
+    def _set_guides(self, guides):
+        margin = 2 / self._view_scale()  # Guides are drawn a pixel wide at any zoom
+        for line in self.guides + guides:
+            self.update(QRectF(line.p1(), line.p2()).normalized().adjusted(-margin, -margin, margin, margin))
+        self.guides = guides
 
-    def save_to_file(self, filename):
-        data = {
-            "shapes": [],
-            "connections": []
+    def _view_scale(self):
+        views = self.views()
+        return views[0].transform().m11() if views else 1.0
+
+    def set_snap_to_grid(self, enabled):
+        self.snap_grid = enabled
+
+    def set_smart_guides(self, enabled):
+        """Turn lining up with other shapes on or off; the alignment index only exists while it is on"""
+        if enabled == self.smart_guides:
+            return
+        self.smart_guides = enabled
+        self.unaligned = {}
+        self.alignment.clear()
+        if enabled:
+            self.alignment.update({uid: shape_box(shape) for uid, shape in self.shapes_by_id.items()})
+
+    def shape_changed(self, shape):
+        """Called after a shape's data or appearance was edited"""
+        self.dirty_ids.add(shape.uid)
+        render_cache.invalidate(shape)
+        if self.model is not None:
+            self.model.update(self.shape_to_data(shape))
+        self.analytics.status_changed(shape)
+        self.analysis_changed()
+        if self.journal:
+            self._journal_description(shape)
+            self.journal.record_edit(self.shape_to_data(shape))
+
+    def begin_change(self, label, shapes=()):
+        """Start collecting edits into one undo step, labeled label (None: "Move").
+
+        Calls nest; the step is recorded by the outermost end_change. The
+        records of shapes are kept now, so edits to their data (not only
+        moves) are undone; every shape that moves in between is undone
+        anyway, see shape_moving.
+        """
+        self._change_depth += 1
+        if self._change_label is None:
+            self._change_label = label
+        for shape in shapes:
+            if shape.uid not in self._change_records:
+                self._change_records[shape.uid] = self.shape_to_data(shape)
+
+    def end_change(self):
+        """Close a begin_change; the outermost one records what changed since, if anything"""
+        if not self._change_depth:
+            return
+        self._change_depth -= 1
+        if self._change_depth:
+            return
+        self.flush_connections()  # Frames' contents follow their frame first
+        label, records, positions = self._change_label or "Move", self._change_records, self._change_positions
+        self._change_label = None
+        self._change_records = {}
+        self._change_positions = {}
+
+        old_records, new_records = {}, {}
+        for uid, old in records.items():
+            new = self._current_record(uid)
+            if new is not None and new != old:
+                old_records[uid], new_records[uid] = old, new
+        old_positions, new_positions = {}, {}
+        for uid, old in positions.items():
+            if uid in records:
+                continue  # Its record has the position
+            new = self._current_position(uid)
+            if new is not None and new != old:
+                old_positions[uid], new_positions[uid] = old, new
+        if old_records or old_positions:
+            self.push_command(ChangeCommand(label, old_records, new_records, old_positions, new_positions))
+
+    def shape_moving(self, shape):
+        """Called before a shape moves, to undo the move with the change it is part of"""
+        if self._change_depth and shape.uid not in self._change_positions and shape.uid not in self._change_records:
+            pos = shape.scenePos()
+            self._change_positions[shape.uid] = (pos.x(), pos.y())
+
+    def _current_record(self, uid):
+        shape = self.shapes_by_id.get(uid)
+        if shape is not None:
+            return self.shape_to_data(shape)
+        if self.model is not None:
+            self.model.require([uid])
+            record = self.model.records.get(uid)
+            if record is not None:
+                return record.to_data()
+        return None
+
+    def _current_position(self, uid):
+        shape = self.shapes_by_id.get(uid)
+        if shape is not None:
+            pos = shape.scenePos()
+            return (pos.x(), pos.y())
+        if self.model is not None:
+            self.model.require([uid])
+            record = self.model.records.get(uid)
+            if record is not None:
+                return (record.x, record.y)
+        return None
+
+    def push_command(self, command):
+        """Record an edit that was just done (see history.py)"""
+        self.history.push(command)
+        self.history_changed.emit()
+
+    def undo(self):
+        """Undo the last edit; returns its label, None if there was none or one is still in progress"""
+        if self._change_depth:
+            return None
+        self.flush_connections()
+        label = self.history.undo(self)
+        self._history_applied()
+        return label
+
+    def redo(self):
+        if self._change_depth:
+            return None
+        self.flush_connections()
+        label = self.history.redo(self)
+        self._history_applied()
+        return label
+
+    def _history_applied(self):
+        if self.model is not None:
+            self.update_viewport()  # Restored or moved tasks may have come into view
+        self.history_changed.emit()
+
+    def place_shapes(self, positions):
+        """Move shapes by ID ({uid: (x, y)}) for undo and redo, on screen or only in a virtual board's model"""
+        moves = {}
+        for uid, position in positions.items():
+            shape = self.shapes_by_id.get(uid)
+            if shape is not None:
+                moves[shape] = position
+            elif self.model is not None:
+                self.model.require([uid])
+                record = self.model.records.get(uid)
+                if record is not None:
+                    self.model.move(uid, *position)
+                    self.dirty_ids.add(uid)
+                    if self.journal:
+                        self.journal.record_move(record, *position)
+        if moves:
+            self.move_shapes(moves)
+
+    def apply_records(self, records):
+        """Give shapes their saved records again, for undo and redo; position, size and data alike"""
+        positions = {}
+        for shape_data in records:
+            uid = shape_data["id"]
+            shape = self.shapes_by_id.get(uid)
+            if shape is None:
+                if self.model is not None:
+                    self.model.require([uid])
+                    if uid in self.model.records:
+                        self.model.update(shape_data)
+                        self.dirty_ids.add(uid)
+                        if self.journal:
+                            self.journal.record_edit(shape_data)
+                continue
+            self._placing = True  # move_shapes below brings containment up to date
+            self._apply_shape_data(shape, shape_data)
+            self._placing = False
+            self.schedule_connection_update(shape)  # A frame may have changed size
+            positions[shape] = (shape_data["x"], shape_data["y"])
+        if positions:
+            self.move_shapes(positions)
+        for shape in positions:
+            shape.update()
+            self.shape_changed(shape)
+
+    def restore_items(self, shapes, connections):
+        """Put deleted shapes and connections back from their records, with their IDs, in one batch"""
+        if self.model is not None:
+            # Items are built by update_viewport for those in view
+            for shape_data in shapes:
+                self.model.update(shape_data)
+                self.dirty_ids.add(shape_data["id"])
+                self.deleted_ids.discard(shape_data["id"])
+            restored = []
+            for conn_data in connections:
+                ends = (conn_data["start"], conn_data["end"])
+                self.model.require(ends)
+                if ends[0] in self.model.records and ends[1] in self.model.records:
+                    self.model.add_connection(conn_data["id"], *ends)
+                    self.dirty_ids.add(conn_data["id"])
+                    self.deleted_ids.discard(conn_data["id"])
+                    restored.append(conn_data)
+            connections = restored
+        else:
+            suspended = self._suspend_index(len(shapes) + len(connections))
+            for shape_data in shapes:
+                shape = self.create_shape(shape_data)
+                if shape:
+                    self.addItem(shape)
+            restored = []
+            for conn_data in connections:
+                start, end = self.shapes_by_id.get(conn_data["start"]), self.shapes_by_id.get(conn_data["end"])
+                if start and end and self.add_connection(start, end, conn_data["id"]):
+                    restored.append(conn_data)
+            connections = restored
+            self._restore_index(suspended)
+            self.flush_connections()
+        if self.journal:
+            for shape_data in shapes:
+                key = shape_data.get("description_ref")
+                if self.journal.needs_text(key):
+                    self.journal.record_text(key, self.descriptions.get(key))
+                self.journal.record_add(shape_data)
+            for conn_data in connections:
+                self.journal.record_connect(conn_data)
+
+    def delete_ids(self, uids):
+        """Delete shapes and connections by ID, for undo and redo; shapes take their connections along"""
+        removed_ids = []
+        for uid in uids:
+            connection = self.connections_by_id.get(uid)
+            if connection is not None:
+                self.remove_connection(connection)
+                removed_ids.append(uid)
+        shapes = [self.shapes_by_id[uid] for uid in uids if uid in self.shapes_by_id]
+        if shapes:
+            removed_ids += [item.uid for item in self.remove_shapes(shapes)]
+        if self.model is not None:
+            # Tasks and connections that were not on screen
+            self.model.require(uids)
+            for uid in uids:
+                if uid in self.model.records:
+                    removed_ids.append(uid)
+                    for connection in self.model.remove(uid) + [uid]:
+                        self.dirty_ids.discard(connection)
+                        self.deleted_ids.add(connection)
+                elif uid in self.model.connections:
+                    removed_ids.append(uid)
+                    self.model.remove_connection(uid)
+                    self.dirty_ids.discard(uid)
+                    self.deleted_ids.add(uid)
+        if self.journal and removed_ids:
+            self.journal.record_delete_ids(removed_ids)
+
+    def _deleted_records(self, shapes):
+        """Records of shapes and every connection touching them, taken before deleting them"""
+        uids = [shape.uid for shape in shapes]
+        if self.model is not None:
+            connections = self.model.connections_of(uids)  # Also those to tasks not on screen
+        else:
+            connections = {connection.uid for shape in shapes for connection in self.graph.incident(shape)}
+        return self._shape_records(uids), self._connection_records(sorted(connections))
+
+    def analysis_changed(self):
+        if self.show_analysis:
+            self.update()  # Overlays are drawn by TaskCanvas.drawForeground
+
+    def set_show_analysis(self, enabled):
+        self.show_analysis = enabled
+        self.update()
+
+    def _journal_description(self, shape):
+        if self.journal.needs_text(shape.description_ref):
+            self.journal.record_text(shape.description_ref, self.descriptions.get(shape.description_ref))
+
+    def reset_journal(self):
+        """Fold the current board into a fresh journal snapshot"""
+        if self.journal:
+            self.journal.reset(self.to_board_data())
+
+    def autosave(self):
+        if self.journal:
+            self.journal.flush()
+            if self.journal.needs_compaction():
+                self.reset_journal()
+
+    def shape_to_data(self, item):
+        """Build the saved record for a shape"""
+        shape_data = {
+            "id": item.uid,
+            "type": item.__class__.__name__,
+            "x": item.scenePos().x(),
+            "y": item.scenePos().y(),
+            "title": item.title,
+            "category": item.category,
+            "description_ref": item.description_ref,
+            "status": item.status,
+            "custom_bg_color": item.custom_bg_color.name() if item.custom_bg_color else None,
+            "custom_text_color": item.custom_text_color.name() if item.custom_text_color else None
         }
         
-        shape_id_map = {}
-        
-        # Save shapes
-        for item in self.items():
-            if isinstance(item, TaskShape):
-                shape_id = id(item)
-                shape_id_map[shape_id] = len(data["shapes"])
-                
-                shape_data = {
-                    "type": item.__class__.__name__,
-                    "x": item.scenePos().x(),
-                    "y": item.scenePos().y(),
-                    "title": item.title,
-                    "category": item.category,
-                    "description": item.description,
-                    "status": item.status,
-                    "custom_bg_color": item.custom_bg_color.name() if item.custom_bg_color else None,
-                    "custom_text_color": item.custom_text_color.name() if item.custom_text_color else None
-                }
-                
-                # Save Frame-specific properties
-                if isinstance(item, FrameShape):
-                    shape_data["width"] = item.rect().width()
-                    shape_data["height"] = item.rect().height()
-                    shape_data["border_width"] = item.border_width
-                
-                data["shapes"].append(shape_data)
+        # Save Frame-specific properties
+        if isinstance(item, FrameShape):
+            shape_data["width"] = item.rect().width()
+            shape_data["height"] = item.rect().height()
+            shape_data["border_width"] = item.border_width
+        return shape_data
+
+    def connection_to_data(self, conn):
+        return {
+            "id": conn.uid,
+            "start": conn.start_item.uid,
+            "end": conn.end_item.uid
+        }
+
+    def to_board_data(self):
+        if self.is_paged():
+            # Reads every page not in memory; tiled boards are saved with save_pages instead
+            self.flush_connections()
+            return self.model.board_data(self.descriptions.snapshot())
+        # One pass over the registry in ID order, so saves diff cleanly however items were added
+        shape_ids = self.model.records if self.model is not None else self.shapes_by_id
+        connection_ids = self.model.connections if self.model is not None else self.connections_by_id
+        return {
+            "shapes": self._shape_records(sorted(shape_ids)),
+            "connections": self._connection_records(sorted(connection_ids)),
+            "descriptions": self.descriptions.snapshot()
+        }
+
+    def _shape_records(self, uids):
+        """Saved records of the shapes among uids; a virtual board's model has every task, on screen or not"""
+        if self.model is not None:
+            records = self.model.records
+            return [records[uid].to_data() for uid in uids if uid in records]
+        return [self.shape_to_data(self.shapes_by_id[uid]) for uid in uids if uid in self.shapes_by_id]
+
+    def _connection_records(self, uids):
+        if self.model is not None:
+            connections = self.model.connections
+            return [{"id": uid, "start": connections[uid][0], "end": connections[uid][1]}
+                    for uid in uids if uid in connections]
+        return [self.connection_to_data(self.connections_by_id[uid]) for uid in uids if uid in self.connections_by_id]
+
+    def save_to_file(self, filename, binary=None, compress=False):
+        data = self.to_board_data()
+        self.rebind_descriptions(write_board(data, filename, binary, compress), data["descriptions"])
+
+    def detach_descriptions(self):
+        """Read every description the board uses into memory, so the file or database behind them can go"""
+        if self.model is not None:
+            keys = {record.description_ref for record in self.model.records.values()}
+        else:
+            keys = {shape.description_ref for shape in self.shapes_by_id.values()}
+        self.descriptions.detach(keys - {None})
+
+    def rebind_descriptions(self, source, saved):
+        """After saving with saved as the descriptions: read them from the file written (source) from now on"""
+        previous = getattr(saved, "source", None)  # What the store read from when the save began
+        if previous is not None and self.descriptions.rebind(source, previous) and self.journal:
+            self.journal.record_source(source)
+
+    def save_to_store(self, store, board):
+        """Save into a BoardStore, upserting only changed items when already synced with it"""
+        if self.store_binding == (store.path, board):
+            shapes = self._shape_records(self.dirty_ids)
+            connections = self._connection_records(self.dirty_ids)
+            store.upsert(board, shapes, connections, self.deleted_ids, self.descriptions.snapshot())
+        else:
+            store.save_board(board, self.to_board_data())
+        self.mark_synced(store, board)
+
+    def load_from_store(self, store, board):
+        self.load_board_data(store.load_board(board))
+        self.mark_synced(store, board)
+
+    def mark_synced(self, store, board):
+        self.store_binding = (store.path, board)
+        self.dirty_ids.clear()
+        self.deleted_ids.clear()
+
+    def create_shape(self, shape_data):
+        """Build a shape from its saved record (does not add it to the scene)"""
+        shape = None
+        if shape_data["type"] == "RectangleShape":
+            shape = RectangleShape(shape_data["x"], shape_data["y"])
+        elif shape_data["type"] == "CircleShape":
+            shape = CircleShape(shape_data["x"], shape_data["y"])
+        elif shape_data["type"] == "DiamondShape":
+            shape = DiamondShape(shape_data["x"], shape_data["y"])
+        elif shape_data["type"] == "TriangleShape":
+            shape = TriangleShape(shape_data["x"], shape_data["y"])
+        elif shape_data["type"] == "FrameShape":
+            # Load with custom dimensions if available
+            w = shape_data.get("width", 300)
+            h = shape_data.get("height", 200)
+            shape = FrameShape(shape_data["x"], shape_data["y"], w, h)
         
-        # Save connections
-        processed_connections = set()
-        for item in self.items():
-            if isinstance(item, TaskShape):
-                for conn in item.connections:
-                    conn_id = id(conn)
-                    if conn_id not in processed_connections:
-                        processed_connections.add(conn_id)
-                        start_id = id(conn.start_item)
-                        end_id = id(conn.end_item)
-                        
-                        if start_id in shape_id_map and end_id in shape_id_map:
-                            data["connections"].append({
-                                "start": shape_id_map[start_id],
-                                "end": shape_id_map[end_id]
-                            })
+        if shape:
+            self._apply_shape_data(shape, shape_data)
+        return shape
+
+    def _apply_shape_data(self, shape, shape_data):
+        """Give a new or reused shape the data of a saved record"""
+        shape.uid = shape_data.get("id")
+        shape.setPos(shape_data["x"], shape_data["y"])
+        shape.title = shape_data["title"]
+        shape.category = shape_data.get("category", "General")
+        if "description" in shape_data:
+            # Inline text from an older file
+            shape.description_ref = self.descriptions.put(shape_data["description"])
+        else:
+            shape.description_ref = shape_data.get("description_ref")
+        shape.status = shape_data["status"]
+        bg_color, text_color = shape_data.get("custom_bg_color"), shape_data.get("custom_text_color")
+        shape.custom_bg_color = QColor(bg_color) if bg_color else None
+        shape.custom_text_color = QColor(text_color) if text_color else None
         
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+        # Restore Frame-specific properties
+        if isinstance(shape, FrameShape):
+            shape.setRect(0, 0, shape_data.get("width", 300), shape_data.get("height", 200))
+            if "border_width" in shape_data:
+                shape.border_width = shape_data["border_width"]
+
+    def add_connection(self, start_shape, end_shape, uid=None):
+        """Connect two shapes; None if they already are connected that way"""
+        if start_shape is end_shape or self.graph.find(start_shape, end_shape):
+            return None
+        if self.edge_layer:
+            connection = self.edge_layer.create_connection(start_shape, end_shape)
+            connection.uid = uid
+            self._register(connection)
+        else:
+            connection = ConnectionLine(start_shape, end_shape)
+            connection.uid = uid
+            self.addItem(connection)
+        self.graph.add(connection)
+        self.analytics.edge_added(connection)
+        if self.router:
+            self.router.connection_added(connection)
+            self._schedule_flush()
+        self.analysis_changed()
+        return connection
+
+    def remove_connection(self, connection):
+        """Detach a connection from both shapes and take it off the board"""
+        self.graph.remove(connection)
+        self._drop_connection(connection)
+        self.analysis_changed()
+
+    def remove_shapes(self, shapes):
+        """Remove shapes and every connection touching them; returns all removed items"""
+        connections = self.graph.remove_shapes(shapes)
+        suspended = self._suspend_index(len(shapes) + len(connections))
+        if suspended is not None:
+            self.analytics.invalidate()  # Cheaper to rebuild than to follow every removal
+        for connection in connections:
+            self._drop_connection(connection)
+        for shape in shapes:
+            self.removeItem(shape)
+        self._restore_index(suspended)
+        self.analysis_changed()
+        return connections + list(shapes)
+
+    def move_shapes(self, positions):
+        """Move many shapes at once ({shape: (x, y)}); their connections follow in one pass.
+
+        Frames do not take their contents along here, every shape goes
+        exactly where positions says.
+        """
+        suspended = self._suspend_index(2 * len(positions))  # Shapes and about as many connections
+        self._placing = True
+        for shape, (x, y) in positions.items():
+            shape.setPos(x, y)
+        self._placing = False
+        for shape in positions:
+            box = shape_box(shape)
+            self._track_bounds(shape, box)
+            self.containment.move(shape, box)
+        self.flush_connections()
+        self._restore_index(suspended)
+
+    def _update_containment(self):
+        """Take dragged frames' contents along with them, then bring the containment index up to date"""
+        moved = self.moved_shapes
+        self.moved_shapes = set()
+        containment = self.containment
+        moved = [shape for shape in moved if self.shapes_by_id.get(shape.uid) is shape]
+        dragged = [shape for shape in moved if isinstance(shape, FrameShape) and not shape.resizing
+                   and containment.boxes.get(shape) is not None]
+        moved_set = set(moved)
+        for frame in dragged:
+            old_box, box = containment.boxes.get(frame), shape_box(frame)
+            dx, dy = box[0] - old_box[0], box[1] - old_box[1]
+            # Contents that moved themselves (selected along with the frame) are
+            # already in place, and so is whatever is inside them
+            members = containment.descendants(frame, moved_set.__contains__)
+            suspended = self._suspend_index(len(members))
+            self._placing = True
+            for member in members:
+                member.moveBy(dx, dy)
+            self._placing = False
+            self._restore_index(suspended)
+
+        grouped = set()
+        for frame in dragged:
+            group = [frame] + containment.descendants(frame)
+            boxes = {shape: shape_box(shape) for shape in group}
+            for shape, box in boxes.items():
+                self._track_bounds(shape, box)
+            containment.move_group(frame, boxes)
+            grouped.update(group)
+        for shape in moved:
+            if shape not in grouped:
+                box = shape_box(shape)
+                self._track_bounds(shape, box)
+                containment.move(shape, box)
+
+    def _suspend_index(self, count):
+        """Drop the scene index before editing count items; returns what _restore_index needs"""
+        if count < BULK_EDIT_MIN or self.itemIndexMethod() != QGraphicsScene.ItemIndexMethod.BspTreeIndex:
+            return None
+        self.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.NoIndex)
+        return True
+
+    def _restore_index(self, suspended):
+        if suspended is not None:
+            self.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.BspTreeIndex)
+            self._adapt_index()
+
+    def _adapt_index(self):
+        """Set the scene index depth for the current item count and scene size (see bsp_depth)"""
+        if self.itemIndexMethod() != QGraphicsScene.ItemIndexMethod.BspTreeIndex:
+            return
+        x1, y1, x2, y2 = self._room
+        depth = bsp_depth(len(self.shapes_by_id) + len(self.connections_by_id), x2 - x1, y2 - y1)
+        if depth != self.bspTreeDepth():
+            self.setBspTreeDepth(depth)  # Rebuilds the index, so only when it changes
+
+    def _track_bounds(self, shape, box):
+        """A shape was added, moved or (box None) removed; call before containment is told"""
+        self.bounds.replace(self.containment.boxes.get(shape), box)
+        if box is not None and not contains(self._room, box):
+            self._outgrown = box if self._outgrown is None else union(self._outgrown, box)
+            self._schedule_flush()
+
+    def _grow_scene(self):
+        x1, y1, x2, y2 = self._room
+        extra = SCENE_MARGIN + SCENE_GROWTH * max(x2 - x1, y2 - y1)
+        self._set_scene_box(union(self._room, grow(self._outgrown, extra)))
+        self._outgrown = None
+
+    def _set_scene_box(self, box):
+        self._room = box
+        self.setSceneRect(QRectF(box[0], box[1], box[2] - box[0], box[3] - box[1]))
+        self._adapt_index()
+
+    def content_box(self):
+        """(x1, y1, x2, y2) around every shape of the board, None when there are none"""
+        if self.model is not None:
+            return self.model.bounds()
+        self.flush_connections()
+        return self.bounds.get(self.containment.boxes.boxes.values())
+
+    def selection_box(self):
+        """(x1, y1, x2, y2) around the selected shapes, None when none are selected"""
+        self.flush_connections()
+        box = None
+        for item in self.selectedItems():
+            item_box = self.containment.boxes.get(item)
+            if item_box is not None:
+                box = item_box if box is None else union(box, item_box)
+        return box
+
+    def fit_scene_rect(self):
+        """Make the scene rect the board plus a margin, shrinking it if the board got smaller"""
+        box = self.content_box()
+        self._outgrown = None
+        self._set_scene_box(EMPTY_SCENE if box is None else grow(box, SCENE_MARGIN))
+
+    def _drop_connection(self, connection):
+        self.dirty_connections.discard(connection)
+        self.analytics.edge_removed(connection)
+        if self.router:
+            self.router.connection_removed(connection)
+        if isinstance(connection, ConnectionLine):
+            self.removeItem(connection)
+        else:
+            self._unregister(connection)
+            self.edge_layer.remove(connection)
+
+    def connection_at(self, pos):
+        """The connection under a scene position, in either drawing mode"""
+        self.flush_connections()
+        if self.edge_layer:
+            return self.edge_layer.connection_at(pos)
+        for item in self.items(pos):
+            if isinstance(item, ConnectionLine):
+                return item
+        return None
+
+    def set_batched_edges(self, enabled):
+        """Draw connections through an EdgeLayer instead of one item each"""
+        if enabled == (self.edge_layer is not None):
+            return
+        # Rebuild every connection under its own ID; nothing changed as far as saving goes
+        self.analytics.invalidate()
+        connections = [self.connections_by_id[uid] for uid in sorted(self.connections_by_id)]
+        self._paging = True
+        for connection in connections:
+            self.remove_connection(connection)
+        self.edge_layer = EdgeLayer(self) if enabled else None
+        for connection in connections:
+            self.add_connection(connection.start_item, connection.end_item, connection.uid)
+        self._paging = False
+
+    def set_routed_edges(self, enabled):
+        """Draw connections as orthogonal paths around shapes instead of straight lines"""
+        if enabled == (self.router is not None):
+            return
+        if enabled:
+            self.router = EdgeRouter(self)
+            self.router.rebuild()
+            self._schedule_flush()
+        else:
+            self.router.cancel()
+            self.router.deleteLater()
+            self.router = None
+            update_connections(self.connections_by_id.values())
 
     def load_from_file(self, filename):
-        with open(filename, 'r') as f:
-            data = json.load(f)
-        
+        self.load_board_data(read_board(filename))
+
+    def load_board_data(self, data):
         # Clear scene
         self.clear()
+        self.descriptions.reset(data.get("descriptions"))
+        if len(data["shapes"]) >= VIRTUALIZE_MIN:
+            self.start_virtual()
+            shapes = {}  # Saved ID -> ID on the board
+            for index, shape_data in enumerate(data["shapes"]):
+                shapes[shape_data.get("id", index)] = self.add_record(shape_data, index)
+            for conn_data in data["connections"]:
+                self.add_connection_record(shapes.get(conn_data["start"]), shapes.get(conn_data["end"]), conn_data.get("id"))
+            self.finish_virtual()
+            return
         
-        # Load shapes
-        shapes = []
-        for shape_data in data["shapes"]:
-            shape = None
-            if shape_data["type"] == "RectangleShape":
-                shape = RectangleShape(shape_data["x"], shape_data["y"])
-            elif shape_data["type"] == "CircleShape":
-                shape = CircleShape(shape_data["x"], shape_data["y"])
-            elif shape_data["type"] == "DiamondShape":
-                shape = DiamondShape(shape_data["x"], shape_data["y"])
-            elif shape_data["type"] == "TriangleShape":
-                shape = TriangleShape(shape_data["x"], shape_data["y"])
-            elif shape_data["type"] == "FrameShape":
-                # Load with custom dimensions if available
-                w = shape_data.get("width", 300)
-                h = shape_data.get("height", 200)
-                shape = FrameShape(shape_data["x"], shape_data["y"], w, h)
-            
+        # Load shapes, keyed by their saved ID (older files: their index)
+        shapes = {}
+        for index, shape_data in enumerate(data["shapes"]):
+            shape = self.create_shape(shape_data)
             if shape:
-                shape.title = shape_data["title"]
-                shape.category = shape_data.get("category", "General")
-                shape.description = shape_data["description"]
-                shape.status = shape_data["status"]
-                if shape_data.get("custom_bg_color"):
-                    shape.custom_bg_color = QColor(shape_data["custom_bg_color"])
-                if shape_data.get("custom_text_color"):
-                    shape.custom_text_color = QColor(shape_data["custom_text_color"])
-                
-                # Restore Frame-specific properties
-                if isinstance(shape, FrameShape) and "border_width" in shape_data:
-                    shape.border_width = shape_data["border_width"]
-                
                 self.addItem(shape)
-                shapes.append(shape)
+            shapes[shape_data.get("id", index)] = shape
         
         # Load connections
         for conn_data in data["connections"]:
-            start_shape = shapes[conn_data["start"]]
-            end_shape = shapes[conn_data["end"]]
-            connection = ConnectionLine(start_shape, end_shape)
-            self.addItem(connection)
-            start_shape.add_connection(connection)
-            end_shape.add_connection(connection)
+            start_shape = shapes.get(conn_data["start"])
+            end_shape = shapes.get(conn_data["end"])
+            if start_shape and end_shape:
+                self.add_connection(start_shape, end_shape, conn_data.get("id"))
+        self.fit_scene_rect()
+
+    def start_virtual(self):
+        """Make the (empty) board virtual: tasks are added as records (add_record) instead of items"""
+        self.model = TaskModel()
+
+    def add_record(self, shape_data, index=None):
+        """Add a saved shape to a virtual board without building its item; returns its ID, None for an unknown type"""
+        if shape_data.get("type") not in SHAPE_SIZES:
+            return None
+        uid = shape_data.get("id", index)
+        if uid is None or self._uid_taken(uid):
+            uid = self.next_uid
+        self.next_uid = max(self.next_uid, uid + 1)
+        record = TaskRecord(shape_data, uid)
+        if "description" in shape_data:
+            # Inline text from an older file
+            record.description_ref = self.descriptions.put(shape_data["description"])
+        self.model.add(record)
+        self.dirty_ids.add(uid)
+        return uid
+
+    def add_connection_record(self, start, end, uid=None):
+        """Connect two tasks of a virtual board by ID, without building items"""
+        if start is None or end is None or start == end:
+            return
+        if uid is None or self._uid_taken(uid):
+            uid = self.next_uid
+        self.next_uid = max(self.next_uid, uid + 1)
+        self.model.add_connection(uid, start, end)
+        self.dirty_ids.add(uid)
+
+    def is_paged(self):
+        return isinstance(self.model, PagedModel)
+
+    def open_tiled(self, filename, memory_cap=MEMORY_CAP):
+        """Open a tiled board (see tiled_board.py): pages are read as the view reaches them"""
+        board = TiledBoard(filename)
+        self.clear()
+        self.model = PagedModel(board, memory_cap)
+        self.descriptions.reset(self.model.source)
+        self.next_uid = self.model.board.next_uid
+        self.finish_virtual()
+
+    def save_pages(self):
+        """Write the changed pages of a tiled board back to its files"""
+        self.flush_connections()
+        self.model.save(self.descriptions.snapshot(), self.next_uid)
+
+    def save_pages_as(self, filename):
+        """Write a tiled board whole to another file, which is the one edited from then on"""
+        write_tiled(self.to_board_data(), filename, self.model.board.page_size)
+        self.model.rebind(TiledBoard(filename))
+
+    def finish_virtual(self):
+        """Called once a virtual board is loaded: make room for all of it and build the items in view"""
+        self.fit_scene_rect()
+        self.update_viewport()
+
+    def update_viewport(self):
+        """Build items for the tasks near the view and take the others away, on a virtual board.
+
+        Items are kept for selected shapes, for frames' contents (they move
+        along with the frame) and for both ends of every connection shown.
+        Taken-away items go to item_pool and are reused for the next tasks
+        to come into view. Zoomed out past MATERIALIZE_MAX tasks, no items
+        are built and TaskCanvas draws an overview instead. A tiled board's
+        model reads the pages around the view first and drops cold ones
+        after.
+        """
+        views = self.views()
+        if self.model is None or not views:
+            return
+        view = views[0]
+        visible = view.mapToScene(view.viewport().rect()).boundingRect()
+        margin = VIEW_MARGIN * max(visible.width(), visible.height())
+        area = (visible.left() - margin, visible.top() - margin, visible.right() + margin, visible.bottom() + margin)
+        self.flush_connections()
+        model = self.model
+
+        overview = model.count(area) > MATERIALIZE_MAX
+        if not overview:
+            model.load_area(area)
+        wanted = set() if overview else set(model.query(area))
+        for uid in [uid for uid in wanted if model.records[uid].type == "FrameShape"]:
+            box = model.records[uid].box()
+            if model.count(box) <= MATERIALIZE_MAX:
+                model.load_area(box)
+                wanted.update(model.query(box))
+        wanted.update(item.uid for item in self.selectedItems() if isinstance(item, TaskShape))
+        for item in (self.mouseGrabberItem(), self.start_item):
+            if isinstance(item, TaskShape):
+                wanted.add(item.uid)
+        connections = model.connections_of(wanted)
+        for uid in connections:
+            wanted.update(model.connections[uid])
+        model.require(wanted)
+
+        self._paging = True
+        drop = [shape for uid, shape in self.shapes_by_id.items() if uid not in wanted]
+        if drop:
+            self.remove_shapes(drop)  # Their connections go along
+            for shape in drop:
+                pool = self.item_pool.setdefault(type(shape).__name__, [])
+                if len(pool) < POOL_MAX:
+                    pool.append(shape)
+        new = [uid for uid in wanted if uid not in self.shapes_by_id]
+        suspended = self._suspend_index(len(new))
+        for uid in new:
+            record = model.records[uid]
+            pool = self.item_pool.get(record.type)
+            if pool:
+                shape = pool.pop()
+                self._apply_shape_data(shape, record.to_data())
+            else:
+                shape = self.create_shape(record.to_data())
+            self.addItem(shape)
+        for uid in connections:
+            if uid not in self.connections_by_id:
+                start, end = model.connections[uid]
+                self.add_connection(self.shapes_by_id[start], self.shapes_by_id[end], uid)
+        self._restore_index(suspended)
+        self._paging = False
+        model.evict(self.shapes_by_id)
+
+        if overview != self.overview:
+            self.overview = overview
+            self.update()
+
+    def load_from_file_async(self, filename, batch_size=500):
+        """Load a board in the background, adding shapes in batches between event-loop turns"""
+        loader = BoardLoader(self, filename, batch_size)
+        loader.start()
+        return loader
+
+    def auto_layout(self, algorithm):
+        """Rearrange the board in the background (see AutoLayout)"""
+        layouter = AutoLayout(self, algorithm)
+        layouter.start()
+        return layouter
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key.Key_Delete or event.key() == Qt.Key.Key_Backspace:
-            # Get selected items
-            selected_items = self.selectedItems()
+            # Remove selected shapes together with all their connections
+            selected_shapes = [item for item in self.selectedItems() if isinstance(item, TaskShape)]
+            command = None
+            if selected_shapes:
+                # Undone as one batch (see restore_items)
+                command = ItemsCommand("Delete", *self._deleted_records(selected_shapes), False)
+                self.clearSelection()  # One selectionChanged instead of one per shape removed
+            removed = self.remove_shapes(selected_shapes) if selected_shapes else []
             
-            for item in selected_items:
-                if isinstance(item, TaskShape):
-                    # Remove all connections associated with this shape
-                    connections_to_remove = item.connections.copy()
-                    for conn in connections_to_remove:
-                        # Remove from both shapes
-                        if conn in conn.start_item.connections:
-                            conn.start_item.connections.remove(conn)
-                        if conn in conn.end_item.connections:
-                            conn.end_item.connections.remove(conn)
-                        # Remove from scene
-                        self.removeItem(conn)
-                    
-                    # Remove the shape itself
-                    self.removeItem(item)
+            # With no shapes selected, delete the connection under the mouse
+            if not removed and self.mouse_pos is not None:
+                connection = self.connection_at(self.mouse_pos)
+                if connection:
+                    command = ItemsCommand("Delete Connection", [], [self.connection_to_data(connection)], False)
+                    self.remove_connection(connection)
+                    removed.append(connection)
+            
+            if removed:
+                self.push_command(command)
+            if self.journal and removed:
+                self.journal.record_delete(removed)
         
         super().keyPressEvent(event)
 
@@ -216,6 +1240,78 @@ class TaskCanvas(QGraphicsView):
         
         # Zooming
         self._zoom = 0
+
+        # Virtual boards rebuild their items once panning and zooming settle
+        self.viewport_timer = QTimer(self)
+        self.viewport_timer.setSingleShot(True)
+        self.viewport_timer.setInterval(VIEWPORT_DELAY_MS)
+        self.viewport_timer.timeout.connect(self.scene.update_viewport)
+        self.horizontalScrollBar().valueChanged.connect(self.schedule_viewport_update)
+        self.verticalScrollBar().valueChanged.connect(self.schedule_viewport_update)
+
+    def schedule_viewport_update(self):
+        if self.scene.model is not None:
+            self.viewport_timer.start()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.schedule_viewport_update()
+
+    def drawBackground(self, painter, rect):
+        """On a virtual board zoomed out too far for items, how many tasks lie where"""
+        super().drawBackground(painter, rect)
+        scene = self.scene
+        if scene.model is None or not scene.overview:
+            return
+        for x1, y1, x2, y2, count in scene.model.density((rect.left(), rect.top(), rect.right(), rect.bottom())):
+            painter.fillRect(QRectF(x1, y1, x2 - x1, y2 - y1), QColor(56, 142, 209, min(255, 40 + 8 * count)))
+    
+    def drawForeground(self, painter, rect):
+        """Snapping guides, and dependency analysis overlays: critical path, cycles and blocked tasks"""
+        scene = self.scene
+        if scene.guides:
+            pen = QPen(QColor("#ff00ff"), 1)
+            pen.setCosmetic(True)
+            painter.setPen(pen)
+            painter.drawLines(scene.guides)
+        if not scene.show_analysis:
+            return
+        analytics = scene.analytics
+        critical_path = analytics.critical_path()
+        on_path = set(critical_path)
+
+        def overlay_pen(color, width, style=Qt.PenStyle.SolidLine):
+            pen = QPen(QColor(color), width, style)
+            pen.setCosmetic(True)  # Same on-screen width at any zoom
+            return pen
+
+        def draw_connection(connection):
+            if connection.route is not None:
+                if rect.intersects(connection.route.boundingRect()):
+                    painter.drawPolyline(connection.route)
+            elif rect.intersects(QRectF(connection.line().p1(), connection.line().p2()).normalized()):
+                painter.drawLine(connection.line())
+
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.setPen(overlay_pen("#ff9900", 5))
+        for start, end in zip(critical_path, critical_path[1:]):
+            connection = scene.graph.find(start, end)
+            if connection:
+                draw_connection(connection)
+        painter.setPen(overlay_pen("#ff3333", 4, Qt.PenStyle.DashLine))
+        for connection in analytics.cycle_edges:
+            draw_connection(connection)
+
+        blocked_pen = overlay_pen("#ff3333", 3, Qt.PenStyle.DashLine)
+        path_pen = overlay_pen("#ff9900", 3)
+        for item in scene.items(rect):
+            if isinstance(item, TaskShape):
+                if item in on_path:
+                    painter.setPen(path_pen)
+                    painter.drawRect(item.sceneBoundingRect().adjusted(-4, -4, 4, 4))
+                if analytics.is_blocked(item):
+                    painter.setPen(blocked_pen)
+                    painter.drawRect(item.sceneBoundingRect().adjusted(-8, -8, 8, 8))
     
     def wheelEvent(self, event):
         if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
@@ -241,9 +1337,31 @@ class TaskCanvas(QGraphicsView):
             # Move scene to old position
             delta = new_pos - old_pos
             self.translate(delta.x(), delta.y())
+            self._zoom_changed()
         else:
             super().wheelEvent(event)
 
+    def zoom_to_fit(self):
+        """Show the whole board"""
+        self._zoom_to(self.scene.content_box())
+
+    def zoom_to_selection(self):
+        """Show the selected shapes, or the whole board when nothing is selected"""
+        self._zoom_to(self.scene.selection_box() or self.scene.content_box())
+
+    def _zoom_to(self, box):
+        if box is None:
+            return
+        x1, y1, x2, y2 = grow(box, FIT_PADDING)
+        self.fitInView(QRectF(x1, y1, x2 - x1, y2 - y1), Qt.AspectRatioMode.KeepAspectRatio)
+        self._zoom = round(math.log(self.transform().m11()) / math.log(1.25))  # In wheel steps
+        self._zoom_changed()
+
+    def _zoom_changed(self):
+        # Shapes are flat and text-free this far out, antialiasing just costs time
+        self.setRenderHint(QPainter.RenderHint.Antialiasing, self.transform().m11() >= LOD_FLAT)
+        self.schedule_viewport_update()
+
     def set_tool(self, tool_name):
         self.scene.set_tool(tool_name)
         if tool_name == "Select":
@@ -0,0 +1,119 @@
+"""Which shapes lie in which frame.
+
+A shape belongs to the innermost frame whose box fully contains its own,
+and frames nest the same way. Boxes are kept in BoxIndexes (see
+routing.py), so a change only re-examines the shapes and frames around
+it, never the whole board. Works on any hashable keys; no Qt dependency.
+"""
+from routing import BoxIndex, union
+
+
+def _contains(outer, inner):
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+def _area(box):
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+
+class ContainmentIndex:
+    def __init__(self):
+        self.boxes = BoxIndex()  # shape -> box, frames included
+        self.frames = BoxIndex()  # frame -> box
+        self.parent = {}  # shape -> innermost frame containing it
+        self.members = {}  # frame -> shapes directly inside it
+
+    def clear(self):
+        self.boxes.clear()
+        self.frames.clear()
+        self.parent.clear()
+        self.members.clear()
+
+    def add(self, shape, box, is_frame=False):
+        self.boxes.insert(shape, box)
+        if is_frame:
+            self.frames.insert(shape, box)
+            self.members[shape] = set()
+            self._reparent(self.boxes.query(box))  # Whatever it was drawn around now belongs to it
+        else:
+            self._reparent([shape])
+
+    def remove(self, shape):
+        if self.boxes.get(shape) is None:
+            return
+        self._set_parent(shape, None)
+        self.boxes.remove(shape)
+        members = self.members.pop(shape, None)
+        if members is not None:
+            self.frames.remove(shape)
+            for member in members:
+                del self.parent[member]
+            self._reparent(members)  # Up to the next frame out, if any
+
+    def move(self, shape, box):
+        """A shape moved on its own, or a frame was moved or resized without its members"""
+        old = self.boxes.get(shape)
+        self.boxes.insert(shape, box)
+        if shape in self.members:
+            self.frames.insert(shape, box)
+            self._reparent(self.boxes.query(box if old is None else union(old, box)))
+        else:
+            self._reparent([shape])
+
+    def move_group(self, frame, boxes):
+        """A frame moved together with its contents ({shape: new box}); only the frame can change parent"""
+        for shape, box in boxes.items():
+            self.boxes.insert(shape, box)
+            if shape in self.members:
+                self.frames.insert(shape, box)
+        self._reparent([frame])
+
+    def frame_of(self, shape):
+        return self.parent.get(shape)
+
+    def descendants(self, frame, prune=None):
+        """Everything inside a frame, nested frames' contents included.
+
+        prune(shape) can leave out a member and, for a frame, all of its contents.
+        """
+        found = []
+        stack = [frame]
+        while stack:
+            for member in self.members.get(stack.pop(), ()):
+                if prune is not None and prune(member):
+                    continue
+                found.append(member)
+                if member in self.members:
+                    stack.append(member)
+        return found
+
+    def _innermost(self, shape):
+        box = self.boxes.get(shape)
+        own_area = _area(box)
+        frame_boxes = self.frames.boxes
+        best, best_area = None, None
+        for frame in self.frames.query(box):
+            frame_box = frame_boxes[frame]
+            if frame is shape or not _contains(frame_box, box):
+                continue
+            # Only strictly larger frames, so two frames never contain each other
+            area = _area(frame_box)
+            if area > own_area and (best is None or area < best_area):
+                best, best_area = frame, area
+        return best
+
+    def _reparent(self, shapes):
+        for shape in list(shapes):
+            self._set_parent(shape, self._innermost(shape))
+
+    def _set_parent(self, shape, frame):
+        old = self.parent.get(shape)
+        if old is frame:
+            return
+        if old is not None:
+            self.members[old].discard(shape)
+        if frame is None:
+            self.parent.pop(shape, None)
+        else:
+            self.parent[shape] = frame
+            self.members[frame].add(shape)
@@ -0,0 +1,116 @@
+"""Content-addressed storage for task descriptions.
+
+Shapes only keep a description_ref (the SHA-1 of the text, or None when the
+description is empty). The text itself lives in a separate section of the
+board file and is fetched when something actually needs it, such as the
+task dialog.
+"""
+from collections import OrderedDict
+import hashlib
+
+
+def description_key(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def required_text(source, key):
+    """The text of key in source; ValueError if the source does not have it (any more)"""
+    text = source.get(key)
+    if text is None:
+        raise ValueError("Description %s is missing from its source" % key)
+    return text
+
+
+class DescriptionStore:
+    """Descriptions for one board.
+
+    source is whatever the board was loaded from: a plain dict for JSON
+    files or a lazy reader for binary files, and after a save the file
+    saved to (see rebind). Texts fetched from it go through an LRU cache
+    bounded by cache_bytes. Texts entered during the session are kept in
+    local until they are saved or the board is replaced.
+    """
+    def __init__(self, cache_bytes=8 * 1024 * 1024):
+        self.cache_bytes = cache_bytes
+        self.source = {}
+        self.local = {}
+        self._cache = OrderedDict()
+        self._cache_size = 0
+
+    def reset(self, source=None):
+        self.source = source if source is not None else {}
+        self.local = {}
+        self._cache.clear()
+        self._cache_size = 0
+
+    def rebind(self, source, previous):
+        """Read texts from source, the file just saved, instead of previous.
+
+        The file a board was loaded from may be replaced or deleted once it
+        is saved elsewhere. Nothing changes if the board was replaced in the
+        meantime (it no longer reads from previous); returns whether it did.
+        """
+        if self.source is not previous:
+            return False
+        self.source = source
+        # Texts saved with it are read back from the file; newer ones stay
+        self.local = {key: text for key, text in self.local.items() if key not in source}
+        return True
+
+    def detach(self, keys):
+        """Copy the texts of keys out of source and stop reading from it, so it can be closed"""
+        for key in keys:
+            if key not in self.local:
+                text = self.source.get(key)
+                if text is not None:
+                    self.local[key] = text  # A missing one fails the next save (see required_text)
+        self.source = {}
+
+    def put(self, text):
+        """Store a text and return its key; identical texts share one entry"""
+        if not text:
+            return None
+        key = description_key(text)
+        if key not in self.local and key not in self.source:
+            self.local[key] = text
+        return key
+
+    def get(self, key):
+        if key is None:
+            return ""
+        text = self.local.get(key)
+        if text is not None:
+            return text
+        text = self._cache.get(key)
+        if text is not None:
+            self._cache.move_to_end(key)
+            return text
+
+        text = self.source.get(key)
+        if text is None:
+            return ""
+        self._cache[key] = text
+        self._cache_size += len(text)
+        while self._cache_size > self.cache_bytes and len(self._cache) > 1:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_size -= len(evicted)
+        return text
+
+    def snapshot(self):
+        """Read-only view for saving; safe to use from a worker thread"""
+        return _StoreSnapshot(dict(self.local), self.source)
+
+
+class _StoreSnapshot:
+    def __init__(self, local, source):
+        self.local = local
+        self.source = source
+
+    def get(self, key, default=None):
+        text = self.local.get(key)
+        if text is None:
+            text = self.source.get(key)
+        return text if text is not None else default
+
+    def __contains__(self, key):
+        return key in self.local or key in self.source
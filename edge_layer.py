@@ -0,0 +1,185 @@
+"""Batched drawing of connections for boards with very many of them.
+
+Normally every connection is its own ConnectionLine item. In batched mode
+connections are plain BatchedConnection objects, grouped by the grid cell
+of their midpoint into one EdgeBucket item per cell. A bucket draws all of
+its lines in one call, its routed paths and all arrowheads as one path
+each, all rebuilt only after one of its connections moved, so the scene
+index holds a handful of buckets instead of one item per connection.
+"""
+from PyQt6.QtWidgets import QGraphicsItem
+from PyQt6.QtGui import QPen, QPainterPath
+from PyQt6.QtCore import Qt, QRectF, QPointF, QLineF
+
+from geometry import ARROW_SIZE, arrow_head, edge_line
+from shapes import LOD_FLAT, level_of_detail
+
+BUCKET_SIZE = 1000  # Scene units per grid cell
+HIT_TOLERANCE = 5
+
+
+class BatchedConnection:
+    """A connection drawn by an EdgeLayer; same interface as ConnectionLine"""
+    def __init__(self, layer, start_item, end_item):
+        self.uid = None  # Persistent ID, assigned by the scene
+        self.layer = layer
+        self.start_item = start_item
+        self.end_item = end_item
+        self.bucket = None
+        self._line = QLineF()
+        self.arrow_head = None
+        self.route = None  # Orthogonal path (QPolygonF) set by an EdgeRouter, None for a straight line
+        self.update_position()
+
+    def line(self):
+        return self._line
+
+    def update_position(self):
+        self.set_line(edge_line(self.start_item, self.end_item))
+
+    def set_line(self, line, arrow=None):
+        self._line = line
+        self.route = None
+        self.arrow_head = arrow if arrow is not None else arrow_head(line)
+        if self.bucket is not None:
+            self.layer.connection_moved(self)
+
+    def set_route(self, route, arrow):
+        """Follow a routed path instead of the straight line; line() spans its two ends"""
+        self._line = QLineF(route[0], route[len(route) - 1])
+        self.route = route
+        self.arrow_head = arrow
+        if self.bucket is not None:
+            self.layer.connection_moved(self)
+
+    def distance_to(self, pos):
+        """Distance from a scene position to the line, or to the nearest segment of the route"""
+        if self.route is None:
+            return _distance(self._line, pos)
+        route = self.route
+        return min(_distance(QLineF(route[i], route[i + 1]), pos) for i in range(len(route) - 1))
+
+
+def _distance(line, pos):
+    """Distance from a point to a line segment"""
+    length_sq = line.dx() ** 2 + line.dy() ** 2
+    if length_sq == 0:
+        return QLineF(line.p1(), pos).length()
+    t = ((pos.x() - line.x1()) * line.dx() + (pos.y() - line.y1()) * line.dy()) / length_sq
+    t = max(0.0, min(1.0, t))
+    return QLineF(line.pointAt(t), pos).length()
+
+
+class EdgeBucket(QGraphicsItem):
+    """All connections whose midpoint falls in one grid cell"""
+    def __init__(self, layer, key):
+        super().__init__()
+        self.layer = layer
+        self.key = key  # (column, row) of the grid cell
+        self.connections = set()
+        self._bounds = None
+        self._lines = None
+        self._routes = None
+        self._arrows = None
+        self.setZValue(-1)  # Behind shapes, like ConnectionLine
+        self.setAcceptedMouseButtons(Qt.MouseButton.NoButton)  # Never steal clicks from the canvas
+
+    def changed(self):
+        """A connection was added, removed or moved"""
+        self.prepareGeometryChange()
+        self._bounds = None
+        self._lines = None
+        self._routes = None
+        self._arrows = None
+        self.update()
+
+    def boundingRect(self):
+        if self._bounds is None:
+            bounds = QRectF()
+            for connection in self.connections:
+                if connection.route is not None:
+                    bounds = bounds.united(connection.route.boundingRect())
+                else:
+                    bounds = bounds.united(QRectF(connection.line().p1(), connection.line().p2()).normalized())
+            extra = ARROW_SIZE + self.layer.pen.widthF()
+            self._bounds = bounds.adjusted(-extra, -extra, extra, extra)
+        return self._bounds
+
+    def paint(self, painter, option, widget):
+        if self._lines is None:
+            self._lines = [connection.line() for connection in self.connections
+                           if connection.arrow_head and connection.route is None]
+            self._routes = QPainterPath()
+            self._arrows = QPainterPath()
+            for connection in self.connections:
+                if connection.route is not None:
+                    self._routes.addPolygon(connection.route)
+                if connection.arrow_head:
+                    self._arrows.addPolygon(connection.arrow_head)
+                    self._arrows.closeSubpath()
+
+        painter.setPen(self.layer.pen)
+        painter.drawLines(self._lines)
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.drawPath(self._routes)
+        # Arrowheads are a few pixels wide when zoomed out
+        if level_of_detail(painter, option) >= LOD_FLAT:
+            painter.setBrush(self.layer.pen.color())
+            painter.drawPath(self._arrows)
+
+
+class EdgeLayer:
+    def __init__(self, scene):
+        self.scene = scene
+        self.pen = QPen(Qt.GlobalColor.white, 3)
+        self.buckets = {}  # (column, row) -> EdgeBucket
+
+    def create_connection(self, start_item, end_item):
+        connection = BatchedConnection(self, start_item, end_item)
+        self._bucket_for(connection).connections.add(connection)
+        connection.bucket.changed()
+        return connection
+
+    def remove(self, connection):
+        bucket = connection.bucket
+        connection.bucket = None
+        bucket.connections.discard(connection)
+        if bucket.connections:
+            bucket.changed()
+        else:
+            del self.buckets[bucket.key]
+            self.scene.removeItem(bucket)
+
+    def connection_moved(self, connection):
+        old_bucket = connection.bucket
+        if self._key_for(connection) != old_bucket.key:
+            self.remove(connection)
+            self._bucket_for(connection).connections.add(connection)
+            connection.bucket.changed()
+        else:
+            old_bucket.changed()
+
+    def connection_at(self, pos, tolerance=HIT_TOLERANCE):
+        """Closest connection within tolerance of a scene position, or None"""
+        best, best_distance = None, tolerance
+        area = QRectF(pos - QPointF(tolerance, tolerance), pos + QPointF(tolerance, tolerance))
+        for item in self.scene.items(area):
+            if isinstance(item, EdgeBucket) and item.layer is self:
+                for connection in item.connections:
+                    distance = connection.distance_to(pos)
+                    if distance <= best_distance:
+                        best, best_distance = connection, distance
+        return best
+
+    def _key_for(self, connection):
+        center = connection.line().center()
+        return (int(center.x() // BUCKET_SIZE), int(center.y() // BUCKET_SIZE))
+
+    def _bucket_for(self, connection):
+        key = self._key_for(connection)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = EdgeBucket(self, key)
+            self.scene.addItem(bucket)
+        connection.bucket = bucket
+        return bucket
@@ -0,0 +1,208 @@
+"""Connections drawn as orthogonal paths around shapes (see routing.py).
+
+EdgeRouter keeps two BoxIndexes: the scene box of every shape, and for
+every routed connection the area its path depends on. When a shape moves,
+appears or goes away, only the connections whose area overlaps its old or
+new box are routed again, along with the shape's own connections.
+
+A few connections are routed right away; more than ROUTE_SYNC_MAX are
+routed off the GUI thread on a snapshot of the shape boxes, drawn straight
+until their paths arrive. Connections without a path stay straight.
+"""
+from PyQt6.QtCore import QObject, QThread, QPointF, QLineF
+from PyQt6.QtGui import QPolygonF
+
+from geometry import arrow_head, shape_box
+from routing import BoxIndex, route_edge, union
+
+ROUTE_SYNC_MAX = 8  # Connections routed on the GUI thread; more go to a thread
+TRIM_STEPS = 16  # Bisection steps for where a path leaves a shape
+
+
+class _RouteThread(QThread):
+    """Runs route_edge for many connections on plain boxes off the GUI thread"""
+    def __init__(self, boxes, jobs, parent=None):
+        super().__init__(parent)
+        self.boxes = boxes  # {shape uid: box}
+        self.jobs = jobs  # [(start box, end box, (start uid, end uid))]
+        self.results = []  # [(points, area)], one per job
+
+    def run(self):
+        obstacles = BoxIndex()
+        for key, box in self.boxes.items():
+            obstacles.insert(key, box)
+        for start_box, end_box, skip in self.jobs:
+            if self.isInterruptionRequested():
+                return
+            self.results.append(route_edge(obstacles, start_box, end_box, skip))
+
+
+class EdgeRouter(QObject):
+    def __init__(self, scene):
+        super().__init__(scene)
+        self.scene = scene
+        self.obstacles = BoxIndex()  # shape uid -> scene box
+        self.areas = BoxIndex()  # connection -> area its path depends on
+        self.pending = set()  # Connections to route at the next flush
+        self.moved = set()  # Shapes whose box may have changed since the last flush
+        self._thread = None
+        self._connections = []  # Connections being routed by _thread, in job order
+        self._changed = BoxIndex()  # Boxes changed while _thread was running
+
+    def rebuild(self):
+        """Index every shape and route every connection of the scene"""
+        self.clear()
+        for shape in self.scene.shapes_by_id.values():
+            self.obstacles.insert(shape.uid, shape_box(shape))
+        self.pending.update(self.scene.connections_by_id.values())
+
+    def clear(self):
+        self.cancel()
+        self.obstacles.clear()
+        self.areas.clear()
+        self.pending.clear()
+        self.moved.clear()
+
+    def cancel(self):
+        """Drop routing in progress; its connections keep their straight lines"""
+        if self._thread is not None:
+            self._thread.requestInterruption()
+            self._thread.wait()
+            self._thread.deleteLater()
+            self._thread = None
+        self._connections = []
+        self._changed.clear()
+
+    def is_routing(self):
+        return self._thread is not None
+
+    # Board changes
+
+    def shape_added(self, shape):
+        box = shape_box(shape)
+        self.obstacles.insert(shape.uid, box)
+        self._box_changed(box)
+
+    def shape_moved(self, shape):
+        self.moved.add(shape)
+
+    def shape_removed(self, shape):
+        box = self.obstacles.get(shape.uid)
+        self.obstacles.remove(shape.uid)
+        self.moved.discard(shape)
+        if box is not None:
+            self._box_changed(box)
+
+    def connection_added(self, connection):
+        self.pending.add(connection)
+
+    def connection_removed(self, connection):
+        self.pending.discard(connection)
+        self.areas.remove(connection)
+
+    # Routing
+
+    def flush(self):
+        """Route the connections affected by changes since the last flush"""
+        graph = self.scene.graph
+        for shape in self.moved:
+            if self.scene.shapes_by_id.get(shape.uid) is not shape:
+                continue
+            old, new = self.obstacles.get(shape.uid), shape_box(shape)
+            if old == new:
+                continue
+            self.obstacles.insert(shape.uid, new)
+            self._box_changed(new if old is None else union(old, new))
+            self.pending.update(graph.incident(shape))
+        self.moved.clear()
+
+        if not self.pending or self._thread is not None:
+            return  # Anything pending is started when the running batch is done
+        connections = list(self.pending)
+        self.pending.clear()
+        jobs = [self._job(connection) for connection in connections]
+        if len(connections) <= ROUTE_SYNC_MAX:
+            for connection, (start_box, end_box, skip) in zip(connections, jobs):
+                points, area = route_edge(self.obstacles, start_box, end_box, skip)
+                self._apply(connection, points, area)
+            return
+
+        self._connections = connections
+        self._thread = _RouteThread(dict(self.obstacles.boxes), jobs, self)
+        self._thread.finished.connect(self._on_routed)
+        self._thread.start()
+
+    def _job(self, connection):
+        start, end = connection.start_item, connection.end_item
+        return (self.obstacles.get(start.uid) or shape_box(start), self.obstacles.get(end.uid) or shape_box(end),
+                (start.uid, end.uid))
+
+    def _box_changed(self, box):
+        """Reroute every connection whose path may be better or blocked now"""
+        self.pending.update(self.areas.query(box))
+        if self._thread is not None:
+            self._changed.insert(len(self._changed), box)
+
+    def _on_routed(self):
+        thread = self._thread
+        if thread is None or not thread.isFinished():
+            return
+        self._thread = None
+        thread.deleteLater()
+        connections_by_id = self.scene.connections_by_id
+        changed = self._changed
+        for connection, (points, area) in zip(self._connections, thread.results):
+            # Skip connections deleted or queued again in the meantime
+            if connections_by_id.get(connection.uid) is not connection or connection in self.pending:
+                continue
+            self._apply(connection, points, area)
+            if changed and changed.query(area):
+                self.pending.add(connection)  # Routed around boxes that have moved since
+        self._connections = []
+        changed.clear()
+        if self.pending:
+            self.flush()
+
+    def _apply(self, connection, points, area):
+        if points is not None:
+            path = _trim(_trim(points, connection.start_item)[::-1], connection.end_item)[::-1]
+            arrow = arrow_head(QLineF(QPointF(*path[-2]), QPointF(*path[-1]))) if len(path) >= 2 else None
+            if arrow is not None:
+                self.areas.insert(connection, area)
+                connection.set_route(QPolygonF([QPointF(x, y) for x, y in path]), arrow)
+                return
+        # Left straight until one of its shapes moves; on a cluttered board the
+        # areas of these would cover most of it and every move would reroute them
+        self.areas.remove(connection)
+        connection.update_position()
+
+
+def _trim(points, shape):
+    """Drop the part of a path starting inside a shape, so it starts on the shape's outline.
+
+    Paths start at the shape's center, so when the first segment leaves the
+    shape the exit is closed-form; a later segment is bisected.
+    """
+    outline = shape.outline()
+    pos = shape.scenePos()
+    cx, cy = pos.x() + outline.cx, pos.y() + outline.cy
+    for i in range(1, len(points)):
+        x2, y2 = points[i]
+        if not outline.contains(x2 - cx, y2 - cy):
+            break
+    else:
+        return []  # Ends inside the shape
+    if i == 1:
+        offset = outline.exit_point(x2 - cx, y2 - cy)
+        if offset is not None:
+            return [(cx + offset[0], cy + offset[1])] + points[1:]
+    x1, y1 = points[i - 1]
+    inside, outside = 0.0, 1.0
+    for _ in range(TRIM_STEPS):
+        t = (inside + outside) / 2
+        if outline.contains(x1 + (x2 - x1) * t - cx, y1 + (y2 - y1) * t - cy):
+            inside = t
+        else:
+            outside = t
+    t = (inside + outside) / 2
+    return [(x1 + (x2 - x1) * t, y1 + (y2 - y1) * t)] + points[i:]
@@ -0,0 +1,228 @@
+"""Where connections meet shape outlines.
+
+Every shape outline is an ellipse or a convex polygon (rectangles,
+diamonds, triangles). Outlines are built once per kind and size, in the
+shape's local coordinates, and shared by every shape of that size; the
+exit point of a ray from the shape's center is then closed-form.
+
+edge_point answers one (shape, target) pair. edge_points and
+update_connections handle many at once, in one NumPy pass when NumPy is
+installed and the batch is large enough.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, everything works without it
+    np = None
+
+from PyQt6.QtGui import QPolygonF
+from PyQt6.QtCore import QPointF, QLineF
+
+RECT = "rect"
+ELLIPSE = "ellipse"
+DIAMOND = "diamond"
+TRIANGLE = "triangle"
+
+ARROW_SIZE = 15
+VECTORIZE_MIN = 64  # Below this many pairs the per-pair path is faster
+MAX_EDGES = 4  # Most edges of any polygon outline; shorter outlines are padded
+OUTLINE_CACHE_SIZE = 1024  # Frames get a new size on every resize step
+
+_outlines = {}
+
+
+class Outline:
+    """A shape outline in local coordinates.
+
+    Polygons are kept as one (normal, offset) pair per edge: for a ray
+    from the center along d, the exit is at t = min(offset / (normal . d))
+    over the edges the ray is heading out of (normal . d > 0).
+    """
+    def __init__(self, kind, x, y, w, h):
+        self.kind = kind
+        self.cx = x + w / 2
+        self.cy = y + h / 2
+        self.rx = w / 2
+        self.ry = h / 2
+        if kind == RECT:
+            vertices = [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+        elif kind == DIAMOND:
+            vertices = [(x + w / 2, y), (x + w, y + h / 2), (x + w / 2, y + h), (x, y + h / 2)]
+        elif kind == TRIANGLE:
+            vertices = [(x + w / 2, y), (x + w, y + h), (x, y + h)]
+        else:
+            vertices = []
+        self.vertices = vertices
+
+        # Outward normal and center-to-edge offset of each edge (clockwise vertices, y down)
+        self.edges = []
+        for (ax, ay), (bx, by) in zip(vertices, vertices[1:] + vertices[:1]):
+            nx, ny = by - ay, ax - bx
+            self.edges.append((nx, ny, nx * (ax - self.cx) + ny * (ay - self.cy)))
+
+    def exit_point(self, dx, dy):
+        """Offset from the center where a ray along (dx, dy) reaches the outline, or None if beyond (dx, dy)"""
+        if self.kind == ELLIPSE:
+            if dx == 0 and dy == 0:
+                return self.rx, 0.0
+            scale = 1 / math.sqrt((dx / self.rx) ** 2 + (dy / self.ry) ** 2)
+            return dx * scale, dy * scale
+
+        t = math.inf
+        for nx, ny, offset in self.edges:
+            heading = nx * dx + ny * dy
+            if heading > 0:
+                t = min(t, offset / heading)
+        if t > 1:
+            # The target is inside the outline (or is the center)
+            return None
+        return dx * t, dy * t
+
+    def contains(self, dx, dy):
+        """Whether an offset from the center lies inside the outline"""
+        if self.kind == ELLIPSE:
+            return (dx / self.rx) ** 2 + (dy / self.ry) ** 2 <= 1
+        return all(nx * dx + ny * dy <= offset for nx, ny, offset in self.edges)
+
+
+def get_outline(kind, x, y, w, h):
+    """Shared Outline for a kind and local rectangle"""
+    key = (kind, x, y, w, h)
+    shape_outline = _outlines.get(key)
+    if shape_outline is None:
+        if len(_outlines) >= OUTLINE_CACHE_SIZE:
+            _outlines.clear()
+        shape_outline = _outlines[key] = Outline(kind, x, y, w, h)
+    return shape_outline
+
+
+def shape_box(shape):
+    """A shape's outline bounds in scene coordinates, as (x1, y1, x2, y2)"""
+    shape_outline = shape.outline()
+    pos = shape.scenePos()
+    cx, cy = pos.x() + shape_outline.cx, pos.y() + shape_outline.cy
+    return (cx - shape_outline.rx, cy - shape_outline.ry, cx + shape_outline.rx, cy + shape_outline.ry)
+
+
+def edge_point(shape, target):
+    """Where the line from a shape's center to target leaves the shape"""
+    shape_outline = shape.outline()
+    pos = shape.scenePos()
+    cx = pos.x() + shape_outline.cx
+    cy = pos.y() + shape_outline.cy
+    offset = shape_outline.exit_point(target.x() - cx, target.y() - cy)
+    if offset is None:
+        return QPointF(cx, cy)
+    return QPointF(cx + offset[0], cy + offset[1])
+
+
+def edge_points(pairs):
+    """edge_point for many (shape, target) pairs, as a list of [x, y]"""
+    pairs = list(pairs)
+    if np is None or len(pairs) < VECTORIZE_MIN:
+        return [[point.x(), point.y()] for point in (edge_point(shape, target) for shape, target in pairs)]
+    shapes, targets = zip(*pairs)
+    index, arrays = _shape_arrays(shapes)
+    targets = np.array([(target.x(), target.y()) for target in targets])
+    return _exit_points(arrays, np.array([index[shape] for shape in shapes]), targets).tolist()
+
+
+def edge_line(start_item, end_item):
+    """Line between the outlines of two shapes, each end aimed at the other shape's position"""
+    line = QLineF(start_item.scenePos(), end_item.scenePos())
+    return QLineF(start_item.get_edge_point(line.p2()), end_item.get_edge_point(line.p1()))
+
+
+def arrow_head(line):
+    """Triangle at the end of line, or None for a zero-length line"""
+    if line.length() == 0:
+        return None
+    angle = math.atan2(line.dy(), line.dx())
+    arrow_p1 = line.p2() - QPointF(math.cos(angle - math.pi / 6) * ARROW_SIZE,
+                                   math.sin(angle - math.pi / 6) * ARROW_SIZE)
+    arrow_p2 = line.p2() - QPointF(math.cos(angle + math.pi / 6) * ARROW_SIZE,
+                                   math.sin(angle + math.pi / 6) * ARROW_SIZE)
+    return QPolygonF([line.p2(), arrow_p1, arrow_p2])
+
+
+def update_connections(connections):
+    """Recompute the line and arrowhead of many connections"""
+    connections = list(connections)
+    if np is None or len(connections) < VECTORIZE_MIN:
+        for connection in connections:
+            connection.update_position()
+        return
+
+    index, arrays = _shape_arrays([connection.start_item for connection in connections] +
+                                  [connection.end_item for connection in connections])
+    positions = arrays["positions"]
+    start = np.array([index[connection.start_item] for connection in connections])
+    end = np.array([index[connection.end_item] for connection in connections])
+    start_points = _exit_points(arrays, start, positions[end])
+    end_points = _exit_points(arrays, end, positions[start])
+
+    delta = end_points - start_points
+    angle = np.arctan2(delta[:, 1], delta[:, 0])
+    wings = []
+    for offset in (-math.pi / 6, math.pi / 6):
+        wings.append(end_points - ARROW_SIZE * np.stack((np.cos(angle + offset), np.sin(angle + offset)), axis=1))
+    has_length = (delta != 0).any(axis=1)
+
+    rows = zip(connections, start_points.tolist(), end_points.tolist(),
+               wings[0].tolist(), wings[1].tolist(), has_length.tolist())
+    for connection, (x1, y1), (x2, y2), (ax1, ay1), (ax2, ay2), has_arrow in rows:
+        tip = QPointF(x2, y2)
+        arrow = QPolygonF([tip, QPointF(ax1, ay1), QPointF(ax2, ay2)]) if has_arrow else None
+        connection.set_line(QLineF(QPointF(x1, y1), tip), arrow)
+
+
+def _shape_arrays(shapes):
+    """Number each distinct shape and gather its position and outline into arrays"""
+    index = {}
+    for shape in shapes:
+        index.setdefault(shape, len(index))
+    count = len(index)
+    positions = np.empty((count, 2))
+    centers = np.empty((count, 2))
+    radii = np.full((count, 2), np.nan)  # NaN for polygons
+    normals = np.zeros((count, MAX_EDGES, 2))  # Zero normals pad short outlines
+    offsets = np.zeros((count, MAX_EDGES))
+    for shape, i in index.items():
+        shape_outline = shape.outline()
+        pos = shape.scenePos()
+        positions[i] = (pos.x(), pos.y())
+        centers[i] = (pos.x() + shape_outline.cx, pos.y() + shape_outline.cy)
+        if shape_outline.kind == ELLIPSE:
+            radii[i] = (shape_outline.rx, shape_outline.ry)
+        else:
+            for k, (nx, ny, offset) in enumerate(shape_outline.edges):
+                normals[i, k] = (nx, ny)
+                offsets[i, k] = offset
+    return index, {"positions": positions, "centers": centers, "radii": radii,
+                   "normals": normals, "offsets": offsets}
+
+
+def _exit_points(arrays, shape_index, targets):
+    """Outline.exit_point for each shape_index[i] toward targets[i], as scene points"""
+    centers = arrays["centers"][shape_index]
+    radii = arrays["radii"][shape_index]
+    normals = arrays["normals"][shape_index]
+    offsets = arrays["offsets"][shape_index]
+    direction = targets - centers
+
+    # Ellipses: always on the outline, straight right for a zero direction
+    zero = (direction == 0).all(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = 1 / np.sqrt(((direction / radii) ** 2).sum(axis=1))
+        ellipse_offsets = np.where(zero[:, None], np.stack((radii[:, 0], np.zeros(len(radii))), axis=1),
+                                   direction * scale[:, None])
+
+    # Polygons: nearest edge the ray heads out of, the center if the target is inside
+    heading = (normals * direction[:, None, :]).sum(axis=2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(heading > 0, offsets / heading, np.inf).min(axis=1)
+    polygon_offsets = np.where((t <= 1)[:, None], direction * np.where(t <= 1, t, 0)[:, None], 0.0)
+
+    is_ellipse = ~np.isnan(radii[:, 0])
+    return centers + np.where(is_ellipse[:, None], ellipse_offsets, polygon_offsets)
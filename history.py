@@ -0,0 +1,112 @@
+"""Undo and redo for a TaskScene.
+
+Commands hold saved records (see TaskScene.shape_to_data), never items,
+so they still apply after the items were deleted and rebuilt, or taken
+away and reused on a virtual board. Two kinds cover every edit:
+
+    ChangeCommand   shapes edited or moved: their records and positions before and after
+    ItemsCommand    shapes and connections added or deleted, put back or taken away in one batch
+
+A whole drag, resize, dialog edit or multi-selection action is one
+command; the scene collects it between begin_change and end_change. The
+history is bounded by an estimate of the memory its records take, and
+drops its oldest commands past that. No Qt dependency.
+"""
+
+HISTORY_BUDGET = 32 * 1024 * 1024  # Bytes of records kept for undo and redo together
+SHAPE_RECORD_BYTES = 900  # Rough size of one shape record as a dict
+CONNECTION_RECORD_BYTES = 350
+POSITION_BYTES = 200  # One (x, y) before and after
+
+
+class ChangeCommand:
+    def __init__(self, label, old_records, new_records, old_positions, new_positions):
+        self.label = label
+        self.old_records = old_records  # uid -> shape record
+        self.new_records = new_records
+        self.old_positions = old_positions  # uid -> (x, y), for shapes that only moved
+        self.new_positions = new_positions
+        self.size = 2 * SHAPE_RECORD_BYTES * len(old_records) + POSITION_BYTES * len(old_positions)
+
+    def undo(self, scene):
+        scene.apply_records(self.old_records.values())
+        scene.place_shapes(self.old_positions)
+
+    def redo(self, scene):
+        scene.apply_records(self.new_records.values())
+        scene.place_shapes(self.new_positions)
+
+
+class ItemsCommand:
+    def __init__(self, label, shapes, connections, added):
+        self.label = label
+        self.shapes = shapes  # Shape records
+        self.connections = connections  # Connection records
+        self.added = added  # False when the command deleted them
+        self.size = SHAPE_RECORD_BYTES * len(shapes) + CONNECTION_RECORD_BYTES * len(connections)
+
+    def _ids(self):
+        return [data["id"] for data in self.connections] + [data["id"] for data in self.shapes]
+
+    def undo(self, scene):
+        if self.added:
+            scene.delete_ids(self._ids())
+        else:
+            scene.restore_items(self.shapes, self.connections)
+
+    def redo(self, scene):
+        if self.added:
+            scene.restore_items(self.shapes, self.connections)
+        else:
+            scene.delete_ids(self._ids())
+
+
+class UndoHistory:
+    def __init__(self, budget=HISTORY_BUDGET):
+        self.budget = budget
+        self.undo_stack = []  # Oldest first
+        self.redo_stack = []
+        self.size = 0  # Estimated bytes held by both stacks
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.size = 0
+
+    def push(self, command):
+        """Record a command that was just done; whatever could be redone is gone"""
+        self.size -= sum(undone.size for undone in self.redo_stack)
+        self.redo_stack.clear()
+        self.undo_stack.append(command)
+        self.size += command.size
+        # The newest command is kept even when it alone is over budget
+        while self.size > self.budget and len(self.undo_stack) > 1:
+            self.size -= self.undo_stack.pop(0).size
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo_label(self):
+        return self.undo_stack[-1].label if self.undo_stack else None
+
+    def redo_label(self):
+        return self.redo_stack[-1].label if self.redo_stack else None
+
+    def undo(self, scene):
+        if not self.undo_stack:
+            return None
+        command = self.undo_stack.pop()
+        command.undo(scene)
+        self.redo_stack.append(command)
+        return command.label
+
+    def redo(self, scene):
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack.pop()
+        command.redo(scene)
+        self.undo_stack.append(command)
+        return command.label
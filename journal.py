@@ -0,0 +1,213 @@
+"""Append-only edit journal used for autosave and crash recovery.
+
+The journal directory holds a snapshot (a regular JSON board with an extra
+"journal_seq" key) and a journal file with one JSON delta per line. Every
+delta carries a sequence number, so deltas already folded into the snapshot
+are skipped on replay even if a crash hit between writing the snapshot and
+truncating the journal.
+"""
+import json
+import os
+import sqlite3
+
+from board_format import atomic_write, materialize_descriptions, read_board
+from board_store import BoardStore, StoreDescriptions
+
+
+class EditJournal:
+    def __init__(self, directory, compact_after=2000):
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, "autosave.json")
+        self.journal_path = os.path.join(directory, "autosave.journal")
+        self.compact_after = compact_after  # Deltas before compaction is due
+
+        self.seq = 0
+        self.entries_since_snapshot = 0
+
+        self._buffer = []
+        self._pending_moves = {}  # shape id -> (x, y), coalesced until flush
+        self._texts = set()  # Description keys whose text is already journaled
+        self._file = None
+
+    def has_recovery_data(self):
+        return os.path.exists(self.snapshot_path) or os.path.exists(self.journal_path)
+
+    def recover(self):
+        """Replay snapshot plus journal into board data"""
+        return replay(self.snapshot_path, self.journal_path)
+
+    def reset(self, data):
+        """Fold everything into a new snapshot and start an empty journal.
+
+        Texts still in the file or database the board was loaded from are
+        not copied, only a reference to it: replay reads them back from
+        there. Texts only in memory are copied.
+        """
+        self._pending_moves.clear()
+        self._buffer.clear()
+
+        os.makedirs(self.directory, exist_ok=True)
+        descriptions = data.get("descriptions")
+        source = getattr(descriptions, "source", None)
+        if hasattr(source, "reference"):
+            snapshot = dict(data, descriptions=dict(descriptions.local), description_source=source.reference())
+        else:
+            snapshot = materialize_descriptions(data)
+        snapshot["journal_seq"] = self.seq
+        atomic_write(self.snapshot_path, json.dumps(snapshot).encode("utf-8"))
+        self._texts = set(snapshot["descriptions"])
+
+        if self._file:
+            self._file.close()
+        self._file = open(self.journal_path, 'w')
+        self.entries_since_snapshot = 0
+
+    def needs_compaction(self):
+        return self.entries_since_snapshot >= self.compact_after
+
+    def _append(self, entry):
+        self.seq += 1
+        entry["seq"] = self.seq
+        self._buffer.append(entry)
+        self.entries_since_snapshot += 1
+
+    def needs_text(self, key):
+        return key is not None and key not in self._texts
+
+    def record_text(self, key, text):
+        """Journal a description text once; shapes refer to it by key"""
+        self._texts.add(key)
+        self._append({"op": "text", "key": key, "text": text})
+
+    def record_add(self, shape_data):
+        self._append({"op": "add", "shape": shape_data})
+
+    def record_move(self, item, x, y):
+        self._pending_moves[item.uid] = (x, y)
+
+    def record_edit(self, shape_data):
+        self._append({"op": "edit", "shape": shape_data})
+
+    def record_source(self, source):
+        """Descriptions are read from source from now on (see DescriptionStore.rebind)"""
+        if hasattr(source, "reference"):
+            self._append({"op": "source", "source": source.reference()})
+            return
+        for key, text in source.items():
+            if key not in self._texts:
+                self.record_text(key, text)
+
+    def record_connect(self, conn_data):
+        self._append({"op": "connect", "connection": conn_data})
+
+    def record_delete(self, items):
+        self.record_delete_ids([item.uid for item in items])
+
+    def record_delete_ids(self, ids):
+        for item_id in ids:
+            self._pending_moves.pop(item_id, None)
+        if ids:
+            self._append({"op": "delete", "ids": ids})
+
+    def flush(self):
+        """Write buffered deltas to disk; cost depends only on what changed"""
+        if self._pending_moves:
+            for item_id, (x, y) in self._pending_moves.items():
+                self._append({"op": "move", "id": item_id, "x": x, "y": y})
+            self._pending_moves.clear()
+        if not self._buffer or not self._file:
+            return
+        self._file.write("".join(json.dumps(entry) + "\n" for entry in self._buffer))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._buffer.clear()
+
+    def discard(self):
+        """Forget the autosave after a clean shutdown"""
+        if self._file:
+            self._file.close()
+            self._file = None
+        for path in (self.snapshot_path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def replay(snapshot_path, journal_path):
+    if os.path.exists(snapshot_path):
+        snapshot = read_board(snapshot_path)
+    else:
+        snapshot = {"shapes": [], "connections": [], "descriptions": {}}
+    start_seq = snapshot.get("journal_seq", 0)
+
+    shapes = {shape_data["id"]: shape_data for shape_data in snapshot["shapes"]}
+    connections = {conn_data["id"]: conn_data for conn_data in snapshot["connections"]}
+    descriptions = dict(snapshot["descriptions"])
+    reference = snapshot.get("description_source")  # Where the other texts are (see EditJournal.reset)
+
+    if os.path.exists(journal_path):
+        with open(journal_path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # Torn write at the tail, everything before it is good
+                if entry["seq"] <= start_seq:
+                    continue
+                op = entry["op"]
+                if op == "text":
+                    descriptions[entry["key"]] = entry["text"]
+                elif op == "source":
+                    reference = entry["source"]
+                elif op == "add":
+                    shapes[entry["shape"]["id"]] = entry["shape"]
+                elif op == "edit":
+                    if entry["shape"]["id"] in shapes:
+                        shapes[entry["shape"]["id"]] = entry["shape"]
+                elif op == "move":
+                    if entry["id"] in shapes:
+                        shapes[entry["id"]] = dict(shapes[entry["id"]], x=entry["x"], y=entry["y"])
+                elif op == "connect":
+                    connections[entry["connection"]["id"]] = entry["connection"]
+                elif op == "delete":
+                    for item_id in entry["ids"]:
+                        shapes.pop(item_id, None)
+                        connections.pop(item_id, None)
+
+    if reference is not None:
+        _read_texts(reference, shapes.values(), descriptions)
+
+    return {
+        "shapes": list(shapes.values()),
+        "connections": [c for c in connections.values() if c["start"] in shapes and c["end"] in shapes],
+        "descriptions": descriptions
+    }
+
+
+def _read_texts(reference, shapes, descriptions):
+    """Copy the texts the shapes refer to out of the referenced file or database into descriptions.
+
+    Recovery is best effort: a text that can no longer be read is dropped
+    along with the shape's reference to it.
+    """
+    store = None
+    source = {}
+    try:
+        if "file" in reference:
+            source = read_board(reference["file"])["descriptions"]
+        elif os.path.exists(reference.get("store", "")):
+            store = BoardStore(reference["store"])
+            source = StoreDescriptions(store)
+        for shape_data in shapes:
+            key = shape_data.get("description_ref")
+            if key is not None and key not in descriptions:
+                text = source.get(key)
+                if text is not None:
+                    descriptions[key] = text
+    except (OSError, ValueError, KeyError, sqlite3.Error):
+        pass
+    finally:
+        if store is not None:
+            store.close()
+    for shape_data in shapes:
+        if shape_data.get("description_ref") not in descriptions:
+            shape_data["description_ref"] = None
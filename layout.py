@@ -0,0 +1,476 @@
+"""Automatic placement of shapes.
+
+Two algorithms over the board's boxes and connections:
+
+- layered: Sugiyama-style. Cycles are broken by reversing back edges,
+  shapes go into columns by longest path, long connections get dummy
+  nodes, columns are ordered by barycenter sweeps and shapes are pulled
+  toward their neighbors without overlapping.
+- force: force-directed from the current positions, cooling down like
+  Fruchterman-Reingold. Connections are springs (logarithmic, so long ones
+  do not crush everything together), nearby shapes repel each other and a
+  last pass removes any overlap. Repulsion only acts between shapes in
+  neighboring grid cells, so an iteration costs about linear time instead
+  of quadratic.
+
+Frames are clusters: the shapes inside a frame are laid out on their own,
+the frame is resized around them and then placed as one box. Everything
+works on NumPy arrays; no Qt dependency, so it can run in any thread.
+"""
+try:
+    import numpy as np
+except ImportError:  # Auto-layout needs NumPy, the rest of the app does not
+    np = None
+
+HAVE_NUMPY = np is not None
+
+LAYERED = "layered"
+FORCE = "force"
+
+LAYER_GAP = 80  # Between columns of the layered layout
+NODE_GAP = 30  # Between shapes in a column, and around unconnected shapes
+DUMMY_SIZE = 20  # Room kept for a connection passing through a column
+ORDER_SWEEPS = 8
+ALIGN_PASSES = 4
+FORCE_ITERATIONS = 60
+SEPARATE_PASSES = 20  # Overlap removal after the force layout, per round
+SEPARATE_ROUNDS = 5
+MAX_SPREAD = 2.0  # Largest scale-up per round
+ALL_PAIRS_MAX = 64  # Up to this many boxes, pairing everything beats the grid
+FRAME_PADDING = 30  # Around the members of a frame
+FRAME_HEADER = 30  # Extra room above them for the frame's label
+
+
+class LayoutCancelled(Exception):
+    pass
+
+
+def compute_layout(boxes, is_frame, edges, algorithm=LAYERED, check=None):
+    """New (x, y, w, h) of every box; only frames change size.
+
+    boxes is an (n, 4) array of scene rectangles, is_frame marks frames and
+    edges is an (m, 2) array of box indices. check() is called between
+    steps and may raise LayoutCancelled.
+    """
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    is_frame = np.asarray(is_frame, dtype=bool)
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    result = boxes.copy()
+    if not len(boxes):
+        return result
+    check = check or (lambda: None)
+    parents = frame_parents(boxes, is_frame)
+    lifted_edges, edge_groups = _lift_edges(parents, edges)
+
+    # Frames innermost first, so their final size is known when their parent is laid out
+    children = {}
+    for node, parent in enumerate(parents.tolist()):
+        children.setdefault(parent, []).append(node)
+    depth = _depths(parents)
+    frames = sorted((group for group in children if group >= 0), key=lambda group: -depth[group])
+    offsets = np.zeros((len(boxes), 2))  # Top-left relative to the parent frame's
+    for group in frames + [-1]:
+        check()
+        members = np.array(children[group])
+        local = {node: i for i, node in enumerate(children[group])}
+        group_edges = lifted_edges[edge_groups == group]
+        group_edges = np.array([[local[a], local[b]] for a, b in group_edges.tolist()], dtype=np.int64).reshape(-1, 2)
+        sizes = result[members, 2:]
+        if algorithm == FORCE:
+            positions = force_layout(sizes, group_edges, boxes[members, :2], check=check)
+        else:
+            positions = layered_layout(sizes, group_edges, boxes[members, :2], check=check)
+        positions -= positions.min(axis=0)
+        if group >= 0:
+            extent = (positions + sizes).max(axis=0)
+            offsets[members] = positions + (FRAME_PADDING, FRAME_PADDING + FRAME_HEADER)
+            result[group, 2:] = extent + (2 * FRAME_PADDING, 2 * FRAME_PADDING + FRAME_HEADER)
+        else:
+            # The board keeps its top-left corner
+            offsets[members] = positions + boxes[:, :2].min(axis=0)
+
+    # Place members inside their frames, outermost first
+    for node in np.argsort(depth, kind="stable").tolist():
+        parent = parents[node]
+        result[node, :2] = offsets[node] + (result[parent, :2] if parent >= 0 else 0)
+    return result
+
+
+def frame_parents(boxes, is_frame):
+    """Index of the smallest frame containing each box's center, -1 for none"""
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    parents = np.full(len(boxes), -1)
+    frames = np.flatnonzero(is_frame)
+    if not len(frames):
+        return parents
+    centers = boxes[:, :2] + boxes[:, 2:] / 2
+    frame_boxes = boxes[frames]
+    areas = frame_boxes[:, 2] * frame_boxes[:, 3]
+    best_area = np.full(len(boxes), np.inf)
+    for frame, (x, y, w, h), area in zip(frames.tolist(), frame_boxes.tolist(), areas.tolist()):
+        inside = ((centers[:, 0] >= x) & (centers[:, 0] <= x + w) &
+                  (centers[:, 1] >= y) & (centers[:, 1] <= y + h) & (area < best_area))
+        # A frame is only inside frames that are larger than itself
+        inside &= ~is_frame | (boxes[:, 2] * boxes[:, 3] < area)
+        inside[frame] = False
+        parents[inside] = frame
+        best_area[inside] = area
+    return parents
+
+
+def layered_layout(sizes, edges, initial, check=None):
+    """Top-left corners for boxes of the given sizes, connections running left to right"""
+    check = check or (lambda: None)
+    n = len(sizes)
+    positions = np.zeros((n, 2))
+    if not n:
+        return positions
+    edges = _simple_edges(edges)
+    connected = np.zeros(n, dtype=bool)
+    connected[edges.ravel()] = True
+    nodes = np.flatnonzero(connected)
+    if len(nodes):
+        local = np.full(n, -1)
+        local[nodes] = np.arange(len(nodes))
+        positions[nodes] = _layered(sizes[nodes], local[edges], initial[nodes], check)
+    # Unconnected shapes go in a grid below the drawing
+    loose = np.flatnonzero(~connected)
+    if len(loose):
+        top = (positions[nodes, 1] + sizes[nodes, 1]).max() + LAYER_GAP if len(nodes) else 0
+        loose = loose[np.lexsort((initial[loose, 0], initial[loose, 1]))]  # Reading order
+        positions[loose] = _rows(sizes[loose]) + (0, top)
+    return positions
+
+
+def _rows(sizes):
+    """Top-left corners packing boxes in rows, in order, about as wide as the whole is tall"""
+    widths = sizes[:, 0] + NODE_GAP
+    row_width = max(np.sqrt((widths * (sizes[:, 1] + NODE_GAP)).sum()), widths.max())
+    left = np.cumsum(widths) - widths
+    row = (left // row_width).astype(np.int64)
+    _, firsts = np.unique(row, return_index=True)
+    row = np.searchsorted(row[firsts], row)  # Renumber rows without gaps
+    heights = np.zeros(len(firsts))
+    np.maximum.at(heights, row, sizes[:, 1] + NODE_GAP)
+    tops = np.cumsum(heights) - heights
+    return np.stack([left - left[firsts][row], tops[row]], axis=1)
+
+
+def force_layout(sizes, edges, initial, iterations=FORCE_ITERATIONS, check=None):
+    """Top-left corners for boxes of the given sizes, starting from their current ones"""
+    check = check or (lambda: None)
+    n = len(sizes)
+    if n < 2:
+        return np.zeros((n, 2))
+    edges = _simple_edges(edges)
+    radii = np.hypot(sizes[:, 0], sizes[:, 1]) / 2
+    ideal = 2 * np.median(radii) + NODE_GAP  # Preferred distance of two connected shapes
+    # Large boxes (frames) are paired with everything; the grid only has to cover the rest
+    large = radii > np.percentile(radii, 98)
+    reach = ideal + 2 * radii[~large].max()  # Largest spacing of two boxes on the grid
+
+    centers = initial + sizes / 2
+    # Shapes stacked on one spot would never separate
+    centers = centers + np.random.default_rng(0).uniform(-1, 1, centers.shape)
+    temperature = max(np.ptp(centers, axis=0).max(), ideal * np.sqrt(n)) / 10
+    iterations = min(iterations, 10 + 2 * n)  # Small groups settle quickly
+    cooling = (1 / 100) ** (1 / iterations)  # Down to a hundredth by the end
+    start, end = edges[:, 0], edges[:, 1]
+    for _ in range(iterations):
+        check()
+        first, second = _candidate_pairs(centers, large, reach)
+        delta = centers[first] - centers[second]
+        distance_sq = np.maximum((delta ** 2).sum(axis=1), 1.0)
+        # Boxes repel each other until they are their preferred spacing apart
+        spacing = ideal + radii[first] + radii[second]
+        close = distance_sq < spacing ** 2
+        push = delta[close] * (spacing[close] ** 2 / distance_sq[close])[:, None]
+        moves = _scatter(first[close], second[close], push, n)
+
+        delta = centers[start] - centers[end]
+        distance = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 1.0)
+        moves += _scatter(end, start, delta * (ideal * np.log1p(distance / ideal) / distance)[:, None], n)
+
+        length = np.maximum(np.hypot(moves[:, 0], moves[:, 1]), 1e-9)
+        centers += moves * (np.minimum(length, temperature) / length)[:, None]
+        temperature *= cooling
+    return _separate(centers, sizes, large, check) - sizes / 2
+
+
+def _separate(centers, sizes, large, check):
+    """Remove overlaps: push overlapping boxes apart, spread everything out if that stalls"""
+    reach = sizes[~large].max() + NODE_GAP
+    for _ in range(SEPARATE_ROUNDS):
+        for _ in range(SEPARATE_PASSES):
+            check()
+            first, second, delta, overlap = _overlaps(centers, sizes, large, reach)
+            if not len(first):
+                return centers
+            # Along the axis they overlap least on, half each
+            axis = np.argmin(overlap, axis=1)
+            rows = np.arange(len(axis))
+            push = np.zeros_like(delta)
+            direction = np.where(delta[rows, axis] != 0, np.sign(delta[rows, axis]), 1.0)
+            push[rows, axis] = direction * overlap[rows, axis] / 2
+            centers = centers + _scatter(second, first, push, len(centers))
+        # Boxes packed in on all sides cancel each other's pushes; scaling up frees them
+        first, second, delta, overlap = _overlaps(centers, sizes, large, reach)
+        if not len(first):
+            return centers
+        needed = ((np.abs(delta) + overlap) / np.maximum(np.abs(delta), 1.0)).min(axis=1)
+        middle = centers.mean(axis=0)
+        centers = middle + (centers - middle) * min(needed.max(), MAX_SPREAD)
+    return centers
+
+
+def _overlaps(centers, sizes, large, reach):
+    """Pairs of boxes closer than NODE_GAP, with their offset and overlap on each axis"""
+    first, second = _candidate_pairs(centers, large, reach)
+    delta = centers[second] - centers[first]
+    overlap = (sizes[first] + sizes[second]) / 2 + NODE_GAP - np.abs(delta)
+    hit = (overlap > 0).all(axis=1)
+    return first[hit], second[hit], delta[hit], overlap[hit]
+
+
+def _candidate_pairs(centers, large, reach):
+    """Pairs of boxes that may be within reach of each other, each pair once"""
+    if len(centers) <= ALL_PAIRS_MAX:
+        return np.triu_indices(len(centers), 1)
+    small_nodes, large_nodes = np.flatnonzero(~large), np.flatnonzero(large)
+    first, second = _near_pairs(centers[small_nodes], reach)
+    first, second = small_nodes[first], small_nodes[second]
+    if len(large_nodes):
+        # Every large box against every box, large pairs only once
+        n = len(centers)
+        others = np.tile(np.arange(n), len(large_nodes))
+        owners = np.repeat(large_nodes, n)
+        keep = (others != owners) & ~(large[others] & (others < owners))
+        first = np.concatenate([first, owners[keep]])
+        second = np.concatenate([second, others[keep]])
+    return first, second
+
+
+def _scatter(towards, away, vectors, n):
+    """Per-node sum of vectors added at towards and subtracted at away"""
+    moves = np.empty((n, 2))
+    for axis in range(2):
+        moves[:, axis] = np.bincount(towards, vectors[:, axis], n) - np.bincount(away, vectors[:, axis], n)
+    return moves
+
+
+def _layered(sizes, edges, initial, check):
+    n = len(sizes)
+    order = _dfs_order(n, edges)
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    # Reverse connections pointing backwards, which leaves no cycles
+    backwards = rank[edges[:, 0]] > rank[edges[:, 1]]
+    edges = np.where(backwards[:, None], edges[:, ::-1], edges)
+
+    # Longest path layering; edges by source rank see every predecessor of a source first
+    layer = [0] * n
+    for start, end in edges[np.argsort(rank[edges[:, 0]], kind="stable")].tolist():
+        if layer[end] <= layer[start]:
+            layer[end] = layer[start] + 1
+    layer = np.array(layer)
+    check()
+
+    # One dummy node per column a connection passes through
+    span = layer[edges[:, 1]] - layer[edges[:, 0]]
+    long = span > 1
+    counts = span[long] - 1
+    total = int(counts.sum())
+    first_dummy = np.cumsum(counts) - counts
+    owner = np.repeat(np.arange(len(counts)), counts)
+    step = np.arange(total) - np.repeat(first_dummy, counts)
+    dummies = n + np.arange(total)
+    long_edges = edges[long]
+    layer = np.concatenate([layer, layer[long_edges[owner, 0]] + 1 + step])
+    edges = np.concatenate([
+        edges[~long],
+        np.stack([np.where(step == 0, long_edges[owner, 0], dummies - 1), dummies], axis=1),
+        np.stack([dummies[first_dummy + counts - 1], long_edges[counts > 0, 1]], axis=1),
+    ]).astype(np.int64)
+    sizes = np.concatenate([sizes, np.full((total, 2), DUMMY_SIZE, dtype=float)])
+    start_y = np.concatenate([initial[:, 1], initial[long_edges[owner, 0], 1]])
+    count = len(layer)
+    layer_count = int(layer.max()) + 1
+
+    # Nodes of each column, and the connections arriving at / leaving each column
+    column_nodes = np.split(np.argsort(layer, kind="stable"), np.cumsum(np.bincount(layer, minlength=layer_count))[:-1])
+    slot = np.empty(count, dtype=np.int64)
+    for nodes in column_nodes:
+        slot[nodes] = np.arange(len(nodes))
+    by_end = _group(edges, layer[edges[:, 1]], layer_count)
+    by_start = _group(edges, layer[edges[:, 0]], layer_count)
+
+    # Crossing reduction: barycenter sweeps, alternately left to right and back
+    position = np.empty(count)
+    for nodes in column_nodes:
+        position[nodes] = _centered_rank(start_y[nodes])
+    for sweep in range(ORDER_SWEEPS):
+        check()
+        forward = sweep % 2 == 0
+        columns = range(1, layer_count) if forward else range(layer_count - 2, -1, -1)
+        for column in columns:
+            nodes = column_nodes[column]
+            column_edges = by_end[column] if forward else by_start[column]
+            if not len(column_edges):
+                continue
+            here, there = (column_edges[:, 1], column_edges[:, 0]) if forward else column_edges.T
+            sums = np.bincount(slot[here], position[there], len(nodes))
+            degree = np.bincount(slot[here], minlength=len(nodes))
+            current = position[nodes]
+            barycenter = np.where(degree > 0, sums / np.maximum(degree, 1), current)
+            position[nodes] = _centered_rank(np.lexsort((current, barycenter)), ranked=True)
+
+    # Columns left to right, each as wide as its widest shape
+    widths = np.zeros(layer_count)
+    np.maximum.at(widths, layer, sizes[:, 0])
+    column_x = np.concatenate([[0], np.cumsum(widths + LAYER_GAP)[:-1]])
+    x = column_x[layer] + (widths[layer] - sizes[:, 0]) / 2
+
+    # Stack each column in order, then pull shapes level with their neighbors
+    stacking = np.lexsort((position, layer))
+    y = np.empty(count)
+    y[stacking] = _pack(np.zeros(count)[stacking], sizes[stacking, 1], layer[stacking])
+    for column_nodes_y in column_nodes:
+        y[column_nodes_y] -= (y[column_nodes_y] + sizes[column_nodes_y, 1]).max() / 2
+    neighbors = np.concatenate([edges, edges[:, ::-1]])
+    degree = np.bincount(neighbors[:, 0], minlength=count)
+    for _ in range(ALIGN_PASSES):
+        check()
+        middle = y + sizes[:, 1] / 2
+        target = np.bincount(neighbors[:, 0], middle[neighbors[:, 1]], count) / np.maximum(degree, 1)
+        wanted = np.where(degree > 0, target - sizes[:, 1] / 2, y)
+        y[stacking] = _pack(wanted[stacking], sizes[stacking, 1], layer[stacking])
+    return np.stack([x[:n], y[:n]], axis=1)
+
+
+def _pack(wanted, heights, layers):
+    """Top of each box, as close to wanted as possible without overlapping the box above.
+
+    Boxes are sorted by layer, then top to bottom.
+    """
+    if not len(wanted):
+        return wanted
+    # offset: where each box would sit if packed tightly from 0
+    offset = np.cumsum(heights + NODE_GAP) - (heights + NODE_GAP)
+    # Restart the running maximum in every layer by lifting later layers far above earlier ones
+    lift = layers * (np.abs(wanted).max() + offset.max() + 1) * 4
+    return offset + np.maximum.accumulate(wanted - offset + lift) - lift
+
+
+def _centered_rank(values, ranked=False):
+    """Rank of each value (or the ranks of an argsort), centered on zero"""
+    order = values if ranked else np.argsort(values, kind="stable")
+    rank = np.empty(len(order))
+    rank[order] = np.arange(len(order))
+    return rank - (len(order) - 1) / 2
+
+
+def _group(edges, keys, count):
+    order = np.argsort(keys, kind="stable")
+    return np.split(edges[order], np.cumsum(np.bincount(keys, minlength=count))[:-1])
+
+
+def _dfs_order(n, edges):
+    """Nodes in reverse depth-first finishing order: a topological order if there are no cycles"""
+    successors = [[] for _ in range(n)]
+    for start, end in edges.tolist():
+        successors[start].append(end)
+    visited = [False] * n
+    finished = []
+    for root in range(n):
+        if visited[root]:
+            continue
+        visited[root] = True
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if not visited[child]:
+                    visited[child] = True
+                    stack.append((child, iter(successors[child])))
+                    break
+            else:
+                stack.pop()
+                finished.append(node)
+    finished.reverse()
+    return np.array(finished, dtype=np.int64)
+
+
+def _simple_edges(edges):
+    """Edges without self loops or duplicates in either direction"""
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    if not len(edges):
+        return edges
+    _, keep = np.unique(np.sort(edges, axis=1), axis=0, return_index=True)
+    return edges[np.sort(keep)]
+
+
+def _depths(parents):
+    depth = np.zeros(len(parents), dtype=np.int64)
+    current = parents.copy()
+    while (current >= 0).any():
+        inside = current >= 0
+        depth[inside] += 1
+        current[inside] = parents[current[inside]]
+    return depth
+
+
+def _lift_edges(parents, edges):
+    """Each edge as the two members of the innermost frame (or board, -1) holding both ends"""
+    depth = _depths(parents)
+    start, end = edges[:, 0].copy(), edges[:, 1].copy()
+    # Climb the deeper end until both are equally deep, then both until they share a parent
+    while True:
+        deeper = depth[start] > depth[end]
+        if deeper.any():
+            start[deeper] = parents[start[deeper]]
+            continue
+        deeper = depth[end] > depth[start]
+        if deeper.any():
+            end[deeper] = parents[end[deeper]]
+            continue
+        apart = parents[start] != parents[end]
+        if not apart.any():
+            break
+        start[apart] = parents[start[apart]]
+        end[apart] = parents[end[apart]]
+    # Edges into a frame's own member stay inside that frame and need no place
+    keep = start != end
+    return np.stack([start, end], axis=1)[keep], parents[start][keep]
+
+
+def _near_pairs(points, reach):
+    """Index pairs (i, j), i != j, of points in the same or neighboring grid cells of size reach"""
+    cells = np.floor(points / reach).astype(np.int64)
+    cells -= cells.min(axis=0) - 1
+    height = int(cells[:, 1].max()) + 2
+    keys = cells[:, 0] * height + cells[:, 1]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    cell_keys, cell_starts, cell_counts = np.unique(sorted_keys, return_index=True, return_counts=True)
+    firsts, seconds = [], []
+    # Each pair once: the own cell (later points only) and four of the eight neighbors
+    for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+        wanted = sorted_keys + dx * height + dy
+        index = np.minimum(np.searchsorted(cell_keys, wanted), len(cell_keys) - 1)
+        found = cell_keys[index] == wanted
+        starts = np.where(found, cell_starts[index], 0)
+        counts = np.where(found, cell_counts[index], 0)
+        if dx == 0 and dy == 0:
+            after = np.arange(len(order)) + 1
+            counts = starts + counts - after
+            starts = after
+        total = int(counts.sum())
+        if not total:
+            continue
+        flat = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        firsts.append(np.repeat(order, counts))
+        seconds.append(order[flat])
+    if not firsts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(firsts), np.concatenate(seconds)
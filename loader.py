@@ -0,0 +1,198 @@
+from collections import deque
+import struct
+import time
+
+from PyQt6.QtCore import QObject, QThread, QTimer, pyqtSignal
+
+from board_format import read_board
+from task_model import VIRTUALIZE_MIN
+
+
+class _ParseThread(QThread):
+    """Parses a board file off the GUI thread and hands records over in chunks"""
+    shapes_parsed = pyqtSignal(list)
+    connections_parsed = pyqtSignal(list)
+    header_parsed = pyqtSignal(int, int)  # shape count, connection count
+    descriptions_parsed = pyqtSignal(object)  # dict or lazy reader, see board_format
+    failed = pyqtSignal(str)
+
+    def __init__(self, filename, chunk_size, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+        self.chunk_size = chunk_size
+
+    def run(self):
+        try:
+            data = read_board(self.filename)
+            shapes = data["shapes"]
+            # Drop dangling connections up front so nothing waits on a missing shape
+            shape_ids = {shape_data.get("id", index) for index, shape_data in enumerate(shapes)}
+            connections = [c for c in data["connections"] if c["start"] in shape_ids and c["end"] in shape_ids]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError, struct.error) as e:
+            # Also records of the wrong shape: a connection without an end, a shape that is not an object
+            self.failed.emit("Could not read %s:\n%s" % (self.filename, e))
+            return
+
+        self.header_parsed.emit(len(shapes), len(connections))
+        self.descriptions_parsed.emit(data["descriptions"])
+        # Connections go first so they can be resolved as their endpoints arrive
+        self.connections_parsed.emit(connections)
+        for start in range(0, len(shapes), self.chunk_size):
+            if self.isInterruptionRequested():
+                return
+            self.shapes_parsed.emit(shapes[start:start + self.chunk_size])
+
+
+class BoardLoader(QObject):
+    """Streams a board file into a TaskScene without blocking the event loop.
+
+    Parsing happens in a worker thread. Shape records are queued and added to
+    the scene in bounded batches from a zero-interval timer, so the view keeps
+    painting and handling input between batches. A connection is added as soon
+    as both of its endpoints exist. Boards of VIRTUALIZE_MIN tasks or more are
+    loaded as records only (see TaskScene.update_viewport).
+    """
+    progress = pyqtSignal(int, int)  # records done, records total
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, scene, filename, batch_size=500, time_budget=0.012):
+        super().__init__(scene)
+        self.scene = scene
+        self.filename = filename
+        self.batch_size = batch_size
+        self.time_budget = time_budget  # Seconds of GUI time per batch
+
+        self._pending_shapes = deque()
+        self._pending_connections = {}  # missing endpoint ID -> [connection records]
+        self._shapes = {}  # Saved ID -> shape, or its ID on a virtual board (None for unknown types)
+        self._index = 0  # File position, the ID of shapes saved without one
+        self._total = 0
+        self._done = 0
+        self._parse_done = False
+        self._running = False
+
+        self._thread = _ParseThread(filename, batch_size, self)
+        self._thread.header_parsed.connect(self._on_header)
+        self._thread.descriptions_parsed.connect(self.scene.descriptions.reset)
+        self._thread.connections_parsed.connect(self._on_connections)
+        self._thread.shapes_parsed.connect(self._on_shapes)
+        self._thread.failed.connect(self._on_failed)
+        self._thread.finished.connect(self._on_parse_finished)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._process_batch)
+
+    def start(self):
+        self.scene.clear()
+        self._running = True
+        self._thread.start()
+        self._timer.start()
+
+    def is_running(self):
+        return self._running
+
+    def cancel(self):
+        """Stop loading and drop whatever was added so far"""
+        if not self._running:
+            return
+        self._stop()
+        self.scene.clear()
+        self.cancelled.emit()
+        self._release()
+
+    def _stop(self):
+        self._running = False
+        self._timer.stop()
+        self._thread.requestInterruption()
+        self._thread.wait()
+        self._pending_shapes.clear()
+        self._pending_connections.clear()
+
+    def _release(self):
+        """Done: drop the map of loaded shapes and let Qt delete the loader and its thread"""
+        self._shapes = {}
+        self._pending_shapes.clear()
+        self._pending_connections.clear()
+        self._thread.deleteLater()
+        self.deleteLater()
+
+    def _on_header(self, shape_count, connection_count):
+        self._total = shape_count + connection_count
+        if shape_count >= VIRTUALIZE_MIN:
+            self.scene.start_virtual()
+        self.progress.emit(self._done, self._total)
+
+    def _on_connections(self, connections):
+        for conn_data in connections:
+            self._resolve_connection(conn_data)
+
+    def _resolve_connection(self, conn_data):
+        """Add a connection, or park it on the first endpoint that hasn't arrived yet"""
+        for uid in (conn_data["start"], conn_data["end"]):
+            if uid not in self._shapes:
+                self._pending_connections.setdefault(uid, []).append(conn_data)
+                return 0
+        start_shape = self._shapes[conn_data["start"]]
+        end_shape = self._shapes[conn_data["end"]]
+        if self.scene.model is not None:
+            self.scene.add_connection_record(start_shape, end_shape, conn_data.get("id"))
+        elif start_shape and end_shape:
+            self.scene.add_connection(start_shape, end_shape, conn_data.get("id"))
+        self._done += 1
+        return 1
+
+    def _on_shapes(self, records):
+        if self._running:
+            self._pending_shapes.extend(records)
+
+    def _on_failed(self, message):
+        if not self._running:
+            return  # Cancelled before the failure was delivered
+        self._stop()
+        self.failed.emit(message)
+        self._release()
+
+    def _on_parse_finished(self):
+        self._parse_done = True
+
+    def _process_batch(self):
+        deadline = time.perf_counter() + self.time_budget
+        count = 0
+        while self._pending_shapes and count < self.batch_size:
+            shape_data = self._pending_shapes.popleft()
+            if self.scene.model is not None:
+                shape = self.scene.add_record(shape_data, self._index)
+            else:
+                shape = self.scene.create_shape(shape_data)
+                if shape:
+                    self.scene.addItem(shape)
+            uid = shape_data.get("id", self._index)
+            self._index += 1
+            self._shapes[uid] = shape
+            self._done += 1
+            count += 1
+
+            # Retry connections that were waiting on this shape
+            for conn_data in self._pending_connections.pop(uid, ()):
+                count += self._resolve_connection(conn_data)
+
+            if time.perf_counter() >= deadline:
+                break
+
+        if count:
+            self.progress.emit(self._done, self._total)
+
+        if self._parse_done and not self._pending_shapes and self._running:
+            self._running = False
+            self._timer.stop()
+            self._pending_connections.clear()
+            if self.scene.model is not None:
+                self.scene.finish_virtual()
+            else:
+                self.scene.fit_scene_rect()
+            self.progress.emit(self._total, self._total)
+            self.finished.emit()
+            self._release()
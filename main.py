@@ -1,9 +1,31 @@
 import sys
-from PyQt6.QtWidgets import QApplication, QMainWindow, QToolBar, QWidget, QVBoxLayout, QFileDialog, QColorDialog, QSpinBox, QLabel
+from PyQt6.QtWidgets import QApplication, QMainWindow, QToolBar, QWidget, QVBoxLayout, QFileDialog, QColorDialog, QSpinBox, QLabel, QProgressDialog, QMessageBox, QInputDialog
 from PyQt6.QtGui import QAction, QIcon, QActionGroup, QPixmap, QPainter, QColor, QPolygonF, QPen
-from PyQt6.QtCore import Qt, QSize, QPointF
+from PyQt6.QtCore import Qt, QSize, QPointF, QTimer
 from styles import DARK_THEME
 from canvas import TaskCanvas
+from board_format import BINARY_EXTENSION, detect_format
+from saver import BoardSaver
+from board_store import BoardStore
+from journal import EditJournal
+from layout import HAVE_NUMPY, LAYERED, FORCE
+from snapping import GRID_SIZE
+from tiled_board import MEMORY_CAP, TILED_EXTENSION, is_tiled_board, write_tiled
+import os
+
+AUTOSAVE_DIR = os.path.join(os.path.expanduser("~"), ".schematic_task_tracker")
+AUTOSAVE_INTERVAL_MS = 1000
+
+# Save dialog filter -> (binary, compress)
+SAVE_FILTERS = {
+    "JSON Files (*.json)": (False, False),
+    "Binary Board (*%s)" % BINARY_EXTENSION: (True, False),
+    "Compressed Binary Board (*%s)" % BINARY_EXTENSION: (True, True),
+}
+TILED_FILTER = "Tiled Board (*%s)" % TILED_EXTENSION
+DATABASE_FILTER = "Board Database (*.sqlite *.db)"
+LOAD_FILTERS = "Task Boards (*.json *%s *%s);;JSON Files (*.json);;Binary Board (*%s);;%s" % (
+    BINARY_EXTENSION, TILED_EXTENSION, BINARY_EXTENSION, TILED_FILTER)
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -33,8 +55,59 @@ class MainWindow(QMainWindow):
         self.canvas = TaskCanvas()
         self.layout.addWidget(self.canvas)
         
+        # Background board loader (see load_file)
+        self.loader = None
+        
+        # Background auto-layout (see auto_layout)
+        self.layouter = None
+        
+        # Background saver, reports progress in the status bar
+        self.current_file = None
+        self.current_format = (None, False)  # (binary, compress)
+        self.saver = BoardSaver(self.canvas.scene, self)
+        self.saver.started.connect(lambda filename: self.statusBar().showMessage("Saving %s..." % filename))
+        self.saver.saved.connect(lambda filename: self.statusBar().showMessage("Saved %s" % filename, 3000))
+        self.saver.failed.connect(self.on_save_failed)
+        self.board_store = None  # Open BoardStore (see save_to_database)
+        self.page_memory_cap = MEMORY_CAP  # For tiled boards (see set_page_memory_cap)
+        
         # Connect selection change to update border width display
         self.canvas.scene.selectionChanged.connect(self.update_border_width_display)
+        
+        # Undo and redo name what they would undo and redo
+        self.canvas.scene.history_changed.connect(self.update_undo_actions)
+        self.update_undo_actions()
+        
+        # Autosave: edits are journaled continuously, recovered after a crash
+        self.journal = EditJournal(AUTOSAVE_DIR)
+        self.recover_autosave()
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setInterval(AUTOSAVE_INTERVAL_MS)
+        self.autosave_timer.timeout.connect(self.canvas.scene.autosave)
+        self.autosave_timer.start()
+
+    def recover_autosave(self):
+        scene = self.canvas.scene
+        if self.journal.has_recovery_data():
+            answer = QMessageBox.question(self, "Recover Board",
+                                          "The previous session did not close cleanly. Recover its unsaved board?")
+            if answer == QMessageBox.StandardButton.Yes:
+                scene.load_board_data(self.journal.recover())
+        scene.journal = self.journal
+        scene.reset_journal()
+        self.update_analysis_action()
+
+    def closeEvent(self, event):
+        self.autosave_timer.stop()
+        if self.layouter:
+            self.layouter.cancel()
+        if self.canvas.scene.router:
+            self.canvas.scene.router.cancel()
+        self.saver.wait()
+        if self.board_store:
+            self.board_store.close()
+        self.journal.discard()
+        super().closeEvent(event)
 
     def setup_menu(self):
         menubar = self.menuBar()
@@ -45,20 +118,284 @@ class MainWindow(QMainWindow):
         save_action.triggered.connect(self.save_file)
         file_menu.addAction(save_action)
         
+        save_as_action = QAction("Save As...", self)
+        save_as_action.setShortcut("Ctrl+Shift+S")
+        save_as_action.triggered.connect(self.save_file_as)
+        file_menu.addAction(save_as_action)
+        
         load_action = QAction("Load", self)
         load_action.setShortcut("Ctrl+O")
         load_action.triggered.connect(self.load_file)
         file_menu.addAction(load_action)
+        
+        file_menu.addSeparator()
+        
+        save_db_action = QAction("Save to Database...", self)
+        save_db_action.triggered.connect(self.save_to_database)
+        file_menu.addAction(save_db_action)
+        
+        open_db_action = QAction("Open from Database...", self)
+        open_db_action.triggered.connect(self.open_from_database)
+        file_menu.addAction(open_db_action)
+        
+        file_menu.addSeparator()
+        
+        memory_cap_action = QAction("Page Memory Limit...", self)
+        memory_cap_action.setToolTip("How much of a tiled board to keep in memory before unused pages are dropped")
+        memory_cap_action.triggered.connect(self.set_page_memory_cap)
+        file_menu.addAction(memory_cap_action)
+        
+        edit_menu = menubar.addMenu("Edit")
+        
+        self.undo_action = QAction("Undo", self)
+        self.undo_action.setShortcut("Ctrl+Z")
+        self.undo_action.triggered.connect(lambda: self.canvas.scene.undo())
+        edit_menu.addAction(self.undo_action)
+        
+        self.redo_action = QAction("Redo", self)
+        self.redo_action.setShortcuts(["Ctrl+Y", "Ctrl+Shift+Z"])
+        self.redo_action.triggered.connect(lambda: self.canvas.scene.redo())
+        edit_menu.addAction(self.redo_action)
+        
+        view_menu = menubar.addMenu("View")
+        
+        zoom_fit_action = QAction("Zoom to Fit", self)
+        zoom_fit_action.setShortcut("Ctrl+0")
+        zoom_fit_action.triggered.connect(lambda: self.canvas.zoom_to_fit())
+        view_menu.addAction(zoom_fit_action)
+        
+        zoom_selection_action = QAction("Zoom to Selection", self)
+        zoom_selection_action.setShortcut("Ctrl+Alt+0")
+        zoom_selection_action.triggered.connect(lambda: self.canvas.zoom_to_selection())
+        view_menu.addAction(zoom_selection_action)
+        
+        view_menu.addSeparator()
+        
+        batched_edges_action = QAction("Batched Connections", self)
+        batched_edges_action.setCheckable(True)
+        batched_edges_action.setToolTip("Draw connections in a few layers instead of one item each (faster on large boards)")
+        batched_edges_action.toggled.connect(lambda checked: self.canvas.scene.set_batched_edges(checked))
+        view_menu.addAction(batched_edges_action)
+
+        routed_edges_action = QAction("Routed Connections", self)
+        routed_edges_action.setCheckable(True)
+        routed_edges_action.setToolTip("Lay connections out as right-angled paths around shapes")
+        routed_edges_action.toggled.connect(lambda checked: self.canvas.scene.set_routed_edges(checked))
+        view_menu.addAction(routed_edges_action)
+
+        snap_grid_action = QAction("Snap to Grid", self)
+        snap_grid_action.setCheckable(True)
+        snap_grid_action.setToolTip("Place and drag shapes on a %d-pixel grid" % GRID_SIZE)
+        snap_grid_action.toggled.connect(lambda checked: self.canvas.scene.set_snap_to_grid(checked))
+        view_menu.addAction(snap_grid_action)
+
+        smart_guides_action = QAction("Smart Guides", self)
+        smart_guides_action.setCheckable(True)
+        smart_guides_action.setToolTip("Line dragged shapes up with the edges and centers of other shapes")
+        smart_guides_action.toggled.connect(lambda checked: self.canvas.scene.set_smart_guides(checked))
+        view_menu.addAction(smart_guides_action)
+        
+        self.analysis_action = QAction("Dependency Analysis", self)
+        self.analysis_action.setCheckable(True)
+        self.analysis_action.setToolTip("Outline blocked tasks, cycles and the critical path")
+        self.analysis_action.toggled.connect(self.toggle_analysis)
+        view_menu.addAction(self.analysis_action)
+        
+        arrange_menu = menubar.addMenu("Arrange")
+        
+        layered_action = QAction("Auto Layout: Layered", self)
+        layered_action.setToolTip("Arrange tasks in columns so connections run left to right")
+        layered_action.triggered.connect(lambda: self.auto_layout(LAYERED))
+        arrange_menu.addAction(layered_action)
+        
+        force_action = QAction("Auto Layout: Force-Directed", self)
+        force_action.setToolTip("Pull connected tasks together and push the others apart")
+        force_action.triggered.connect(lambda: self.auto_layout(FORCE))
+        arrange_menu.addAction(force_action)
+        
+        if not HAVE_NUMPY:
+            for action in (layered_action, force_action):
+                action.setEnabled(False)
+                action.setToolTip("Auto layout needs NumPy")
+
+    def update_analysis_action(self):
+        """Dependency analysis only covers tasks that have items, so it is off on virtual boards"""
+        available = self.canvas.scene.model is None
+        if not available:
+            self.analysis_action.setChecked(False)
+        self.analysis_action.setEnabled(available)
+        self.analysis_action.setToolTip("Outline blocked tasks, cycles and the critical path" if available
+                                        else "Dependency analysis is not available on boards this large")
+
+    def toggle_analysis(self, enabled):
+        scene = self.canvas.scene
+        scene.set_show_analysis(enabled)
+        if enabled:
+            analytics = scene.analytics
+            self.statusBar().showMessage("%d blocked, %d cycle(s), critical path of %d task(s)" % (
+                len(analytics.blocked_shapes()), len(analytics.cycles()), len(analytics.critical_path())))
+
+    def auto_layout(self, algorithm):
+        if self.canvas.scene.model is not None:
+            # Only the tasks near the view have items to arrange
+            self.statusBar().showMessage("Auto layout is not available on boards this large", 5000)
+            return
+        if self.layouter and self.layouter.is_running():
+            self.layouter.cancel()
+        self.statusBar().showMessage("Arranging board...")
+        self.layouter = self.canvas.scene.auto_layout(algorithm)
+        self.layouter.finished.connect(lambda: self.statusBar().showMessage("Board arranged", 3000))
+        self.layouter.failed.connect(lambda message: self.statusBar().showMessage("Auto layout failed: %s" % message, 5000))
 
     def save_file(self):
-        filename, _ = QFileDialog.getSaveFileName(self, "Save Task Board", "", "JSON Files (*.json)")
+        if not self.current_file:
+            self.save_file_as()
+            return
+        if is_tiled_board(self.current_file):
+            self.save_tiled(self.current_file)
+            return
+        binary, compress = self.current_format
+        self.saver.save(self.current_file, binary, compress)
+
+    def save_file_as(self):
+        filters = list(SAVE_FILTERS) + [TILED_FILTER]
+        filename, selected_filter = QFileDialog.getSaveFileName(self, "Save Task Board", "", ";;".join(filters))
         if filename:
-            self.canvas.scene.save_to_file(filename)
+            if selected_filter == TILED_FILTER or is_tiled_board(filename):
+                if not is_tiled_board(filename):
+                    filename += TILED_EXTENSION
+                self.current_file = filename
+                self.save_tiled(filename)
+                return
+            binary, compress = SAVE_FILTERS[selected_filter] if selected_filter in SAVE_FILTERS else (None, False)
+            if binary and not filename.lower().endswith(BINARY_EXTENSION):
+                filename += BINARY_EXTENSION
+            self.current_file = filename
+            self.current_format = (binary, compress)
+            self.saver.save(filename, binary, compress)
+
+    def save_tiled(self, filename):
+        """Save as a tiled board; the open tiled board itself only writes back its changed pages"""
+        scene = self.canvas.scene
+        self.statusBar().showMessage("Saving %s..." % filename)
+        try:
+            if scene.is_paged() and os.path.abspath(scene.model.board.filename) == os.path.abspath(filename):
+                scene.save_pages()
+            elif scene.is_paged():
+                scene.save_pages_as(filename)  # Its pages are read from the new file from now on
+            else:
+                write_tiled(scene.to_board_data(), filename)
+        except (OSError, ValueError) as e:
+            self.on_save_failed(filename, str(e))
+            return
+        self.statusBar().showMessage("Saved %s" % filename, 3000)
+
+    def set_page_memory_cap(self):
+        megabytes, ok = QInputDialog.getInt(self, "Page Memory Limit", "Memory for tiled board pages (MB):",
+                                            self.page_memory_cap // (1024 * 1024), 16, 65536)
+        if ok:
+            self.page_memory_cap = megabytes * 1024 * 1024
+            scene = self.canvas.scene
+            if scene.is_paged():
+                scene.model.memory_cap = self.page_memory_cap
+                scene.model.evict(scene.shapes_by_id)
+
+    def open_board_store(self, for_saving):
+        """Ask for a board database, reusing the open one if it is picked again"""
+        if for_saving:
+            path, _ = QFileDialog.getSaveFileName(self, "Board Database", "", DATABASE_FILTER,
+                                                  options=QFileDialog.Option.DontConfirmOverwrite)
+        else:
+            path, _ = QFileDialog.getOpenFileName(self, "Board Database", "", DATABASE_FILTER)
+        if not path:
+            return None
+        if self.board_store and os.path.abspath(self.board_store.path) == os.path.abspath(path):
+            return self.board_store
+        if self.board_store:
+            scene = self.canvas.scene
+            if getattr(scene.descriptions.source, "store", None) is self.board_store:
+                # The board was opened from it and still reads descriptions from it
+                self.saver.wait()
+                scene.detach_descriptions()
+            self.board_store.close()
+        self.board_store = BoardStore(path)
+        return self.board_store
+
+    def save_to_database(self):
+        store = self.open_board_store(for_saving=True)
+        if not store:
+            return
+        binding = self.canvas.scene.store_binding
+        default = binding[1] if binding and binding[0] == store.path else "Board"
+        board, ok = QInputDialog.getText(self, "Save to Database", "Board name:", text=default)
+        if ok and board:
+            self.canvas.scene.save_to_store(store, board)
+            self.statusBar().showMessage("Saved board %s to %s" % (board, store.path), 3000)
+
+    def open_from_database(self):
+        store = self.open_board_store(for_saving=False)
+        if not store:
+            return
+        boards = store.boards()
+        if not boards:
+            QMessageBox.information(self, "Open from Database", "The database has no boards.")
+            return
+        board, ok = QInputDialog.getItem(self, "Open from Database", "Board:", boards, 0, False)
+        if ok:
+            if self.loader and self.loader.is_running():
+                self.loader.cancel()
+            self.canvas.scene.load_from_store(store, board)
+            self.canvas.scene.journal = self.journal
+            self.canvas.scene.reset_journal()
+            self.current_file = None
+            self.update_analysis_action()
+
+    def on_save_failed(self, filename, message):
+        self.statusBar().showMessage("Save failed", 3000)
+        QMessageBox.warning(self, "Save Failed", "Could not save %s:\n%s" % (filename, message))
 
     def load_file(self):
-        filename, _ = QFileDialog.getOpenFileName(self, "Load Task Board", "", "JSON Files (*.json)")
+        filename, _ = QFileDialog.getOpenFileName(self, "Load Task Board", "", LOAD_FILTERS)
         if filename:
-            self.canvas.scene.load_from_file(filename)
+            if self.loader and self.loader.is_running():
+                self.loader.cancel()
+            if is_tiled_board(filename):
+                self.open_tiled(filename)
+                return
+            
+            self.canvas.scene.journal = self.journal
+            self.loader = self.canvas.scene.load_from_file_async(filename)
+            self.current_file = filename
+            self.current_format = detect_format(filename)
+            
+            # Progress with cancel, shown only if loading takes a while
+            progress = QProgressDialog("Loading board...", "Cancel", 0, 0, self)
+            progress.setWindowModality(Qt.WindowModality.NonModal)
+            progress.setMinimumDuration(500)
+            progress.canceled.connect(self.loader.cancel)
+            self.loader.progress.connect(lambda done, total: (progress.setMaximum(total), progress.setValue(done)))
+            self.loader.finished.connect(progress.reset)
+            self.loader.finished.connect(self.canvas.scene.reset_journal)
+            self.loader.cancelled.connect(progress.reset)
+            self.loader.cancelled.connect(self.canvas.scene.reset_journal)
+            self.loader.failed.connect(progress.reset)
+            self.loader.failed.connect(lambda message: QMessageBox.warning(self, "Load Failed", message))
+            for signal in (self.loader.finished, self.loader.cancelled, self.loader.failed):
+                signal.connect(self.update_analysis_action)
+
+    def open_tiled(self, filename):
+        scene = self.canvas.scene
+        try:
+            scene.open_tiled(filename, self.page_memory_cap)
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.warning(self, "Load Failed", "Could not open %s:\n%s" % (filename, e))
+            return
+        self.current_file = filename
+        # Journaling would snapshot every page; edits are kept in memory until saved instead
+        scene.journal = None
+        self.journal.discard()
+        self.update_analysis_action()
+        self.statusBar().showMessage("Opened tiled board; autosave is off until another board is opened", 5000)
 
     def setup_color_toolbar(self):
         color_toolbar = QToolBar("Colors")
@@ -105,28 +442,46 @@ class MainWindow(QMainWindow):
         increase_border.triggered.connect(self.increase_border_width)
         color_toolbar.addAction(increase_border)
 
+    def update_undo_actions(self):
+        history = self.canvas.scene.history
+        undo_label, redo_label = history.undo_label(), history.redo_label()
+        self.undo_action.setText("Undo %s" % undo_label if undo_label else "Undo")
+        self.undo_action.setEnabled(undo_label is not None)
+        self.redo_action.setText("Redo %s" % redo_label if redo_label else "Redo")
+        self.redo_action.setEnabled(redo_label is not None)
+
+    def selected_shapes(self):
+        return [item for item in self.canvas.scene.selectedItems() if hasattr(item, 'custom_bg_color')]
+
     def change_background_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
-            for item in self.canvas.scene.selectedItems():
-                if hasattr(item, 'custom_bg_color'):
-                    item.custom_bg_color = color
-                    item.update()
+            # All selected shapes are undone in one step
+            self.canvas.scene.begin_change("Background Color", self.selected_shapes())
+            for item in self.selected_shapes():
+                item.custom_bg_color = color
+                item.update()
+                self.canvas.scene.shape_changed(item)
+            self.canvas.scene.end_change()
 
     def change_text_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
-            for item in self.canvas.scene.selectedItems():
-                if hasattr(item, 'custom_text_color'):
-                    item.custom_text_color = color
-                    item.update()
+            self.canvas.scene.begin_change("Text Color", self.selected_shapes())
+            for item in self.selected_shapes():
+                item.custom_text_color = color
+                item.update()
+                self.canvas.scene.shape_changed(item)
+            self.canvas.scene.end_change()
 
     def reset_colors(self):
-        for item in self.canvas.scene.selectedItems():
-            if hasattr(item, 'custom_bg_color'):
-                item.custom_bg_color = None
-                item.custom_text_color = None
-                item.update()
+        self.canvas.scene.begin_change("Reset Colors", self.selected_shapes())
+        for item in self.selected_shapes():
+            item.custom_bg_color = None
+            item.custom_text_color = None
+            item.update()
+            self.canvas.scene.shape_changed(item)
+        self.canvas.scene.end_change()
     
     def increase_border_width(self):
         current = self.border_width_spinbox.value()
@@ -140,10 +495,13 @@ class MainWindow(QMainWindow):
     
     def set_border_width(self, value):
         """Apply border width to selected frames"""
-        for item in self.canvas.scene.selectedItems():
-            if hasattr(item, 'border_width'):
-                item.border_width = value
-                item.update()
+        frames = [item for item in self.canvas.scene.selectedItems() if hasattr(item, 'border_width')]
+        self.canvas.scene.begin_change("Border Width", frames)
+        for item in frames:
+            item.border_width = value
+            item.update()
+            self.canvas.scene.shape_changed(item)
+        self.canvas.scene.end_change()
     
     def update_border_width_display(self):
         """Update spinbox to show border width of selected frame"""
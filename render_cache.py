@@ -0,0 +1,86 @@
+"""Rasterized images of shapes, reused across repaints.
+
+Entries are keyed by (item, zoom bucket, variant) so an item has one image
+per zoom step it has been seen at. Images are only thrown away when the
+shape's data changes (TaskScene.shape_changed), when the shape leaves the
+scene, or when the cache is over its byte budget, least recently used
+first.
+"""
+from collections import OrderedDict
+import math
+
+
+def zoom_bucket(scale):
+    """Round a scale up to the next half octave, so images are only ever shrunk"""
+    return 2 ** (math.ceil(math.log2(scale) * 2) / 2)
+
+
+class RenderCache:
+    def __init__(self, budget_bytes=64 * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()  # key -> (pixmap, size in bytes)
+        self._keys_by_item = {}
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, pixmap):
+        size = pixmap.width() * pixmap.height() * pixmap.depth() // 8
+        if size > self.budget_bytes:
+            return
+        self._discard(key)
+        self._entries[key] = (pixmap, size)
+        self._keys_by_item.setdefault(key[0], set()).add(key)
+        self.size_bytes += size
+        while self.size_bytes > self.budget_bytes:
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, item):
+        """Drop every image of an item"""
+        for key in list(self._keys_by_item.get(item, ())):
+            self._discard(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_item.clear()
+        self.size_bytes = 0
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size_bytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size_bytes -= entry[1]
+        keys = self._keys_by_item[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_item[key[0]]
+
+
+# One budget for the whole application
+render_cache = RenderCache()
@@ -0,0 +1,257 @@
+"""Orthogonal connection paths around shapes.
+
+Boxes are plain (x1, y1, x2, y2) tuples. BoxIndex keeps boxes by grid cell
+so the few near a connection are found without scanning the board.
+route_edge only steers around the obstacles a connection actually runs
+into, so a long connection across a full board stays cheap to route.
+
+route searches (A*) over the lines running along every obstacle's sides,
+at MARGIN distance, plus the lines through both ends. A bend costs
+BEND_COST on top of the length, so paths take few turns. No Qt dependency,
+so routes can be computed in any thread.
+"""
+import heapq
+
+CELL_SIZE = 500  # Scene units per BoxIndex cell
+MARGIN = 15  # Clearance kept around shapes
+BEND_COST = 60
+CORRIDOR_MARGIN = 150  # Room around the ends and obstacles for going around them
+CORRIDOR_TRIES = 3  # Times that room is doubled before giving up
+ROUTE_ROUNDS = 8  # Times a path may run into new obstacles before giving up
+ROUTE_MAX_OBSTACLES = 80  # Connections through more clutter than this stay straight
+
+
+class BoxIndex:
+    """Boxes keyed by any hashable, found by the grid cells they cover"""
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.boxes = {}  # key -> box
+        self.cells = {}  # (column, row) -> set of keys
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def get(self, key):
+        return self.boxes.get(key)
+
+    def insert(self, key, box):
+        old = self.boxes.get(key)
+        if old is not None and self._span(old) == self._span(box):
+            self.boxes[key] = box  # Same cells, as for most small moves
+            return
+        self.remove(key)
+        self.boxes[key] = box
+        for cell in self._cells(box):
+            self.cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        box = self.boxes.pop(key, None)
+        if box is None:
+            return
+        for cell in self._cells(box):
+            keys = self.cells[cell]
+            keys.discard(key)
+            if not keys:
+                del self.cells[cell]
+
+    def clear(self):
+        self.boxes.clear()
+        self.cells.clear()
+
+    def query(self, box):
+        """Keys of the boxes overlapping box"""
+        found = set()
+        for cell in self._cells(box):
+            found.update(self.cells.get(cell, ()))
+        x1, y1, x2, y2 = box
+        boxes = self.boxes
+        return {key for key in found
+                if boxes[key][0] <= x2 and boxes[key][2] >= x1 and boxes[key][1] <= y2 and boxes[key][3] >= y1}
+
+    def _span(self, box):
+        """First and last column and row a box covers"""
+        size = self.cell_size
+        return (int(box[0] // size), int(box[1] // size), int(box[2] // size), int(box[3] // size))
+
+    def _cells(self, box):
+        first_column, first_row, last_column, last_row = self._span(box)
+        return [(column, row)
+                for column in range(first_column, last_column + 1)
+                for row in range(first_row, last_row + 1)]
+
+
+def center(box):
+    return ((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
+
+
+def union(first, second):
+    return (min(first[0], second[0]), min(first[1], second[1]), max(first[2], second[2]), max(first[3], second[3]))
+
+
+def grow(box, amount):
+    return (box[0] - amount, box[1] - amount, box[2] + amount, box[3] + amount)
+
+
+def route_edge(obstacles, start_box, end_box, skip=()):
+    """Path between the centers of two boxes around the boxes in obstacles (a BoxIndex).
+
+    Only obstacles the path actually runs into are taken into account: the
+    search starts with none, adds whatever the path found crosses and tries
+    again. skip holds obstacle keys to ignore, normally the two end shapes.
+    Returns (points, area): points is None if no clear path was found within
+    ROUTE_ROUNDS tries and ROUTE_MAX_OBSTACLES obstacles, area covers
+    the path and every obstacle it had to avoid, so only changes inside it
+    can make a different path better.
+    """
+    start, end = center(start_box), center(end_box)
+    ends = union(start_box, end_box)
+    avoided = set()
+    points = None
+    for _ in range(ROUTE_ROUNDS):
+        boxes = [obstacles.boxes[key] for key in avoided]
+        margin = CORRIDOR_MARGIN
+        for _ in range(CORRIDOR_TRIES):
+            bounds = grow(ends, margin)
+            for box in boxes:
+                bounds = union(bounds, grow(box, margin))
+            points = route(start, end, boxes, bounds)
+            if points is not None:
+                break
+            margin *= 2
+        if points is None:
+            break
+        hit = _crossed(obstacles, points, skip) - avoided
+        if not hit:
+            break
+        avoided |= hit
+        if len(avoided) > ROUTE_MAX_OBSTACLES:
+            points = None  # Not worth the time, and a detour around this much is no clearer
+            break
+    else:
+        points = None
+    if points is None:
+        return None, grow(ends, MARGIN)
+
+    area = ends
+    for key in avoided:
+        area = union(area, obstacles.boxes[key])
+    for x, y in points:
+        area = union(area, (x, y, x, y))
+    return points, grow(area, MARGIN)
+
+
+def _crossed(obstacles, points, skip):
+    """Keys of the obstacles a path runs through or too close to, except those under its ends"""
+    (sx, sy), (tx, ty) = points[0], points[-1]
+    crossed = set()
+    for (x1, y1), (x2, y2) in zip(points, points[1:]):
+        segment = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        for key in obstacles.query(grow(segment, MARGIN)):
+            if key in skip or key in crossed:
+                continue
+            box = obstacles.boxes[key]
+            if box[0] < sx < box[2] and box[1] < sy < box[3] or box[0] < tx < box[2] and box[1] < ty < box[3]:
+                continue
+            bx1, by1, bx2, by2 = grow(box, MARGIN - 1)
+            if segment[0] < bx2 and segment[2] > bx1 and segment[1] < by2 and segment[3] > by1:
+                crossed.add(key)
+    return crossed
+
+
+def route(start, end, obstacles, bounds, margin=MARGIN, bend_cost=BEND_COST):
+    """Orthogonal path from point start to point end inside bounds, around obstacle boxes.
+
+    Obstacles under either end are ignored (frames around the ends, shapes
+    overlapping them), those within margin of an end are passed closer. Returns the path's corners including both ends, or
+    None if there is no way through.
+    """
+    sx, sy = start
+    tx, ty = end
+    boxes = []
+    for box in obstacles:
+        if box[0] < sx < box[2] and box[1] < sy < box[3] or box[0] < tx < box[2] and box[1] < ty < box[3]:
+            continue
+        grown = grow(box, margin)
+        # An end right next to a shape may pass it without the clearance
+        if grown[0] < sx < grown[2] and grown[1] < sy < grown[3] or grown[0] < tx < grown[2] and grown[1] < ty < grown[3]:
+            grown = box
+        boxes.append(grown)
+    if not boxes:
+        if sx == tx or sy == ty:
+            return [start, end]
+        # The two L-shaped paths are the same length; leave along the longer distance
+        corner = (tx, sy) if abs(tx - sx) >= abs(ty - sy) else (sx, ty)
+        return [start, corner, end]
+
+    # Candidate lines: both ends, the corridor's sides and every obstacle's sides
+    bx1, by1, bx2, by2 = bounds
+    xs = sorted({sx, tx, bx1, bx2}.union(*((box[0], box[2]) for box in boxes)))
+    ys = sorted({sy, ty, by1, by2}.union(*((box[1], box[3]) for box in boxes)))
+    x_index = {x: i for i, x in enumerate(xs)}
+    y_index = {y: j for j, y in enumerate(ys)}
+
+    # Doubled grid: (2i, 2j) are crossings, odd coordinates the segments between them.
+    # Everything strictly inside an obstacle is blocked.
+    width, height = 2 * len(xs) - 1, 2 * len(ys) - 1
+    blocked = [bytearray(width) for _ in range(height)]
+    for x1, y1, x2, y2 in boxes:
+        left, right = 2 * x_index[x1] + 1, 2 * x_index[x2]
+        if left >= right:
+            continue
+        run = b"\x01" * (right - left)
+        for row in range(2 * y_index[y1] + 1, 2 * y_index[y2]):
+            blocked[row][left:right] = run
+
+    # A* over (column, row, direction); direction 0 horizontal, 1 vertical, 2 not moved yet
+    goal_i, goal_j = x_index[tx], y_index[ty]
+    first = (x_index[sx], y_index[sy], 2)
+    best = {first: 0}
+    came_from = {}
+    # Among equal estimates the longest path so far goes first (-cost), which spares
+    # exploring the many equally good detours a grid like this has
+    queue = [(abs(tx - sx) + abs(ty - sy), 0, first)]
+    columns, rows = len(xs), len(ys)
+    while queue:
+        _, cost, state = heapq.heappop(queue)
+        cost = -cost
+        if cost > best[state]:
+            continue
+        i, j, direction = state
+        if i == goal_i and j == goal_j:
+            return _corners(state, came_from, xs, ys)
+        x, y = xs[i], ys[j]
+        for ni, nj, step_direction in ((i + 1, j, 0), (i - 1, j, 0), (i, j + 1, 1), (i, j - 1, 1)):
+            if ni < 0 or nj < 0 or ni >= columns or nj >= rows:
+                continue
+            # The segment between the two crossings, and the crossing itself
+            if blocked[j + nj][i + ni] or blocked[2 * nj][2 * ni]:
+                continue
+            nx, ny = xs[ni], ys[nj]
+            new_cost = cost + abs(nx - x) + abs(ny - y)
+            if direction != 2 and direction != step_direction:
+                new_cost += bend_cost
+            new_state = (ni, nj, step_direction)
+            if new_cost < best.get(new_state, new_cost + 1):
+                best[new_state] = new_cost
+                came_from[new_state] = state
+                estimate = new_cost + abs(tx - nx) + abs(ty - ny)
+                # Not heading along the goal's line means at least one more bend
+                if ny != ty if step_direction == 0 else nx != tx:
+                    estimate += bend_cost
+                heapq.heappush(queue, (estimate, -new_cost, new_state))
+    return None
+
+
+def _corners(state, came_from, xs, ys):
+    """The path ending in state, keeping only its ends and bends"""
+    points = []
+    direction = None
+    while state in came_from:
+        i, j, step_direction = state
+        if step_direction != direction:
+            points.append((xs[i], ys[j]))
+            direction = step_direction
+        state = came_from[state]
+    points.append((xs[state[0]], ys[state[1]]))
+    points.reverse()
+    return points
@@ -0,0 +1,93 @@
+import sqlite3
+
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+
+from board_format import BINARY_EXTENSION, atomic_write, encode_saved
+
+
+class _SaveThread(QThread):
+    """Serializes a board snapshot and writes it atomically off the GUI thread.
+
+    Description texts are read here, from the file or database the board
+    was loaded from; errors doing so are reported like write errors.
+    """
+    def __init__(self, data, filename, binary, compress, parent=None):
+        super().__init__(parent)
+        self.data = data
+        self.filename = filename
+        self.binary = binary
+        self.compress = compress
+        self.error = None
+        self.source = None  # Where the descriptions are read from once saved
+
+    def run(self):
+        try:
+            payload, self.source = encode_saved(self.data, self.filename, self.binary, self.compress)
+            atomic_write(self.filename, payload)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            # Raised out of run(), it would abort the whole application
+            self.error = str(e)
+
+
+class BoardSaver(QObject):
+    """Saves a TaskScene in the background.
+
+    Only the snapshot is taken on the GUI thread: plain dicts of shapes
+    and connections, the texts entered in this session, and the lazy
+    source (binary file or database) of the others, which the save reads
+    from on its own thread. Requests arriving while a save is running
+    collapse into one follow-up save, which snapshots the board when it
+    actually starts.
+    """
+    started = pyqtSignal(str)
+    saved = pyqtSignal(str)
+    failed = pyqtSignal(str, str)  # filename, message
+
+    def __init__(self, scene, parent=None):
+        super().__init__(parent)
+        self.scene = scene
+        self._thread = None
+        self._pending = None  # (filename, binary, compress) of the coalesced request
+
+    def is_saving(self):
+        return self._thread is not None
+
+    def save(self, filename, binary=None, compress=False):
+        if binary is None:
+            binary = filename.lower().endswith(BINARY_EXTENSION)
+        if self._thread:
+            self._pending = (filename, binary, compress)
+            return
+        self._start(filename, binary, compress)
+
+    def wait(self):
+        """Block until the running and any coalesced save are on disk"""
+        while self._thread:
+            self._thread.wait()
+            self._on_finished()
+
+    def _start(self, filename, binary, compress):
+        self._thread = _SaveThread(self.scene.to_board_data(), filename, binary, compress, self)
+        self._thread.finished.connect(self._on_finished)
+        self.started.emit(filename)
+        self._thread.start()
+
+    def _on_finished(self):
+        thread = self._thread
+        if thread is None or not thread.isFinished():
+            return
+        self._thread = None
+        thread.deleteLater()
+
+        if thread.error is None:
+            # The file loaded from may now be replaced or deleted
+            self.scene.rebind_descriptions(thread.source, thread.data["descriptions"])
+            self.saved.emit(thread.filename)
+        else:
+            self.failed.emit(thread.filename, thread.error)
+
+        if self._pending:
+            filename, binary, compress = self._pending
+            self._pending = None
+            self._start(filename, binary, compress)
+
@@ -0,0 +1,68 @@
+"""How far a board reaches, and how deep to split it for the scene index.
+
+SceneBounds keeps the box around every shape as shapes are added, moved
+and removed. Growing is a union; a shape leaving the edge only marks the
+bounds stale, and they are recomputed from all boxes when next asked
+for. No Qt dependency.
+"""
+import math
+
+from routing import union
+
+SCENE_MARGIN = 1000  # Room around the outermost shapes to scroll into and add shapes
+SCENE_GROWTH = 0.25  # Outgrown, the scene grows this part of its size beyond the shape, as every change rebuilds the index
+EMPTY_SCENE = (0, 0, 2000, 2000)
+
+# Scene index depth (see bsp_depth)
+ITEM_AREA = 150 * 80  # A typical shape
+ITEMS_PER_LEAF = 8
+MIN_BSP_DEPTH = 3
+MAX_BSP_DEPTH = 16
+
+
+def contains(outer, inner):
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+def _on_edge(box, bounds):
+    return box[0] <= bounds[0] or box[1] <= bounds[1] or box[2] >= bounds[2] or box[3] >= bounds[3]
+
+
+def bsp_depth(count, width, height):
+    """Scene index depth for count items over an area: a few items per leaf, no leaf much smaller than an item.
+
+    Each level halves the leaves, so the depth is the log2 of the number
+    of leaves, the fewer of what the item count and the extent call for.
+    """
+    leaves = min(count / ITEMS_PER_LEAF, width * height / ITEM_AREA)
+    if leaves <= 1:
+        return MIN_BSP_DEPTH
+    return max(MIN_BSP_DEPTH, min(MAX_BSP_DEPTH, math.ceil(math.log2(leaves))))
+
+
+class SceneBounds:
+    def __init__(self):
+        self.box = None  # (x1, y1, x2, y2) around every box, None when there are none
+        self.stale = False  # A box on the edge moved in or went away since box was computed
+
+    def clear(self):
+        self.box = None
+        self.stale = False
+
+    def replace(self, old, new):
+        """A box was added (old is None), moved, or removed (new is None)"""
+        if old is not None and self.box is not None and not self.stale and _on_edge(old, self.box):
+            self.stale = True
+        if new is not None and not self.stale:
+            self.box = new if self.box is None else union(self.box, new)
+
+    def get(self, boxes):
+        """The bounds, None when empty; boxes is every current box, only read when stale"""
+        if self.stale:
+            boxes = list(boxes)
+            self.box = None
+            if boxes:
+                self.box = (min(box[0] for box in boxes), min(box[1] for box in boxes),
+                            max(box[2] for box in boxes), max(box[3] for box in boxes))
+            self.stale = False
+        return self.box
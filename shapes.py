@@ -1,68 +1,188 @@
 from PyQt6.QtWidgets import QGraphicsItem, QGraphicsRectItem, QGraphicsEllipseItem, QGraphicsPolygonItem, QGraphicsSceneMouseEvent, QGraphicsLineItem
-from PyQt6.QtGui import QBrush, QPen, QColor, QPolygonF
+from PyQt6.QtGui import QBrush, QPen, QColor, QPolygonF, QFont, QPixmap, QPainter, QPainterPath, QPainterPathStroker
 from PyQt6.QtCore import Qt, QPointF, QRectF, QLineF
 from task_dialog import TaskDialog
+from render_cache import render_cache, zoom_bucket
+from geometry import RECT, ELLIPSE, DIAMOND, TRIANGLE, arrow_head, edge_line, edge_point, get_outline
 
 import math
 
+# Paint resources shared by every shape, keyed by what they depend on.
+# Fonts need a QGuiApplication, so everything is built on first use.
+_style_cache = {}
+
+FRAME_LABEL_COLOR = "#aaaaaa"
+
+# Level of detail tiers, by on-screen scale of the item (1.0 = 100% zoom).
+# Below LOD_TEXT only the category is drawn, below LOD_FLAT no text at all.
+LOD_TEXT = 0.6
+LOD_FLAT = 0.3
+
+
+# Shapes are drawn from cached images between these scales; outside it drawing
+# directly is cheaper (flat shapes) or the images would get too large.
+CACHE_MIN_SCALE = LOD_FLAT
+CACHE_MAX_SCALE = 4.0
+CACHE_MARGIN = 2  # Room for the border pen around the item's rect
+
+
+class ShapeStyle:
+    """Look shared by every shape of one type, never changed once made"""
+    __slots__ = ("base_color", "base_rgba")
+
+    def __init__(self, color):
+        self.base_color = QColor(color)
+        self.base_rgba = self.base_color.rgba()
+
+
+class FrameResize:
+    """A frame resize in progress: the handle dragged and where it started"""
+    __slots__ = ("frame", "handle", "start_pos", "start_rect", "start_scene_pos")
+
+    def __init__(self, frame, handle, start_pos):
+        self.frame = frame
+        self.handle = handle
+        self.start_pos = start_pos
+        self.start_rect = QRectF(frame.rect())
+        self.start_scene_pos = frame.scenePos()
+
+
+def level_of_detail(painter, option):
+    return option.levelOfDetailFromTransform(painter.worldTransform())
+
+
+def _build_body_style(base_color, status, custom_bg_color, selected):
+    # Color based on status or custom color
+    if custom_bg_color:
+        color = QColor(custom_bg_color)
+        border_color = QColor(custom_bg_color).darker(120)
+    elif status == "Done":
+        color = QColor("#38d156") # Green
+        border_color = QColor("#00ff00") # Bright green border
+    elif status == "In Progress":
+        color = QColor("#388ed1") # Blue
+        border_color = QColor("#ffaa00") # Yellow/Orange border
+    else:  # Todo
+        color = QColor(base_color)
+        border_color = QColor("#0099ff") # Blue border
+
+    if selected:
+        return QBrush(color.lighter(120)), QPen(Qt.GlobalColor.yellow, 3, Qt.PenStyle.DashLine)
+    return QBrush(color), QPen(border_color, 3)  # Thicker border for visibility
+
+
+def _text_pen(custom_color, default="#000000"):
+    key = ("text", custom_color.rgba() if custom_color else None, default)
+    pen = _style_cache.get(key)
+    if pen is None:
+        pen = _style_cache[key] = QPen(QColor(custom_color) if custom_color else QColor(default))
+    return pen
+
+
+def _font(point_size, bold):
+    key = ("font", point_size, bold)
+    font = _style_cache.get(key)
+    if font is None:
+        font = _style_cache[key] = QFont()
+        font.setPointSize(point_size)
+        font.setBold(bold)
+    return font
+
+
+def _header_brush():
+    brush = _style_cache.get("header")
+    if brush is None:
+        brush = _style_cache["header"] = QBrush(QColor(0, 0, 0, 50))
+    return brush
+
+
+def _connection_pen():
+    pen = _style_cache.get("connection")
+    if pen is None:
+        pen = _style_cache["connection"] = QPen(Qt.GlobalColor.white, 3)  # Thicker line
+    return pen
+
+
+def _handle_style():
+    style = _style_cache.get("handle")
+    if style is None:
+        style = _style_cache["handle"] = (QBrush(QColor("#ffff00")), QPen(Qt.GlobalColor.black, 1))
+    return style
+
 class ConnectionLine(QGraphicsLineItem):
     def __init__(self, start_item, end_item):
         super().__init__()
+        self.uid = None  # Persistent ID, assigned by the scene
         self.start_item = start_item
         self.end_item = end_item
-        self.setPen(QPen(Qt.GlobalColor.white, 3)) # Thicker line
+        self.arrow_head = None  # Recomputed when an endpoint moves, not on every paint
+        self.route = None  # Orthogonal path (QPolygonF) set by an EdgeRouter, None for a straight line
+        self.setPen(_connection_pen())  # Qt shares one pen's data between every connection
         self.setZValue(-1) # Behind shapes
         self.update_position()
 
     def update_position(self):
-        line = QLineF(self.start_item.scenePos(), self.end_item.scenePos())
-        start_pos = self.start_item.get_edge_point(line.p2())
-        end_pos = self.end_item.get_edge_point(line.p1())
-        self.setLine(QLineF(start_pos, end_pos))
+        self.set_line(edge_line(self.start_item, self.end_item))
+
+    def set_line(self, line, arrow=None):
+        """Move the line; arrow is its arrowhead when the caller already computed it"""
+        if self.route is not None:
+            self.prepareGeometryChange()
+            self.route = None
+        self.arrow_head = arrow if arrow is not None else arrow_head(line)
+        self.setLine(line)
+
+    def set_route(self, route, arrow):
+        """Follow a routed path instead of the straight line; line() spans its two ends"""
+        self.prepareGeometryChange()
+        self.route = route
+        self.arrow_head = arrow
+        self.setLine(QLineF(route[0], route[len(route) - 1]))
 
     def boundingRect(self):
         extra = 20
+        if self.route is not None:
+            return self.route.boundingRect().adjusted(-extra, -extra, extra, extra)
         return super().boundingRect().adjusted(-extra, -extra, extra, extra)
 
+    def shape(self):
+        if self.route is None:
+            return super().shape()
+        path = QPainterPath()
+        path.addPolygon(self.route)
+        stroker = QPainterPathStroker()
+        stroker.setWidth(self.pen().widthF())
+        return stroker.createStroke(path)
+
     def paint(self, painter, option, widget):
-        if self.line().length() == 0:
+        if self.line().length() == 0 and self.route is None:
             return
             
         painter.setPen(self.pen())
         painter.setBrush(self.pen().color())
         
-        line = self.line()
-        painter.drawLine(line)
-        
-        # Draw Arrowhead
-        angle = math.atan2(line.dy(), line.dx())
-        arrow_size = 15
+        if self.route is not None:
+            painter.drawPolyline(self.route)
+        else:
+            painter.drawLine(self.line())
         
-        arrow_p1 = line.p2() - QPointF(math.cos(angle - math.pi / 6) * arrow_size,
-                                       math.sin(angle - math.pi / 6) * arrow_size)
-        arrow_p2 = line.p2() - QPointF(math.cos(angle + math.pi / 6) * arrow_size,
-                                       math.sin(angle + math.pi / 6) * arrow_size)
-                                       
-        arrow_head = QPolygonF()
-        arrow_head.append(line.p2())
-        arrow_head.append(arrow_p1)
-        arrow_head.append(arrow_p2)
+        # Arrowheads are a few pixels wide when zoomed out
+        if level_of_detail(painter, option) < LOD_FLAT:
+            return
         
-        painter.drawPolygon(arrow_head)
+        painter.drawPolygon(self.arrow_head)
 
 class TaskShape:
-    def __init__(self, color="#0e639c"):
-        self.base_color = QColor(color)
-        self.default_brush = QBrush(self.base_color)
-        self.selected_brush = QBrush(self.base_color.lighter(120))
-        self.pen = QPen(Qt.GlobalColor.black, 3)
-        
+    OUTLINE_KIND = RECT
+    STYLE = ShapeStyle("#0e639c")  # Per type, shared by all its shapes; brushes and pens come from body_style
+
+    def __init__(self):
         # Data
+        self.uid = None  # Persistent ID, assigned by the scene
         self.title = "New Task"
         self.category = "General"
-        self.description = ""
+        self.description_ref = None  # Key into the scene's DescriptionStore, None when empty
         self.status = "Todo"
-        self.connections = []
         
         # Custom colors
         self.custom_bg_color = None  # None means use default
@@ -73,36 +193,66 @@ class TaskShape:
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
 
-    def add_connection(self, connection):
-        self.connections.append(connection)
-
     def itemChange(self, change, value):
-        if change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged:
-            for connection in self.connections:
-                connection.update_position()
+        if change == QGraphicsItem.GraphicsItemChange.ItemPositionChange:
+            # Dragged shapes line up with the grid or their neighbors (TaskScene.snap_position)
+            if self.scene():
+                self.scene().shape_moving(self)  # Where to move it back to on undo
+                value = self.scene().snap_position(self, value)
+        elif change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged:
+            # The scene updates connections in one batch (TaskScene.flush_connections)
+            if self.scene():
+                self.scene().shape_moved(self)
         return super().itemChange(change, value)
 
     def paint(self, painter, option, widget):
-        # Update color based on status or custom color
-        if self.custom_bg_color:
-            color = self.custom_bg_color
-            border_color = QColor(self.custom_bg_color).darker(120)
-        elif self.status == "Done":
-            color = QColor("#38d156") # Green
-            border_color = QColor("#00ff00") # Bright green border
-        elif self.status == "In Progress":
-            color = QColor("#388ed1") # Blue
-            border_color = QColor("#ffaa00") # Yellow/Orange border
-        else:  # Todo
-            color = self.base_color
-            border_color = QColor("#0099ff") # Blue border
+        lod = level_of_detail(painter, option)
+        if not CACHE_MIN_SCALE <= lod <= CACHE_MAX_SCALE:
+            self.draw_shape(painter, lod)
+            return
 
-        if self.isSelected():
-            painter.setBrush(QBrush(color.lighter(120)))
-            painter.setPen(QPen(Qt.GlobalColor.yellow, 3, Qt.PenStyle.DashLine))
-        else:
-            painter.setBrush(QBrush(color))
-            painter.setPen(QPen(border_color, 3))  # Thicker border for visibility
+        # Reuse an image of this item at this zoom step; render_cache drops
+        # them when the shape's data changes (TaskScene.shape_changed)
+        scale = zoom_bucket(lod) * painter.device().devicePixelRatioF()
+        key = (self, zoom_bucket(lod), lod >= LOD_TEXT, self.isSelected())
+        rect = self.boundingRect().adjusted(-CACHE_MARGIN, -CACHE_MARGIN, CACHE_MARGIN, CACHE_MARGIN)
+        pixmap = render_cache.get(key)
+        if pixmap is None:
+            pixmap = QPixmap(math.ceil(rect.width() * scale), math.ceil(rect.height() * scale))
+            pixmap.fill(Qt.GlobalColor.transparent)
+            image_painter = QPainter(pixmap)
+            image_painter.setRenderHints(painter.renderHints())
+            image_painter.scale(scale, scale)
+            image_painter.translate(-rect.topLeft())
+            self.draw_shape(image_painter, lod)
+            image_painter.end()
+            render_cache.put(key, pixmap)
+        # Images are rendered at or above the current scale, filter when shrinking them
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        painter.drawPixmap(rect, pixmap, QRectF(pixmap.rect()))
+
+    def draw_shape(self, painter, lod):
+        """Draw the shape itself; lod decides how much text is drawn"""
+        raise NotImplementedError
+
+    def setup_body(self, painter, lod):
+        brush, pen = self.body_style()
+        painter.setBrush(brush)
+        # Flat colored shapes when zoomed far out; keep the selection outline visible
+        painter.setPen(pen if lod >= LOD_FLAT or self.isSelected() else Qt.PenStyle.NoPen)
+
+    def body_style(self):
+        """(brush, pen) for the current status, custom color and selection, shared between shapes"""
+        bg_rgba = self.custom_bg_color.rgba() if self.custom_bg_color else None
+        key = ("body", self.STYLE.base_rgba, self.status, bg_rgba, self.isSelected())
+        style = _style_cache.get(key)
+        if style is None:
+            style = _style_cache[key] = _build_body_style(self.STYLE.base_color, self.status,
+                                                          self.custom_bg_color, self.isSelected())
+        return style
+
+    def text_pen(self):
+        return _text_pen(self.custom_text_color)
 
     def draw_header(self, painter, rect):
         # Draw Header Background
@@ -110,37 +260,41 @@ class TaskShape:
         header_rect = QRectF(rect.x(), rect.y(), rect.width(), header_height)
         
         # Clip to shape if needed (simple rect for now)
-        painter.setBrush(QBrush(QColor(0, 0, 0, 50))) # Darker transparent overlay
+        painter.setBrush(_header_brush()) # Darker transparent overlay
         painter.setPen(Qt.PenStyle.NoPen)
         painter.drawRect(header_rect)
         
         # Draw Category Text
-        text_color = self.custom_text_color if self.custom_text_color else Qt.GlobalColor.black
-        painter.setPen(text_color)
-        font = painter.font()
-        font.setBold(True)
-        font.setPointSize(12)
-        painter.setFont(font)
+        painter.setPen(self.text_pen())
+        painter.setFont(_font(12, True))
         painter.drawText(header_rect, Qt.AlignmentFlag.AlignCenter, self.category)
         
         # Reset Font for Title
-        font.setBold(False)
-        font.setPointSize(9)
-        painter.setFont(font)
+        painter.setFont(_font(9, False))
 
     def mouseDoubleClickEvent(self, event: QGraphicsSceneMouseEvent):
-        dialog = TaskDialog(None, self.title, self.description, self.status, self.category)
-        if dialog.exec():
+        # Descriptions are only loaded when the dialog needs them
+        descriptions = self.scene().descriptions
+        dialog = TaskDialog(None, self.title, descriptions.get(self.description_ref), self.status, self.category)
+        if dialog.exec() and self.scene():
+            scene = self.scene()
+            scene.begin_change("Edit Task", [self])
             data = dialog.get_data()
             self.title = data["title"]
             self.category = data["category"]
-            self.description = data["description"]
+            self.description_ref = descriptions.put(data["description"])
             self.status = data["status"]
             self.update() # Trigger repaint
+            scene.shape_changed(self)
+            scene.end_change()
+
+    def outline(self):
+        """Outline connections attach to, shared by shapes of the same kind and size"""
+        rect = self.rect()
+        return get_outline(self.OUTLINE_KIND, rect.x(), rect.y(), rect.width(), rect.height())
 
     def get_edge_point(self, other_pos):
-        # Default center (fallback)
-        return self.scenePos()
+        return edge_point(self, other_pos)
 
 class RectangleShape(TaskShape, QGraphicsRectItem):
     def __init__(self, x, y, w=150, h=80):
@@ -148,100 +302,64 @@ class RectangleShape(TaskShape, QGraphicsRectItem):
         TaskShape.__init__(self)
         self.setPos(x, y)
 
-    def paint(self, painter, option, widget):
-        TaskShape.paint(self, painter, option, widget)
+    def draw_shape(self, painter, lod):
+        self.setup_body(painter, lod)
         painter.drawRect(self.rect())
+        if lod < LOD_FLAT:
+            return
         self.draw_header(painter, self.rect())
+        if lod < LOD_TEXT:
+            return
         
         # Draw Title (below header)
         content_rect = self.rect().adjusted(0, 25, 0, 0)
-        text_color = self.custom_text_color if self.custom_text_color else Qt.GlobalColor.black
-        painter.setPen(text_color)
+        painter.setPen(self.text_pen())
         painter.drawText(content_rect, Qt.AlignmentFlag.AlignCenter, self.title)
     
     def mouseDoubleClickEvent(self, event):
         TaskShape.mouseDoubleClickEvent(self, event)
 
-    def get_edge_point(self, other_pos):
-        center = self.scenePos() + self.rect().center()
-        line = QLineF(center, other_pos)
-        polygon = QPolygonF(self.rect())
-        polygon.translate(self.scenePos())
-        
-        p1 = polygon.first()
-        for i in range(1, polygon.count()):
-            p2 = polygon.at(i)
-            poly_line = QLineF(p1, p2)
-            intersection_type, intersection_point = poly_line.intersects(line)
-            if intersection_type == QLineF.IntersectionType.BoundedIntersection:
-                return intersection_point
-            p1 = p2
-        # Close the loop
-        poly_line = QLineF(polygon.last(), polygon.first())
-        intersection_type, intersection_point = poly_line.intersects(line)
-        if intersection_type == QLineF.IntersectionType.BoundedIntersection:
-            return intersection_point
-            
-        return center
-
 class CircleShape(TaskShape, QGraphicsEllipseItem):
+    OUTLINE_KIND = ELLIPSE
+    STYLE = ShapeStyle("#d13838")  # Red for urgent
+
     def __init__(self, x, y, w=100, h=100):
         QGraphicsEllipseItem.__init__(self, 0, 0, w, h)
-        TaskShape.__init__(self, color="#d13838") # Red for urgent
+        TaskShape.__init__(self)
         self.setPos(x, y)
 
-    def paint(self, painter, option, widget):
-        TaskShape.paint(self, painter, option, widget)
+    def draw_shape(self, painter, lod):
+        self.setup_body(painter, lod)
         painter.drawEllipse(self.rect())
+        if lod < LOD_FLAT:
+            return
         
         # Draw Header (approximate for circle)
         # For circle, maybe just draw text at top? Or a clipped rect?
         # Let's keep it simple: Text at top
-        text_color = self.custom_text_color if self.custom_text_color else Qt.GlobalColor.black
-        painter.setPen(text_color)
-        font = painter.font()
-        font.setBold(True)
-        font.setPointSize(12)
-        painter.setFont(font)
+        painter.setPen(self.text_pen())
+        painter.setFont(_font(12, True))
         
         header_rect = self.rect().adjusted(0, 15, 0, -50)
         painter.drawText(header_rect, Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignHCenter, self.category)
+        if lod < LOD_TEXT:
+            return
         
         # Title
-        font.setBold(False)
-        font.setPointSize(9)
-        painter.setFont(font)
+        painter.setFont(_font(9, False))
         content_rect = self.rect().adjusted(0, 30, 0, 0)
         painter.drawText(content_rect, Qt.AlignmentFlag.AlignCenter, self.title)
 
     def mouseDoubleClickEvent(self, event):
         TaskShape.mouseDoubleClickEvent(self, event)
 
-    def get_edge_point(self, other_pos):
-        center = self.scenePos() + self.rect().center()
-        line = QLineF(center, other_pos)
-        angle = line.angle() * 3.14159 / 180
-        # QLineF angle is in degrees, 0 is 3 o'clock, increases counter-clockwise (usually)
-        # But Qt coordinate system Y is down.
-        # Let's use simple trig.
-        dx = other_pos.x() - center.x()
-        dy = other_pos.y() - center.y()
-        import math
-        angle = math.atan2(-dy, dx) # Note: -dy because Y is down
-        
-        r = self.rect().width() / 2
-        # x = cx + r * cos(a)
-        # y = cy - r * sin(a) # - because Y is down
-        
-        edge_x = center.x() + r * math.cos(angle)
-        edge_y = center.y() - r * math.sin(angle)
-        
-        return QPointF(edge_x, edge_y)
-
 class DiamondShape(TaskShape, QGraphicsPolygonItem):
+    OUTLINE_KIND = DIAMOND
+    STYLE = ShapeStyle("#8e38d1")  # Purple for milestone
+
     def __init__(self, x, y, w=120, h=80):
         QGraphicsPolygonItem.__init__(self)
-        TaskShape.__init__(self, color="#8e38d1") # Purple for milestone
+        TaskShape.__init__(self)
         
         # Create Diamond Polygon
         polygon = QPolygonF([
@@ -255,58 +373,40 @@ class DiamondShape(TaskShape, QGraphicsPolygonItem):
         self._width = w
         self._height = h
 
-    def paint(self, painter, option, widget):
-        TaskShape.paint(self, painter, option, widget)
+    def draw_shape(self, painter, lod):
+        self.setup_body(painter, lod)
         painter.drawPolygon(self.polygon())
+        if lod < LOD_FLAT:
+            return
         
         # Header Text (Top half)
-        text_color = self.custom_text_color if self.custom_text_color else Qt.GlobalColor.black
-        painter.setPen(text_color)
-        font = painter.font()
-        font.setBold(True)
-        font.setPointSize(12)
-        painter.setFont(font)
+        painter.setPen(self.text_pen())
+        painter.setFont(_font(12, True))
         
         rect = QRectF(0, 0, self._width, self._height)
         header_rect = rect.adjusted(0, 15, 0, -40)
         painter.drawText(header_rect, Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignHCenter, self.category)
+        if lod < LOD_TEXT:
+            return
         
         # Title
-        font.setBold(False)
-        font.setPointSize(9)
-        painter.setFont(font)
+        painter.setFont(_font(9, False))
         content_rect = rect.adjusted(0, 10, 0, 0)
         painter.drawText(content_rect, Qt.AlignmentFlag.AlignCenter, self.title)
 
     def mouseDoubleClickEvent(self, event):
         TaskShape.mouseDoubleClickEvent(self, event)
 
-    def get_edge_point(self, other_pos):
-        center = self.scenePos() + self.boundingRect().center()
-        line = QLineF(center, other_pos)
-        polygon = self.polygon()
-        polygon.translate(self.scenePos())
-        
-        p1 = polygon.first()
-        for i in range(1, polygon.count()):
-            p2 = polygon.at(i)
-            poly_line = QLineF(p1, p2)
-            intersection_type, intersection_point = poly_line.intersects(line)
-            if intersection_type == QLineF.IntersectionType.BoundedIntersection:
-                return intersection_point
-            p1 = p2
-        # Close loop
-        poly_line = QLineF(polygon.last(), polygon.first())
-        intersection_type, intersection_point = poly_line.intersects(line)
-        if intersection_type == QLineF.IntersectionType.BoundedIntersection:
-            return intersection_point
-            
-        return center
+    def outline(self):
+        return get_outline(self.OUTLINE_KIND, 0, 0, self._width, self._height)
 
 class TriangleShape(TaskShape, QGraphicsPolygonItem):
+    OUTLINE_KIND = TRIANGLE
+    STYLE = ShapeStyle("#d18e38")  # Orange for bug
+
     def __init__(self, x, y, w=100, h=100):
         QGraphicsPolygonItem.__init__(self)
-        TaskShape.__init__(self, color="#d18e38") # Orange for bug
+        TaskShape.__init__(self)
         
         # Create Triangle Polygon
         polygon = QPolygonF([
@@ -319,102 +419,69 @@ class TriangleShape(TaskShape, QGraphicsPolygonItem):
         self._width = w
         self._height = h
 
-    def paint(self, painter, option, widget):
-        TaskShape.paint(self, painter, option, widget)
+    def draw_shape(self, painter, lod):
+        self.setup_body(painter, lod)
         painter.drawPolygon(self.polygon())
+        if lod < LOD_FLAT:
+            return
         
         # Header Text (Top part)
-        text_color = self.custom_text_color if self.custom_text_color else Qt.GlobalColor.black
-        painter.setPen(text_color)
-        font = painter.font()
-        font.setBold(True)
-        font.setPointSize(12)
-        painter.setFont(font)
+        painter.setPen(self.text_pen())
+        painter.setFont(_font(12, True))
         
         rect = QRectF(0, 0, self._width, self._height)
         header_rect = rect.adjusted(0, 25, 0, -50)
         painter.drawText(header_rect, Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignHCenter, self.category)
+        if lod < LOD_TEXT:
+            return
         
         # Title
-        font.setBold(False)
-        font.setPointSize(9)
-        painter.setFont(font)
+        painter.setFont(_font(9, False))
         content_rect = rect.adjusted(0, 20, 0, 0)
         painter.drawText(content_rect, Qt.AlignmentFlag.AlignCenter, self.title)
 
     def mouseDoubleClickEvent(self, event):
         TaskShape.mouseDoubleClickEvent(self, event)
 
-    def get_edge_point(self, other_pos):
-        center = self.scenePos() + self.boundingRect().center()
-        line = QLineF(center, other_pos)
-        polygon = self.polygon()
-        polygon.translate(self.scenePos())
-        
-        p1 = polygon.first()
-        for i in range(1, polygon.count()):
-            p2 = polygon.at(i)
-            poly_line = QLineF(p1, p2)
-            intersection_type, intersection_point = poly_line.intersects(line)
-            if intersection_type == QLineF.IntersectionType.BoundedIntersection:
-                return intersection_point
-            p1 = p2
-        # Close loop
-        poly_line = QLineF(polygon.last(), polygon.first())
-        intersection_type, intersection_point = poly_line.intersects(line)
-        if intersection_type == QLineF.IntersectionType.BoundedIntersection:
-            return intersection_point
-            
-        return center
+    def outline(self):
+        return get_outline(self.OUTLINE_KIND, 0, 0, self._width, self._height)
 
 
 class FrameShape(TaskShape, QGraphicsRectItem):
-    """A large frame for grouping and organizing other shapes"""
+    """A large frame for grouping and organizing other shapes.
+
+    Shapes lying fully inside it are its contents (see TaskScene.containment)
+    and move along when it is dragged.
+    """
+    STYLE = ShapeStyle("#555555")
+    RESIZE_HANDLE_SIZE = 10
+    show_label = True  # Per frame only once changed
+    active_resize = None  # FrameResize of the one frame being resized, kept off the frames themselves
+
     def __init__(self, x, y, w=300, h=200):
         QGraphicsRectItem.__init__(self, 0, 0, w, h)
-        TaskShape.__init__(self, color="#555555")
+        TaskShape.__init__(self)
         self.setPos(x, y)
         self.setZValue(-10)  # Behind everything else
-        
-        # Frame-specific properties
-        self.frame_label = "Group"
-        self.show_label = True
         self.border_width = 2  # Adjustable border width
-        
-        # Resizing properties
-        self.resize_handle_size = 10
-        self.resizing = False
-        self.resize_handle = None  # Which handle is being dragged
-        self.resize_start_pos = None
-        self.resize_start_rect = None
+
+    @property
+    def resizing(self):
+        resize = FrameShape.active_resize
+        return resize is not None and resize.frame is self
     
     def paint(self, painter, option, widget):
-        # Draw semi-transparent background
-        if self.custom_bg_color:
-            bg_color = QColor(self.custom_bg_color)
-        else:
-            bg_color = QColor("#2a2a2a")
-        
-        bg_color.setAlpha(30)  # Very transparent
-        painter.setBrush(QBrush(bg_color))
-        
-        # Dashed border with adjustable width
-        if self.isSelected():
-            painter.setPen(QPen(Qt.GlobalColor.yellow, self.border_width, Qt.PenStyle.DashLine))
-        else:
-            border_color = self.custom_text_color if self.custom_text_color else QColor("#888888")
-            painter.setPen(QPen(border_color, self.border_width, Qt.PenStyle.DashLine))
+        # Semi-transparent background, dashed border with adjustable width
+        brush, pen = self.body_style()
+        painter.setBrush(brush)
+        painter.setPen(pen)
         
         painter.drawRect(self.rect())
         
-        # Draw label if enabled
-        if self.show_label:
-            text_color = self.custom_text_color if self.custom_text_color else QColor("#aaaaaa")
-            painter.setPen(text_color)
-            font = painter.font()
-            font.setPointSize(10)
-            font.setBold(True)
-            painter.setFont(font)
+        # Draw label if enabled and readable at this zoom
+        if self.show_label and level_of_detail(painter, option) >= LOD_FLAT:
+            painter.setPen(_text_pen(self.custom_text_color, FRAME_LABEL_COLOR))
+            painter.setFont(_font(10, True))
             
             # Draw label at top-left corner
             label_rect = QRectF(5, 5, self.rect().width() - 10, 25)
@@ -423,9 +490,9 @@ class FrameShape(TaskShape, QGraphicsRectItem):
         
         # Draw resize handles when selected
         if self.isSelected():
-            handle_color = QColor("#ffff00")
-            painter.setBrush(QBrush(handle_color))
-            painter.setPen(QPen(Qt.GlobalColor.black, 1))
+            handle_brush, handle_pen = _handle_style()
+            painter.setBrush(handle_brush)
+            painter.setPen(handle_pen)
             
             rect = self.rect()
             handles = self.get_resize_handles()
@@ -433,10 +500,26 @@ class FrameShape(TaskShape, QGraphicsRectItem):
             for handle_rect in handles.values():
                 painter.drawRect(handle_rect)
     
+    def body_style(self):
+        bg_rgba = self.custom_bg_color.rgba() if self.custom_bg_color else None
+        text_rgba = self.custom_text_color.rgba() if self.custom_text_color else None
+        key = ("frame", bg_rgba, text_rgba, self.border_width, self.isSelected())
+        style = _style_cache.get(key)
+        if style is None:
+            bg_color = QColor(self.custom_bg_color) if self.custom_bg_color else QColor("#2a2a2a")
+            bg_color.setAlpha(30)  # Very transparent
+            if self.isSelected():
+                pen = QPen(Qt.GlobalColor.yellow, self.border_width, Qt.PenStyle.DashLine)
+            else:
+                border_color = self.custom_text_color if self.custom_text_color else QColor("#888888")
+                pen = QPen(border_color, self.border_width, Qt.PenStyle.DashLine)
+            style = _style_cache[key] = (QBrush(bg_color), pen)
+        return style
+    
     def get_resize_handles(self):
         """Get the positions of resize handles"""
         rect = self.rect()
-        h = self.resize_handle_size
+        h = self.RESIZE_HANDLE_SIZE
         
         return {
             'top_left': QRectF(rect.left() - h/2, rect.top() - h/2, h, h),
@@ -464,11 +547,8 @@ class FrameShape(TaskShape, QGraphicsRectItem):
         if event.button() == Qt.MouseButton.LeftButton and self.isSelected():
             handle = self.get_handle_at_pos(event.pos())
             if handle:
-                self.resizing = True
-                self.resize_handle = handle
-                self.resize_start_pos = event.scenePos()
-                self.resize_start_rect = QRectF(self.rect())
-                self.resize_start_scene_pos = self.scenePos()
+                FrameShape.active_resize = FrameResize(self, handle, event.scenePos())
+                self.scene().begin_change("Resize Frame", [self])  # One undo step until the release
                 # Disable movement while resizing
                 self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, False)
                 event.accept()
@@ -477,23 +557,24 @@ class FrameShape(TaskShape, QGraphicsRectItem):
         super().mousePressEvent(event)
     
     def mouseMoveEvent(self, event):
-        if self.resizing and self.resize_handle:
+        if self.resizing:
+            resize = FrameShape.active_resize
             # Calculate delta in scene coordinates
-            delta = event.scenePos() - self.resize_start_pos
-            new_rect = QRectF(self.resize_start_rect)
-            new_pos = QPointF(self.resize_start_scene_pos)
+            delta = event.scenePos() - resize.start_pos
+            new_rect = QRectF(resize.start_rect)
+            new_pos = QPointF(resize.start_scene_pos)
             
             # Adjust rectangle based on which handle is being dragged
-            if 'left' in self.resize_handle:
-                new_rect.setLeft(self.resize_start_rect.left() + delta.x())
-                new_pos.setX(self.resize_start_scene_pos.x() + delta.x())
-            if 'right' in self.resize_handle:
-                new_rect.setRight(self.resize_start_rect.right() + delta.x())
-            if 'top' in self.resize_handle:
-                new_rect.setTop(self.resize_start_rect.top() + delta.y())
-                new_pos.setY(self.resize_start_scene_pos.y() + delta.y())
-            if 'bottom' in self.resize_handle:
-                new_rect.setBottom(self.resize_start_rect.bottom() + delta.y())
+            if 'left' in resize.handle:
+                new_rect.setLeft(resize.start_rect.left() + delta.x())
+                new_pos.setX(resize.start_scene_pos.x() + delta.x())
+            if 'right' in resize.handle:
+                new_rect.setRight(resize.start_rect.right() + delta.x())
+            if 'top' in resize.handle:
+                new_rect.setTop(resize.start_rect.top() + delta.y())
+                new_pos.setY(resize.start_scene_pos.y() + delta.y())
+            if 'bottom' in resize.handle:
+                new_rect.setBottom(resize.start_rect.bottom() + delta.y())
             
             # Normalize the rectangle to ensure positive width/height
             new_rect = new_rect.normalized()
@@ -504,9 +585,8 @@ class FrameShape(TaskShape, QGraphicsRectItem):
                 self.setPos(new_pos)
                 self.setRect(new_rect)
                 
-                # Update connections
-                for connection in self.connections:
-                    connection.update_position()
+                # Update connections and which shapes the frame now holds
+                self.scene().shape_resized(self)
                 
                 self.update()
             
@@ -517,13 +597,12 @@ class FrameShape(TaskShape, QGraphicsRectItem):
     
     def mouseReleaseEvent(self, event):
         if self.resizing:
-            self.resizing = False
-            self.resize_handle = None
-            self.resize_start_pos = None
-            self.resize_start_rect = None
-            self.resize_start_scene_pos = None
+            FrameShape.active_resize = None
             # Re-enable movement
             self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, True)
+            if self.scene():
+                self.scene().shape_changed(self)
+                self.scene().end_change()
             event.accept()
             return
         
@@ -576,29 +655,11 @@ class FrameShape(TaskShape, QGraphicsRectItem):
         ok_button.clicked.connect(dialog.accept)
         cancel_button.clicked.connect(dialog.reject)
         
-        if dialog.exec():
+        if dialog.exec() and self.scene():
+            scene = self.scene()
+            scene.begin_change("Edit Frame", [self])
             self.category = label_input.text()
             self.border_width = width_input.value()
             self.update()
-    
-    def get_edge_point(self, other_pos):
-        center = self.scenePos() + self.rect().center()
-        line = QLineF(center, other_pos)
-        polygon = QPolygonF(self.rect())
-        polygon.translate(self.scenePos())
-        
-        p1 = polygon.first()
-        for i in range(1, polygon.count()):
-            p2 = polygon.at(i)
-            poly_line = QLineF(p1, p2)
-            intersection_type, intersection_point = poly_line.intersects(line)
-            if intersection_type == QLineF.IntersectionType.BoundedIntersection:
-                return intersection_point
-            p1 = p2
-        # Close the loop
-        poly_line = QLineF(polygon.last(), polygon.first())
-        intersection_type, intersection_point = poly_line.intersects(line)
-        if intersection_type == QLineF.IntersectionType.BoundedIntersection:
-            return intersection_point
-            
-        return center
+            scene.shape_changed(self)
+            scene.end_change()
@@ -0,0 +1,92 @@
+"""Snapping shapes to a grid and to their neighbors' edges and centers.
+
+AlignmentIndex keeps the left edge, center and right edge of every shape
+in one sorted list, and the top edge, center and bottom edge in another,
+so the closest coordinate to line up with is a bisect away however large
+the board is. No Qt dependency.
+"""
+from bisect import bisect_left, insort
+
+GRID_SIZE = 20
+SNAP_DISTANCE = 8  # Pixels on screen within which a shape snaps
+REBUILD_FRACTION = 64  # Updating more than 1/64 of the shapes re-sorts everything at once
+
+
+def snap_to_grid(value, grid=GRID_SIZE):
+    return round(value / grid) * grid
+
+
+def _anchors(low, high):
+    return (low, (low + high) / 2, high)
+
+
+class AlignmentIndex:
+    def __init__(self):
+        self.boxes = {}  # key -> (x1, y1, x2, y2)
+        self.xs = []  # Sorted (x, key) of every left edge, center and right edge
+        self.ys = []  # Sorted (y, key) of every top edge, center and bottom edge
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def clear(self):
+        self.boxes.clear()
+        self.xs.clear()
+        self.ys.clear()
+
+    def insert(self, key, box):
+        """Add or move a box; keys must be orderable (the scene uses shape IDs)"""
+        self.remove(key)
+        self.boxes[key] = box
+        for x in _anchors(box[0], box[2]):
+            insort(self.xs, (x, key))
+        for y in _anchors(box[1], box[3]):
+            insort(self.ys, (y, key))
+
+    def remove(self, key):
+        box = self.boxes.pop(key, None)
+        if box is None:
+            return
+        for values, (low, high) in ((self.xs, (box[0], box[2])), (self.ys, (box[1], box[3]))):
+            for value in _anchors(low, high):
+                del values[bisect_left(values, (value, key))]
+
+    def update(self, boxes, removed=()):
+        """Insert or move many boxes ({key: box}) and remove others; re-sorts once when that is cheaper"""
+        if (len(boxes) + len(removed)) * REBUILD_FRACTION < len(self.boxes):
+            for key in removed:
+                self.remove(key)
+            for key, box in boxes.items():
+                self.insert(key, box)
+            return
+        for key in removed:
+            self.boxes.pop(key, None)
+        self.boxes.update(boxes)
+        self.xs = sorted((x, key) for key, box in self.boxes.items() for x in _anchors(box[0], box[2]))
+        self.ys = sorted((y, key) for key, box in self.boxes.items() for y in _anchors(box[1], box[3]))
+
+    def snap(self, box, distance, exclude=()):
+        """How far to move box to line up with another box within distance.
+
+        Returns ((dx, x, key), (dy, y, key)); either is None when nothing
+        is close enough on that axis. x and y are the guide's coordinate,
+        key the box lined up with. Keys in exclude are never lined up with.
+        """
+        return (self._nearest(self.xs, _anchors(box[0], box[2]), distance, exclude),
+                self._nearest(self.ys, _anchors(box[1], box[3]), distance, exclude))
+
+    def _nearest(self, values, anchors, distance, exclude):
+        best = None
+        for anchor in anchors:
+            # Walk outward from the anchor on both sides, past excluded keys
+            i = bisect_left(values, (anchor,))
+            for j, step in ((i, 1), (i - 1, -1)):
+                while 0 <= j < len(values):
+                    value, key = values[j]
+                    if abs(value - anchor) > distance or (best is not None and abs(value - anchor) >= abs(best[0])):
+                        break
+                    if key not in exclude:
+                        best = (value - anchor, value, key)
+                        break
+                    j += step
+        return best
@@ -0,0 +1,228 @@
+"""Tasks as plain records, apart from the graphics items that show them.
+
+On a virtual board (see TaskScene.update_viewport) every task lives in a
+TaskModel as a TaskRecord, and shape items exist only for the tasks near
+the viewport. Records hold what is saved, in the saved form, and use
+__slots__, so an off-screen task costs a few hundred bytes instead of a
+whole graphics item. No Qt dependency.
+"""
+import sys
+
+VIRTUALIZE_MIN = 20000  # Boards with at least this many tasks are opened virtual
+MODEL_CELL_SIZE = 1000  # Scene units per TaskModel cell
+
+# Size of each shape type as drawn by shapes.py; frames carry their own
+SHAPE_SIZES = {
+    "RectangleShape": (150, 80),
+    "CircleShape": (100, 100),
+    "DiamondShape": (120, 80),
+    "TriangleShape": (100, 100),
+    "FrameShape": (300, 200),
+}
+
+
+class TaskRecord:
+    __slots__ = ("uid", "type", "x", "y", "width", "height", "title", "category", "description_ref",
+                 "status", "custom_bg_color", "custom_text_color", "border_width")
+
+    def __init__(self, shape_data, uid=None):
+        """Build from a saved shape record (see TaskScene.shape_to_data), under uid if given"""
+        self.uid = shape_data["id"] if uid is None else uid
+        self.type = shape_data["type"]
+        self.width, self.height = SHAPE_SIZES[self.type]
+        self.border_width = None
+        self.set_data(shape_data)
+
+    def set_data(self, shape_data):
+        self.x = shape_data["x"]
+        self.y = shape_data["y"]
+        self.title = shape_data["title"]
+        # Few distinct categories and statuses, shared by many records
+        self.category = sys.intern(shape_data.get("category", "General"))
+        self.description_ref = shape_data.get("description_ref")
+        self.status = sys.intern(shape_data["status"])
+        self.custom_bg_color = shape_data.get("custom_bg_color")
+        self.custom_text_color = shape_data.get("custom_text_color")
+        if self.type == "FrameShape":
+            self.width = shape_data.get("width", self.width)
+            self.height = shape_data.get("height", self.height)
+            self.border_width = shape_data.get("border_width", self.border_width)
+
+    def box(self):
+        return (self.x, self.y, self.x + self.width, self.y + self.height)
+
+    def to_data(self):
+        shape_data = {
+            "id": self.uid,
+            "type": self.type,
+            "x": self.x,
+            "y": self.y,
+            "title": self.title,
+            "category": self.category,
+            "description_ref": self.description_ref,
+            "status": self.status,
+            "custom_bg_color": self.custom_bg_color,
+            "custom_text_color": self.custom_text_color
+        }
+        if self.type == "FrameShape":
+            shape_data["width"] = self.width
+            shape_data["height"] = self.height
+            if self.border_width is not None:
+                shape_data["border_width"] = self.border_width
+        return shape_data
+
+
+class TaskModel:
+    """Every task and connection of a board, found by area without any graphics items.
+
+    A record is filed under the cell of its top-left corner; the few
+    larger than a cell (big frames) are kept apart and checked on every
+    query.
+    """
+    def __init__(self, cell_size=MODEL_CELL_SIZE):
+        self.cell_size = cell_size
+        self.records = {}  # uid -> TaskRecord
+        self.connections = {}  # uid -> (start uid, end uid)
+        self.incident = {}  # shape uid -> [connection uids]
+        self.cells = {}  # (column, row) -> [uids of records with their top-left corner there]
+        self.large = set()  # uids of records wider or taller than a cell
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, record):
+        self.records[record.uid] = record
+        self._file(record)
+
+    def remove(self, uid):
+        """Drop a record and its connections; returns the IDs of those connections"""
+        record = self.records.pop(uid, None)
+        if record is None:
+            return []
+        self._unfile(record)
+        connections = list(self.incident.get(uid, ()))
+        for connection in connections:
+            self.remove_connection(connection)
+        self.incident.pop(uid, None)
+        return connections
+
+    def move(self, uid, x, y):
+        record = self.records.get(uid)
+        if record is None or (record.x == x and record.y == y):
+            return
+        self._unfile(record)
+        record.x, record.y = x, y
+        self._file(record)
+
+    def update(self, shape_data):
+        """Take over a shape's saved record, position and size included"""
+        record = self.records.get(shape_data["id"])
+        if record is None:
+            self.add(TaskRecord(shape_data))
+            return
+        self._unfile(record)
+        record.set_data(shape_data)
+        self._file(record)
+
+    def add_connection(self, uid, start, end):
+        self.connections[uid] = (start, end)
+        self.incident.setdefault(start, []).append(uid)
+        self.incident.setdefault(end, []).append(uid)
+
+    def remove_connection(self, uid):
+        ends = self.connections.pop(uid, None)
+        if ends is None:
+            return
+        for shape in set(ends):
+            connections = self.incident.get(shape)
+            if connections is not None and uid in connections:
+                connections.remove(uid)
+
+    def connections_of(self, uids):
+        """IDs of every connection touching one of the given shapes"""
+        found = set()
+        incident = self.incident
+        for uid in uids:
+            found.update(incident.get(uid, ()))
+        return found
+
+    def query(self, box):
+        """IDs of the records overlapping box"""
+        x1, y1, x2, y2 = box
+        records = self.records
+        found = []
+        for uid in self._candidates(box):
+            record = records[uid]
+            if record.x <= x2 and record.x + record.width >= x1 and record.y <= y2 and record.y + record.height >= y1:
+                found.append(uid)
+        return found
+
+    def count(self, box):
+        """Records filed around box; at least as many as query(box) would return, and far cheaper"""
+        return sum(len(self.cells.get(cell, ())) for cell in self._cells(box)) + len(self.large)
+
+    def bounds(self):
+        """(x1, y1, x2, y2) around every record, give or take a cell; None when empty"""
+        if not self.records:
+            return None
+        size = self.cell_size
+        boxes = [self.records[uid].box() for uid in self.large]
+        if self.cells:
+            columns = [cell[0] for cell in self.cells]
+            rows = [cell[1] for cell in self.cells]
+            boxes.append((min(columns) * size, min(rows) * size, (max(columns) + 2) * size, (max(rows) + 2) * size))
+        return (min(box[0] for box in boxes), min(box[1] for box in boxes),
+                max(box[2] for box in boxes), max(box[3] for box in boxes))
+
+    # Hooks for models that keep only part of the board in memory (see tiled_board.PagedModel)
+    def load_area(self, box):
+        """Make sure the records around box are in memory"""
+
+    def require(self, uids):
+        """Make sure the records of these IDs are in memory"""
+
+    def evict(self, pinned=()):
+        """Drop records not needed any more, never those in pinned"""
+
+    def density(self, box):
+        """(x1, y1, x2, y2, count) of every non-empty cell around box, for drawing an overview"""
+        size = self.cell_size
+        return [(column * size, row * size, (column + 1) * size, (row + 1) * size, len(self.cells[column, row]))
+                for column, row in self._cells(box) if (column, row) in self.cells]
+
+    def _candidates(self, box):
+        cells = self.cells
+        for cell in self._cells(box):
+            yield from cells.get(cell, ())
+        yield from self.large
+
+    def _cells(self, box):
+        # A small record overlapping box has its corner at most a cell above or left of it
+        size = self.cell_size
+        first_column, first_row = int((box[0] - size) // size), int((box[1] - size) // size)
+        last_column, last_row = int(box[2] // size), int(box[3] // size)
+        if (last_column - first_column + 1) * (last_row - first_row + 1) > len(self.cells):
+            # More cells in the box than filed anywhere, walk the filed ones instead
+            return [cell for cell in self.cells
+                    if first_column <= cell[0] <= last_column and first_row <= cell[1] <= last_row]
+        return [(column, row)
+                for column in range(first_column, last_column + 1)
+                for row in range(first_row, last_row + 1)]
+
+    def _file(self, record):
+        if record.width > self.cell_size or record.height > self.cell_size:
+            self.large.add(record.uid)
+            return
+        size = self.cell_size
+        self.cells.setdefault((int(record.x // size), int(record.y // size)), []).append(record.uid)
+
+    def _unfile(self, record):
+        if record.uid in self.large:
+            self.large.discard(record.uid)
+            return
+        size = self.cell_size
+        cell = (int(record.x // size), int(record.y // size))
+        uids = self.cells[cell]
+        uids.remove(record.uid)
+        if not uids:
+            del self.cells[cell]
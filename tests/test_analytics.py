@@ -0,0 +1,153 @@
+import random
+
+import pytest
+
+from analytics import DONE, DependencyAnalytics
+from graph import GraphIndex
+
+
+class Task:
+    def __init__(self, uid, status="Todo"):
+        self.uid = uid
+        self.status = status
+
+    def __repr__(self):
+        return "Task(%d)" % self.uid
+
+
+class Edge:
+    def __init__(self, start, end):
+        self.start_item = start
+        self.end_item = end
+
+
+class Board:
+    """A scene's registry and graph, reporting changes to the analytics as TaskScene does"""
+    def __init__(self):
+        self.shapes = {}
+        self.graph = GraphIndex()
+        self.analytics = DependencyAnalytics(self.graph, self.shapes)
+        self.analytics.ensure()
+
+    def add_shape(self, uid, status="Todo"):
+        shape = self.shapes[uid] = Task(uid, status)
+        self.analytics.shape_added(shape)
+        return shape
+
+    def connect(self, start, end):
+        edge = Edge(start, end)
+        if start is not end and self.graph.add(edge):
+            self.analytics.edge_added(edge)
+
+    def disconnect(self, edge):
+        self.graph.remove(edge)
+        self.analytics.edge_removed(edge)
+
+    def remove_shape(self, shape):
+        for edge in self.graph.remove_shapes([shape]):
+            self.analytics.edge_removed(edge)
+        del self.shapes[shape.uid]
+        self.analytics.shape_removed(shape)
+
+    def set_status(self, shape, status):
+        shape.status = status
+        self.analytics.status_changed(shape)
+
+    def edges(self):
+        return [edge for out_edges in self.graph.out_edges.values() for edge in out_edges.values()]
+
+
+def reaches(board, start, end, skip):
+    seen, stack = {start}, [start]
+    while stack:
+        for child, edge in board.graph.out_edges.get(stack.pop(), {}).items():
+            if edge in skip:
+                continue
+            if child is end:
+                return True
+            if child not in seen:
+                seen.add(child)
+                stack.append(child)
+    return False
+
+
+def check(board):
+    """The incrementally kept analytics against a rebuild from scratch"""
+    analytics = board.analytics
+    fresh = DependencyAnalytics(board.graph, board.shapes)
+    fresh.rebuild()
+    order = analytics.order
+    cycle_edges = analytics.cycle_edges
+
+    assert set(order) == set(board.shapes.values())
+    assert len(set(order.values())) == len(order)
+    for edge in board.edges():
+        if edge not in cycle_edges:
+            assert order[edge.start_item] < order[edge.end_item]
+    for edge in cycle_edges:
+        # Left out only while it really closes a cycle
+        assert reaches(board, edge.end_item, edge.start_item, cycle_edges)
+    if not fresh.cycle_edges:
+        assert not cycle_edges
+
+    assert set(analytics.blocked_shapes()) == set(fresh.blocked_shapes())
+    assert {shape: count for shape, count in analytics.unfinished.items()} == fresh.unfinished
+
+    # Longest unfinished chains over the edges the order keeps
+    lengths = {}
+    for shape in sorted(order, key=order.get):
+        parents = [lengths[parent] for parent, edge in board.graph.in_edges.get(shape, {}).items()
+                   if edge not in cycle_edges]
+        lengths[shape] = max(parents, default=0) + (0 if shape.status == DONE else 1)
+    assert analytics.length == lengths
+    if not fresh.cycle_edges:
+        assert analytics.length == fresh.length
+    path = analytics.critical_path()
+    assert sum(shape.status != DONE for shape in path) == max(lengths.values(), default=0)
+    for start, end in zip(path, path[1:]):
+        assert board.graph.find(start, end) is not None
+
+
+def test_chain_and_cycle():
+    board = Board()
+    a, b, c = (board.add_shape(uid) for uid in range(3))
+    board.connect(c, b)
+    board.connect(b, a)
+    board.connect(a, c)  # Closes a -> c -> b -> a
+    check(board)
+    assert len(board.analytics.cycles()) == 1
+    board.disconnect(board.graph.find(c, b))
+    check(board)
+    assert board.analytics.cycles() == []
+    assert board.analytics.topological_order() == [b, a, c]
+    assert board.analytics.critical_path() == [b, a, c]
+    board.set_status(b, DONE)
+    check(board)
+    assert board.analytics.blocked_shapes() == [c]
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_random_edits_match_a_rebuild(seed):
+    rng = random.Random(seed)
+    board = Board()
+    uids = iter(range(10 ** 6))
+    for _ in range(12):
+        board.add_shape(next(uids), rng.choice(("Todo", "In Progress", DONE)))
+    for step in range(300):
+        shapes = list(board.shapes.values())
+        action = rng.random()
+        if action < 0.45 and len(shapes) > 1:
+            # Mostly forward by ID so long chains form, sometimes backwards to close cycles
+            start, end = sorted(rng.sample(shapes, 2), key=lambda shape: shape.uid)
+            if rng.random() < 0.15:
+                start, end = end, start
+            board.connect(start, end)
+        elif action < 0.6 and board.edges():
+            board.disconnect(rng.choice(board.edges()))
+        elif action < 0.75:
+            board.set_status(rng.choice(shapes), rng.choice(("Todo", "In Progress", DONE)))
+        elif action < 0.85 or len(shapes) < 4:
+            board.add_shape(next(uids), rng.choice(("Todo", DONE)))
+        else:
+            board.remove_shape(rng.choice(shapes))
+        check(board)
@@ -0,0 +1,107 @@
+import pytest
+
+from board_format import (BINARY_EXTENSION, convert_board, decode_binary, detect_format, encode_binary,
+                          materialize_descriptions, read_board, write_board)
+from descriptions import description_key
+
+LONG_TEXT = "Steps to reproduce:\n" + "\u00e9tape " * 2000
+
+
+def board():
+    texts = ["short", LONG_TEXT]
+    shapes = []
+    for i in range(6):
+        shape_data = {"id": i * 2, "type": ("RectangleShape", "CircleShape", "DiamondShape", "TriangleShape")[i % 4],
+                      "x": i * 210.5, "y": -i * 80.25, "title": "Task %d" % i, "category": ("SQL", "General")[i % 2],
+                      "status": ("Todo", "In Progress", "Done")[i % 3],
+                      "custom_bg_color": "#336699" if i % 3 == 0 else None,
+                      "custom_text_color": "#ffffff" if i % 2 else None,
+                      "description_ref": description_key(texts[i % 2]) if i < 4 else None}
+        shapes.append(shape_data)
+    shapes.append({"id": 20, "type": "FrameShape", "x": -50.0, "y": -50.0, "title": "Frame", "category": "General",
+                   "status": "Todo", "custom_bg_color": None, "custom_text_color": None, "description_ref": None,
+                   "width": 900.0, "height": 400.0, "border_width": 3})
+    connections = [{"id": 30 + i, "start": i * 2, "end": i * 2 + 2} for i in range(5)]
+    return {"shapes": shapes, "connections": connections,
+            "descriptions": {description_key(text): text for text in texts}}
+
+
+def plain(data):
+    return materialize_descriptions(data)
+
+
+@pytest.mark.parametrize("name, compress", [("board.json", False), ("board.ssjb", False), ("board.ssjb", True)])
+def test_round_trip(tmp_path, name, compress):
+    data = board()
+    path = str(tmp_path / name)
+    write_board(data, path, compress=compress)
+    assert detect_format(path) == (name.endswith(BINARY_EXTENSION), compress)
+    assert plain(read_board(path)) == plain(data)
+
+
+def test_json_binary_json(tmp_path):
+    data = board()
+    write_board(data, str(tmp_path / "a.json"))
+    convert_board(str(tmp_path / "a.json"), str(tmp_path / "b.ssjb"), compress=True)
+    convert_board(str(tmp_path / "b.ssjb"), str(tmp_path / "c.json"))
+    assert (tmp_path / "a.json").read_bytes() == (tmp_path / "c.json").read_bytes()
+
+
+def test_binary_descriptions_are_read_lazily(tmp_path):
+    path = str(tmp_path / "board.ssjb")
+    write_board(board(), path)
+    descriptions = read_board(path)["descriptions"]
+    assert not isinstance(descriptions, dict)
+    assert descriptions.get(description_key(LONG_TEXT)) == LONG_TEXT
+    assert descriptions.get("0" * 40) is None
+
+
+def test_written_source_reads_the_new_file(tmp_path):
+    path = str(tmp_path / "board.ssjb")
+    source = write_board(board(), path)
+    assert source.get(description_key("short")) == "short"
+
+
+def test_inline_descriptions_of_older_files_are_split_out(tmp_path):
+    data = board()
+    legacy = dict(data, shapes=[dict(data["shapes"][0], description="inline text")], connections=[])
+    del legacy["descriptions"]
+    del legacy["shapes"][0]["description_ref"]
+    path = str(tmp_path / "board.ssjb")
+    write_board(legacy, path)
+    read = read_board(path)
+    key = read["shapes"][0]["description_ref"]
+    assert key == description_key("inline text")
+    assert read["descriptions"].get(key) == "inline text"
+
+
+def test_shapes_without_ids_keep_their_order(tmp_path):
+    data = board()
+    data["shapes"] = [{k: v for k, v in shape_data.items() if k != "id"} for shape_data in data["shapes"]]
+    path = str(tmp_path / "board.ssjb")
+    write_board(data, path)
+    assert [shape_data["title"] for shape_data in read_board(path)["shapes"]] == \
+        [shape_data["title"] for shape_data in data["shapes"]]
+
+
+def test_missing_description_text_is_an_error(tmp_path):
+    data = board()
+    data["descriptions"].pop(description_key("short"))
+    for name in ("board.json", "board.ssjb"):
+        with pytest.raises(ValueError):
+            write_board(data, str(tmp_path / name))
+
+
+@pytest.mark.parametrize("damage", [
+    lambda payload: payload[:len(payload) // 2],
+    lambda payload: payload[:40],
+    lambda payload: payload[:60] + bytes([0xff]) * 64 + payload[124:],
+])
+def test_corrupt_binary_raises_value_error(tmp_path, damage):
+    payload = encode_binary(board(), compress=False)
+    with pytest.raises(ValueError):
+        decode_binary(damage(payload))
+    path = tmp_path / "board.ssjb"
+    path.write_bytes(damage(payload))
+    with pytest.raises(ValueError):
+        read_board(str(path))
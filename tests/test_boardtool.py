@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+import boardtool
+from board_format import read_board
+from board_store import BoardStore
+from descriptions import description_key
+
+
+def shape(uid, **fields):
+    return dict({"id": uid, "type": "RectangleShape", "status": "Todo", "x": 0, "y": 0, "title": "T"}, **fields)
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_text(json.dumps(data))
+    return str(path)
+
+
+def test_validate_reports_problems(tmp_path):
+    path = write(tmp_path, "board.json", {
+        "shapes": [shape(0), shape(0), shape(1, type="Hexagon")],
+        "connections": [{"id": 2, "start": 0, "end": 7}]})
+    problems = boardtool.validate_board(path)["problems"]
+    assert "shape 1: duplicate id 0" in problems
+    assert "shape 2: unknown type 'Hexagon'" in problems
+    assert "connection 0: dangling end 7" in problems
+
+
+def test_validate_reports_malformed_records_per_file(tmp_path):
+    bad = write(tmp_path, "bad.json", {
+        "shapes": [shape(0), "x", shape([1])],
+        "connections": [{"id": 5, "start": [0], "end": 0}, {"id": 6, "start": 0, "end": 9}]})
+    good = write(tmp_path, "good.json", {"shapes": [shape(0)], "connections": []})
+    results = boardtool.map_files(boardtool.validate_board, [bad, good], 2)
+    problems = results[0]["problems"]
+    assert problems[0].startswith("shape 1: malformed record")
+    assert problems[1].startswith("shape 2: malformed record")
+    assert problems[2].startswith("connection 0: malformed record")
+    assert problems[3] == "connection 1: dangling end 9"
+    assert results[1]["problems"] == []
+
+
+def test_stats_reports_malformed_boards(tmp_path):
+    bad = write(tmp_path, "bad.json", {"shapes": ["x"], "connections": []})
+    good = write(tmp_path, "good.json", {"shapes": [shape(0), shape(1, status="Done")], "connections": []})
+    bad_stats, good_stats = boardtool.map_files(boardtool.board_stats, [bad, good], 2)
+    assert "error" in bad_stats
+    assert good_stats["shapes"] == 2
+    assert good_stats["status"] == {"Todo": 1, "Done": 1}
+
+
+def test_merge_renumbers_and_keeps_descriptions(tmp_path):
+    key = description_key("text")
+    a = write(tmp_path, "a.json", {"shapes": [shape(0, description_ref=key), shape(1)],
+                                   "connections": [{"id": 2, "start": 0, "end": 1}],
+                                   "descriptions": {key: "text"}})
+    b = write(tmp_path, "b.json", {"shapes": [shape(0)], "connections": []})
+    merged = boardtool.merge_boards([a, b], 2)
+    assert [shape_data["id"] for shape_data in merged["shapes"]] == [0, 1, 3]
+    assert merged["connections"] == [{"id": 2, "start": 0, "end": 1}]
+    assert merged["descriptions"] == {key: "text"}
+
+
+def test_merge_reports_unreadable_boards_and_missing_descriptions(tmp_path):
+    missing_text = write(tmp_path, "a.json", {"shapes": [shape(0, description_ref=description_key("gone"))],
+                                              "connections": [], "descriptions": {}})
+    with pytest.raises(ValueError) as error:
+        boardtool.merge_boards([missing_text, str(tmp_path / "missing.json")])
+    assert "a.json" in str(error.value)
+    assert "missing.json" in str(error.value)
+
+
+def test_merge_command_writes_nothing_on_error(tmp_path, capsys):
+    output = tmp_path / "merged.json"
+    good = write(tmp_path, "good.json", {"shapes": [shape(0)], "connections": []})
+    assert boardtool.main(["merge", good, str(tmp_path / "missing.json"), "-o", str(output)]) == 1
+    assert not output.exists()
+    assert boardtool.main(["merge", good, good, "-o", str(output)]) == 0
+    assert len(read_board(str(output))["shapes"]) == 2
+
+
+def test_query_reads_a_board_database(tmp_path, capsys):
+    database = str(tmp_path / "boards.sqlite")
+    store = BoardStore(database)
+    store.save_board("b", {"shapes": [shape(0), shape(1, status="Done")], "connections": [], "descriptions": {}})
+    store.close()
+    assert boardtool.main(["query", database, "--status", "Done", "--json"]) == 0
+    rows = json.loads(capsys.readouterr().out)
+    assert [(row["board"], row["id"]) for row in rows] == [("b", 1)]
+
+
+def test_query_does_not_create_a_missing_database(tmp_path):
+    database = tmp_path / "typo.sqlite"
+    with pytest.raises(SystemExit) as error:
+        boardtool.main(["query", str(database)])
+    assert "typo.sqlite" in str(error.value.code)
+    assert not database.exists()
+
+
+def test_convert_names_a_shape_of_unknown_type(tmp_path, capsys):
+    src = write(tmp_path, "board.json", {"shapes": [shape(0), shape(7, type="Hexagon")], "connections": []})
+    assert boardtool.main(["convert", src, str(tmp_path / "board.ssjb")]) == 1
+    assert "shape 7: unknown type 'Hexagon'" in capsys.readouterr().err
+    assert not (tmp_path / "board.ssjb").exists()
@@ -0,0 +1,81 @@
+import pytest
+
+from board_format import write_board
+from descriptions import DescriptionStore, description_key, required_text
+
+
+def test_identical_texts_share_one_entry():
+    store = DescriptionStore()
+    key = store.put("same text")
+    assert store.put("same text") == key == description_key("same text")
+    assert store.local == {key: "same text"}
+    assert store.put("") is None
+    assert store.get(None) == ""
+
+
+def test_texts_already_in_the_source_are_not_copied():
+    key = description_key("saved")
+    store = DescriptionStore()
+    store.reset({key: "saved"})
+    assert store.put("saved") == key
+    assert store.local == {}
+    assert store.get(key) == "saved"
+    assert store.get(description_key("unknown")) == ""
+
+
+def test_cache_of_source_texts_is_bounded():
+    texts = ["%d" % i * 100 for i in range(10)]
+    store = DescriptionStore(cache_bytes=250)
+    store.reset({description_key(text): text for text in texts})
+    for text in texts:
+        assert store.get(description_key(text)) == text
+    assert store._cache_size <= 250
+    assert list(store._cache) == [description_key(text) for text in texts[-2:]]
+
+
+def test_required_text():
+    assert required_text({"k": "text"}, "k") == "text"
+    with pytest.raises(ValueError):
+        required_text({}, "k")
+
+
+def test_rebind_to_the_saved_file(tmp_path):
+    old_key = description_key("loaded")
+    source = {old_key: "loaded"}
+    store = DescriptionStore()
+    store.reset(source)
+    saved_key = store.put("typed before saving")
+    data = {"shapes": [{"id": 0, "type": "RectangleShape", "status": "Todo", "x": 0, "y": 0, "title": "T",
+                        "description_ref": old_key},
+                       {"id": 1, "type": "RectangleShape", "status": "Todo", "x": 0, "y": 0, "title": "T",
+                        "description_ref": saved_key}],
+            "connections": [], "descriptions": store.snapshot()}
+    saved = write_board(data, str(tmp_path / "board.ssjb"))
+    newer_key = store.put("typed while saving")
+
+    assert not store.rebind(saved, {})  # Not the source the board reads from
+    assert store.rebind(saved, source)
+    assert store.source is saved
+    assert store.local == {newer_key: "typed while saving"}
+    assert store.get(old_key) == "loaded"
+    assert store.get(saved_key) == "typed before saving"
+
+
+def test_detach_copies_texts_out_of_the_source():
+    keys = [description_key(text) for text in ("a", "b")]
+    store = DescriptionStore()
+    store.reset(dict(zip(keys, ("a", "b"))))
+    store.detach(keys[:1])
+    assert store.source == {}
+    assert store.get(keys[0]) == "a"
+    assert store.get(keys[1]) == ""
+
+
+def test_snapshot_is_not_changed_by_later_edits():
+    store = DescriptionStore()
+    key = store.put("first")
+    snapshot = store.snapshot()
+    later = store.put("later")
+    assert snapshot.get(key) == "first"
+    assert later not in snapshot
+    assert snapshot.get(later, "default") == "default"
@@ -0,0 +1,63 @@
+from history import ChangeCommand, ItemsCommand, UndoHistory
+
+
+class Scene:
+    """Records what the commands ask of a TaskScene"""
+    def __init__(self):
+        self.calls = []
+
+    def apply_records(self, records):
+        self.calls.append(("apply", [record["title"] for record in records]))
+
+    def place_shapes(self, positions):
+        self.calls.append(("place", positions))
+
+    def delete_ids(self, ids):
+        self.calls.append(("delete", ids))
+
+    def restore_items(self, shapes, connections):
+        self.calls.append(("restore", [data["id"] for data in shapes + connections]))
+
+
+def change(label, old, new):
+    return ChangeCommand(label, {0: {"title": old}}, {0: {"title": new}}, {}, {})
+
+
+def test_undo_and_redo_in_order():
+    scene = Scene()
+    history = UndoHistory()
+    history.push(change("Edit", "a", "b"))
+    history.push(ItemsCommand("Add", [{"id": 1}], [{"id": 2}], True))
+    assert history.undo_label() == "Add"
+    assert history.undo(scene) == "Add"
+    assert history.undo(scene) == "Edit"
+    assert history.undo(scene) is None
+    assert scene.calls == [("delete", [2, 1]), ("apply", ["a"]), ("place", {})]
+    assert history.redo(scene) == "Edit"
+    assert history.redo_label() == "Add"
+
+
+def test_a_new_command_drops_what_could_be_redone():
+    history = UndoHistory()
+    history.push(change("First", "a", "b"))
+    history.push(change("Second", "b", "c"))
+    history.undo(Scene())
+    history.push(change("Third", "b", "d"))
+    assert not history.can_redo()
+    assert [command.label for command in history.undo_stack] == ["First", "Third"]
+    assert history.size == sum(command.size for command in history.undo_stack)
+
+
+def test_oldest_commands_go_past_the_budget():
+    command = change("Edit", "a", "b")
+    history = UndoHistory(budget=3 * command.size)
+    for i in range(5):
+        history.push(change("Edit %d" % i, "a", "b"))
+    assert [command.label for command in history.undo_stack] == ["Edit 2", "Edit 3", "Edit 4"]
+    assert history.size <= history.budget
+
+
+def test_newest_command_is_kept_over_budget():
+    history = UndoHistory(budget=1)
+    history.push(ItemsCommand("Delete", [{"id": i} for i in range(10)], [], False))
+    assert history.undo_label() == "Delete"
@@ -0,0 +1,127 @@
+import os
+from types import SimpleNamespace
+
+from board_format import write_board
+from descriptions import DescriptionStore, description_key
+from journal import EditJournal
+
+
+def shape(uid, **fields):
+    return dict({"id": uid, "type": "RectangleShape", "status": "Todo", "x": 0.0, "y": 0.0, "title": "T%d" % uid,
+                 "description_ref": None}, **fields)
+
+
+def board(count=3):
+    return {"shapes": [shape(i, x=i * 200.0) for i in range(count)],
+            "connections": [{"id": 100, "start": 0, "end": 1}], "descriptions": {}}
+
+
+def by_id(records):
+    return {record["id"]: record for record in records}
+
+
+def test_replay_applies_every_flushed_edit(tmp_path):
+    journal = EditJournal(str(tmp_path))
+    journal.reset(board())
+    key = description_key("new text")
+    journal.record_text(key, "new text")
+    journal.record_add(shape(3, description_ref=key))
+    journal.record_edit(shape(1, title="Renamed", status="Done"))
+    journal.record_move(SimpleNamespace(uid=0), 50.0, 60.0)
+    journal.record_move(SimpleNamespace(uid=0), 70.0, 80.0)  # Coalesced with the one before
+    journal.record_connect({"id": 101, "start": 1, "end": 3})
+    journal.record_delete_ids([2])
+    journal.flush()
+    assert not journal.needs_text(key)
+
+    data = journal.recover()
+    shapes = by_id(data["shapes"])
+    assert sorted(shapes) == [0, 1, 3]
+    assert (shapes[0]["x"], shapes[0]["y"]) == (70.0, 80.0)
+    assert (shapes[1]["title"], shapes[1]["status"]) == ("Renamed", "Done")
+    assert data["descriptions"] == {key: "new text"}
+    assert sorted(conn_data["id"] for conn_data in data["connections"]) == [100, 101]
+
+
+def test_unflushed_edits_are_not_replayed(tmp_path):
+    journal = EditJournal(str(tmp_path))
+    journal.reset(board())
+    journal.record_delete_ids([0])
+    data = journal.recover()
+    assert sorted(by_id(data["shapes"])) == [0, 1, 2]
+
+
+def test_deleting_a_shape_drops_its_connections(tmp_path):
+    journal = EditJournal(str(tmp_path))
+    journal.reset(board())
+    journal.record_delete_ids([1])
+    journal.flush()
+    assert journal.recover()["connections"] == []
+
+
+def test_deltas_folded_into_the_snapshot_are_skipped(tmp_path):
+    journal = EditJournal(str(tmp_path))
+    journal.reset(board())
+    journal.record_edit(shape(0, title="Once"))
+    journal.record_add(shape(7))
+    journal.flush()
+    with open(journal.journal_path) as f:
+        old_deltas = f.read()
+
+    # Crash after the new snapshot was written but before the journal was truncated
+    data = journal.recover()
+    data["shapes"] = [shape_data for shape_data in data["shapes"] if shape_data["id"] != 7]
+    journal.reset(data)
+    with open(journal.journal_path, "w") as f:
+        f.write(old_deltas)
+    assert 7 not in by_id(journal.recover()["shapes"])
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    journal = EditJournal(str(tmp_path))
+    journal.reset(board())
+    journal.record_edit(shape(0, title="Kept"))
+    journal.flush()
+    with open(journal.journal_path, "a") as f:
+        f.write('{"op": "edit", "shape": {"id": 1, "ti')
+    shapes = by_id(journal.recover()["shapes"])
+    assert shapes[0]["title"] == "Kept"
+    assert shapes[1]["title"] == "T1"
+
+
+def test_compaction_is_due_after_enough_deltas(tmp_path):
+    journal = EditJournal(str(tmp_path), compact_after=3)
+    journal.reset(board())
+    for i in range(3):
+        journal.record_edit(shape(0, title=str(i)))
+    assert journal.needs_compaction()
+    journal.reset(journal.recover())
+    assert not journal.needs_compaction()
+
+
+def test_texts_still_in_the_board_file_are_referenced_not_copied(tmp_path):
+    texts = ["saved text " * 100, "another"]
+    data = board()
+    data["shapes"][0]["description_ref"] = description_key(texts[0])
+    data["shapes"][1]["description_ref"] = description_key(texts[1])
+    data["descriptions"] = {description_key(text): text for text in texts}
+    path = str(tmp_path / "board.ssjb")
+    store = DescriptionStore()
+    store.reset(write_board(data, path))
+    local_key = store.put("typed during the session")
+
+    journal = EditJournal(str(tmp_path / "autosave"))
+    journal.reset(dict(data, descriptions=store.snapshot()))
+    assert os.path.getsize(journal.snapshot_path) < len(texts[0])
+    journal.record_edit(shape(2, description_ref=local_key))
+    journal.flush()
+
+    recovered = journal.recover()
+    assert recovered["descriptions"] == {description_key(texts[0]): texts[0], description_key(texts[1]): texts[1],
+                                         local_key: "typed during the session"}
+
+    # Best effort once the file is gone: references to texts that cannot be read are dropped
+    os.remove(path)
+    shapes = by_id(journal.recover()["shapes"])
+    assert shapes[0]["description_ref"] is None
+    assert shapes[2]["description_ref"] == local_key
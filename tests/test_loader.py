@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+
+def load(qapp, filename):
+    """Run a BoardLoader to the end; (outcome, message, scene)"""
+    from PyQt6.QtCore import QEventLoop
+    from canvas import TaskScene
+    scene = TaskScene()
+    loader = scene.load_from_file_async(filename)
+    outcome = []
+    loop = QEventLoop()
+    loader.finished.connect(lambda: outcome.append(("finished", None)))
+    loader.failed.connect(lambda message: outcome.append(("failed", message)))
+    for signal in (loader.finished, loader.failed):
+        signal.connect(loop.quit)
+    loop.exec()
+    return outcome[0] + (scene,)
+
+
+def write(tmp_path, data):
+    path = tmp_path / "board.json"
+    path.write_text(json.dumps(data))
+    return str(path)
+
+
+def test_loads_shapes_and_connections(qapp, tmp_path):
+    shapes = [{"id": i, "type": "RectangleShape", "x": i * 200, "y": 0, "title": "T%d" % i, "status": "Todo"}
+              for i in range(3)]
+    connections = [{"id": 3, "start": 0, "end": 1}, {"id": 4, "start": 1, "end": 9}]
+    outcome, message, scene = load(qapp, write(tmp_path, {"shapes": shapes, "connections": connections}))
+    assert outcome == "finished"
+    assert sorted(scene.shapes_by_id) == [0, 1, 2]
+    assert list(scene.connections_by_id) == [3]  # The dangling one is dropped
+
+
+@pytest.mark.parametrize("data", [
+    {"shapes": ["x"], "connections": []},
+    {"shapes": [{"id": 0, "type": "RectangleShape", "x": 0, "y": 0}], "connections": [{"id": 1, "end": 0}]},
+    {"shapes": [], "connections": ["x"]},
+])
+def test_malformed_records_fail_instead_of_crashing(qapp, tmp_path, data):
+    outcome, message, scene = load(qapp, write(tmp_path, data))
+    assert outcome == "failed"
+    assert "board.json" in message
+
+
+def test_missing_file_fails(qapp, tmp_path):
+    outcome, message, scene = load(qapp, str(tmp_path / "missing.json"))
+    assert outcome == "failed"
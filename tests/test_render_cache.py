@@ -0,0 +1,75 @@
+from render_cache import RenderCache, zoom_bucket
+
+
+class Image:
+    """Stands in for a QPixmap: only its size counts"""
+    def __init__(self, width, height):
+        self._width = width
+        self._height = height
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    def depth(self):
+        return 32
+
+
+def test_least_recently_used_is_evicted_first():
+    cache = RenderCache(budget_bytes=3 * 400)  # Three 10x10 images
+    for item in "abc":
+        cache.put((item, 1.0, 0), Image(10, 10))
+    assert cache.get(("a", 1.0, 0)) is not None  # a is now the most recent
+    cache.put(("d", 1.0, 0), Image(10, 10))
+    assert cache.get(("b", 1.0, 0)) is None
+    assert all(cache.get((item, 1.0, 0)) is not None for item in "acd")
+    assert cache.size_bytes == 3 * 400
+    assert cache.evictions == 1
+
+
+def test_replacing_an_entry_keeps_the_size_right():
+    cache = RenderCache(budget_bytes=10000)
+    cache.put(("a", 1.0, 0), Image(10, 10))
+    cache.put(("a", 1.0, 0), Image(20, 10))
+    assert cache.size_bytes == 800
+    assert cache.stats()["entries"] == 1
+
+
+def test_invalidate_drops_every_zoom_of_an_item():
+    cache = RenderCache()
+    for scale in (0.5, 1.0, 2.0):
+        cache.put(("a", scale, 0), Image(10, 10))
+    cache.put(("b", 1.0, 0), Image(10, 10))
+    cache.invalidate("a")
+    assert cache.get(("a", 1.0, 0)) is None
+    assert cache.get(("b", 1.0, 0)) is not None
+    assert cache.size_bytes == 400
+    cache.invalidate("a")  # Nothing left to drop
+
+
+def test_images_over_budget_are_not_kept():
+    cache = RenderCache(budget_bytes=100)
+    cache.put(("a", 1.0, 0), Image(10, 10))
+    assert cache.get(("a", 1.0, 0)) is None
+    assert cache.size_bytes == 0
+
+
+def test_stats_count_hits_and_misses():
+    cache = RenderCache()
+    cache.put(("a", 1.0, 0), Image(1, 1))
+    cache.get(("a", 1.0, 0))
+    cache.get(("b", 1.0, 0))
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+    cache.reset_stats()
+    assert cache.stats()["hits"] == 0
+
+
+def test_zoom_bucket_rounds_up_to_half_octaves():
+    assert zoom_bucket(1.0) == 1.0
+    assert zoom_bucket(1.1) == 2 ** 0.5
+    assert zoom_bucket(0.3) == 2 ** -1.5
+    for scale in (0.07, 0.3, 0.9, 1.7, 3.2):
+        assert scale <= zoom_bucket(scale) < scale * 2 ** 0.5
@@ -0,0 +1,80 @@
+import random
+
+from routing import MARGIN, BoxIndex, grow, route, route_edge
+
+
+def overlaps(a, b):
+    return a[0] <= b[2] and a[2] >= b[0] and a[1] <= b[3] and a[3] >= b[1]
+
+
+def segments(points):
+    for (x1, y1), (x2, y2) in zip(points, points[1:]):
+        yield (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+
+def crosses(points, box):
+    """Whether a path runs through the inside of box"""
+    return any(s[0] < box[2] and s[2] > box[0] and s[1] < box[3] and s[3] > box[1] for s in segments(points))
+
+
+def orthogonal(points):
+    return all(x1 == x2 or y1 == y2 for (x1, y1), (x2, y2) in zip(points, points[1:]))
+
+
+def test_box_index_query_matches_a_scan():
+    rng = random.Random(1)
+    index = BoxIndex(cell_size=100)
+    boxes = {}
+    for step in range(2000):
+        key = rng.randrange(200)
+        if rng.random() < 0.2:
+            index.remove(key)
+            boxes.pop(key, None)
+            continue
+        x, y = rng.uniform(-1000, 1000), rng.uniform(-1000, 1000)
+        boxes[key] = (x, y, x + rng.uniform(0, 300), y + rng.uniform(0, 300))
+        index.insert(key, boxes[key])
+    assert len(index) == len(boxes)
+    for _ in range(200):
+        x, y = rng.uniform(-1200, 1200), rng.uniform(-1200, 1200)
+        area = (x, y, x + rng.uniform(0, 500), y + rng.uniform(0, 500))
+        assert index.query(area) == {key for key, box in boxes.items() if overlaps(box, area)}
+    index.clear()
+    assert not index.cells
+
+
+def test_straight_and_l_shaped_without_obstacles():
+    assert route((0, 0), (500, 0), [], (-100, -100, 600, 100)) == [(0, 0), (500, 0)]
+    points = route((0, 0), (500, 200), [], (-100, -100, 600, 300))
+    assert points == [(0, 0), (500, 0), (500, 200)]
+
+
+def test_route_goes_around_obstacles():
+    wall = (200, -300, 300, 300)
+    points = route((0, 0), (500, 0), [wall], (-500, -500, 1000, 500))
+    assert points[0] == (0, 0) and points[-1] == (500, 0)
+    assert orthogonal(points)
+    assert not crosses(points, grow(wall, MARGIN))
+
+
+def test_no_route_out_of_an_enclosure():
+    walls = [(-200, -200, 200, -100), (-200, 100, 200, 200), (-200, -200, -100, 200), (100, -200, 200, 200)]
+    assert route((0, 0), (500, 0), walls, (-300, -300, 600, 300)) is None
+
+
+def test_route_edge_only_avoids_what_it_runs_into():
+    rng = random.Random(2)
+    obstacles = BoxIndex()
+    for key in range(300):
+        x, y = rng.uniform(-3000, 3000), rng.uniform(-3000, 3000)
+        obstacles.insert(key, (x, y, x + 120, y + 80))
+    obstacles.insert("start", (-2500, -20, -2380, 60))
+    obstacles.insert("end", (2380, -20, 2500, 60))
+    obstacles.insert("wall", (-100, -600, 100, 600))
+    points, area = route_edge(obstacles, obstacles.get("start"), obstacles.get("end"), skip={"start", "end"})
+    assert points is not None and orthogonal(points)
+    assert points[0] == (-2440, 20) and points[-1] == (2440, 20)
+    for key, box in obstacles.boxes.items():
+        if key not in ("start", "end"):
+            assert not crosses(points, box), key
+    assert all(area[0] <= x <= area[2] and area[1] <= y <= area[3] for x, y in points)
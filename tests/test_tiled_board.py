@@ -0,0 +1,96 @@
+from board_format import materialize_descriptions
+from descriptions import description_key
+from tiled_board import PagedModel, TiledBoard, read_tiled, write_tiled
+
+PAGE = 1000
+
+
+def board(columns=6, rows=4):
+    """A grid of tasks four to a page, each connected to its right neighbour"""
+    shapes, connections = [], []
+    texts = {}
+    for row in range(rows):
+        for column in range(columns):
+            uid = row * columns + column
+            text = "Task %d notes" % uid
+            texts[description_key(text)] = text
+            shapes.append({"id": uid, "type": "RectangleShape", "x": column * PAGE / 2.0, "y": row * PAGE / 2.0,
+                           "title": "T%d" % uid, "category": "General", "status": "Todo",
+                           "custom_bg_color": None, "custom_text_color": None,
+                           "description_ref": description_key(text)})
+            if column:
+                connections.append({"id": 1000 + uid, "start": uid - 1, "end": uid})
+    return {"shapes": shapes, "connections": connections, "descriptions": texts}
+
+
+def records(data):
+    return {shape_data["id"]: shape_data for shape_data in data["shapes"]}
+
+
+def open_model(path, memory_cap=10 ** 9):
+    return PagedModel(TiledBoard(path), memory_cap)
+
+
+def test_round_trip(tmp_path):
+    data = board()
+    path = str(tmp_path / "board.ssjt")
+    write_tiled(data, path, PAGE)
+    tiled = TiledBoard(path)
+    assert len(tiled.pages) == 6
+    assert sum(entry["count"] for entry in tiled.pages.values()) == 24
+    assert read_tiled(path) == materialize_descriptions(data)
+
+
+def test_pages_are_read_as_needed_and_edits_saved(tmp_path):
+    path = str(tmp_path / "board.ssjt")
+    write_tiled(board(), path, PAGE)
+    model = open_model(path)
+    model.load_area((0, 0, 10, 10))
+    assert sorted(model.records) == [0, 1, 6, 7]
+    model.require([23])
+    assert 23 in model.records
+
+    model.move(0, 2600.0, 1600.0)  # Into the page of task 23
+    model.remove(7)
+    assert model.dirty == {(0, 0), (1, 0), (2, 1)}  # (1, 0) also stored the connection from 7 to 8
+    model.save(model.source, model.board.next_uid)
+    assert not model.dirty
+
+    saved = records(read_tiled(path))
+    assert (saved[0]["x"], saved[0]["y"]) == (2600.0, 1600.0)
+    assert 7 not in saved
+    assert TiledBoard(path).page_of(0) == (2, 1)
+    assert all(conn_data["start"] != 7 and conn_data["end"] != 7 for conn_data in read_tiled(path)["connections"])
+
+
+def test_dirty_pages_are_not_evicted(tmp_path):
+    path = str(tmp_path / "board.ssjt")
+    write_tiled(board(), path, PAGE)
+    model = open_model(path, memory_cap=0)
+    model.load_area((0, 0, 10, 10))
+    model.move(1, 100.0, 100.0)
+    model.load_area((2600, 1600, 2610, 1610))
+    model.evict()
+    model.evict()  # Pages asked for by the last load_area are kept through one evict
+    assert list(model.loaded) == [(0, 0)]
+    assert model.records[1].x == 100.0
+
+
+def test_saving_elsewhere_moves_the_model_to_the_new_file(tmp_path):
+    old, new = str(tmp_path / "old.ssjt"), str(tmp_path / "new.ssjt")
+    write_tiled(board(), old, PAGE)
+    model = open_model(old)
+    model.load_area((0, 0, 10, 10))
+    model.move(0, 50.0, 60.0)
+
+    data = model.board_data(model.source)
+    write_tiled(data, new, model.board.page_size)
+    model.rebind(TiledBoard(new))
+    assert model.board.filename == new
+    assert not model.dirty and not model.moved and not model.deleted
+    assert model.source.get(description_key("Task 1 notes")) == "Task 1 notes"
+
+    model.move(1, 70.0, 80.0)
+    model.save(model.source, model.board.next_uid)
+    assert records(read_tiled(new))[1]["x"] == 70.0
+    assert records(read_tiled(old))[1]["x"] == 500.0
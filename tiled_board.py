@@ -0,0 +1,454 @@
+"""Tiled boards: one board split by scene region into pages on disk.
+
+    board.ssjt          the page index (JSON)
+    board.ssjt.pages/   one compressed binary board (see board_format) per page
+
+A page holds the shapes whose top-left corner lies in its square of the
+scene, and every connection touching one of them, so a connection
+between two pages is stored in both. The index lists each page's file,
+shape count, bounds and shape IDs, which is all that is needed to decide
+what to read without opening any page.
+
+PagedModel is a TaskModel (see task_model.py) over a tiled board that
+only holds some of its pages: the scene faults pages in as the viewport
+approaches them and the least recently used clean pages are evicted
+once the loaded records outgrow the memory cap. Edited pages stay in
+memory until save writes them back. No Qt dependency.
+"""
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+import json
+import os
+
+from board_format import atomic_write, encode_binary, read_binary, split_descriptions
+from task_model import TaskModel, TaskRecord
+
+TILED_EXTENSION = ".ssjt"
+PAGES_SUFFIX = ".pages"
+TILED_FORMAT = "ssjt"
+TILED_VERSION = 1
+PAGE_SIZE = 4000  # Scene units per side of a page
+MEMORY_CAP = 256 * 1024 * 1024  # Bytes of loaded records before clean pages are evicted
+RECORD_BYTES = 600  # Rough memory per loaded task, its connections included
+
+
+def is_tiled_board(filename):
+    return filename.lower().endswith(TILED_EXTENSION)
+
+
+def page_key(x, y, page_size=PAGE_SIZE):
+    return (int(x // page_size), int(y // page_size))
+
+
+def _page_file(key):
+    return "page_%d_%d.ssjb" % key
+
+
+def _overlaps(a, b):
+    return a[0] <= b[2] and a[2] >= b[0] and a[1] <= b[3] and a[3] >= b[1]
+
+
+def _bounds(shapes):
+    """(x1, y1, x2, y2) around saved shape records"""
+    boxes = [TaskRecord(shape_data).box() for shape_data in shapes]
+    return [min(box[0] for box in boxes), min(box[1] for box in boxes),
+            max(box[2] for box in boxes), max(box[3] for box in boxes)]
+
+
+def write_tiled(data, filename, page_size=PAGE_SIZE):
+    """Write a whole board (as read by board_format.read_board) as a tiled board"""
+    data = split_descriptions(data)
+    shapes = {}
+    for index, shape_data in enumerate(data["shapes"]):
+        shape_data = dict(shape_data)
+        shape_data.setdefault("id", index)
+        shapes[shape_data["id"]] = shape_data
+    next_uid = max(list(shapes) + [c["id"] for c in data["connections"] if "id" in c] + [-1]) + 1
+
+    pages = {}
+    for uid in sorted(shapes):
+        key = page_key(shapes[uid]["x"], shapes[uid]["y"], page_size)
+        pages.setdefault(key, {"shapes": [], "connections": []})["shapes"].append(shapes[uid])
+    for conn_data in data["connections"]:
+        if conn_data["start"] not in shapes or conn_data["end"] not in shapes:
+            continue
+        if "id" not in conn_data:
+            conn_data = dict(conn_data, id=next_uid)
+            next_uid += 1
+        keys = {page_key(shapes[uid]["x"], shapes[uid]["y"], page_size) for uid in (conn_data["start"], conn_data["end"])}
+        for key in keys:
+            pages[key]["connections"].append(conn_data)
+
+    board = TiledBoard.create(filename, page_size)
+    board.write({key: dict(page, descriptions=data["descriptions"]) for key, page in pages.items()}, next_uid)
+
+
+def read_tiled(filename):
+    """A whole tiled board as one board dictionary, for tools; descriptions are read eagerly"""
+    board = TiledBoard(filename)
+    shapes, connections, descriptions = [], {}, {}
+    for key in sorted(board.pages):
+        data = board.read_page(key)
+        shapes.extend(data["shapes"])
+        for conn_data in data["connections"]:
+            connections[conn_data["id"]] = conn_data
+        source = data.get("descriptions", {})
+        for shape_data in data["shapes"]:
+            ref = shape_data.get("description_ref")
+            if ref and ref not in descriptions:
+                descriptions[ref] = source.get(ref, "")
+    shapes.sort(key=lambda shape_data: shape_data["id"])
+    return {"shapes": shapes, "connections": [connections[uid] for uid in sorted(connections)],
+            "descriptions": descriptions}
+
+
+class TiledBoard:
+    """The index and page files of a tiled board on disk"""
+    def __init__(self, filename, index=None):
+        self.filename = filename
+        self.directory = filename + PAGES_SUFFIX
+        if index is None:
+            with open(filename, 'r') as f:
+                index = json.load(f)
+        if index.get("format") != TILED_FORMAT or index.get("version", 0) > TILED_VERSION:
+            raise ValueError("Not a tiled board, or one saved by a newer version")
+        self.page_size = index["page_size"]
+        self.next_uid = index["next_uid"]
+        self.pages = {}  # (column, row) -> {"file", "count", "bounds", "ids"}
+        for entry in index["pages"]:
+            key = (entry["column"], entry["row"])
+            self.pages[key] = {"file": entry["file"], "count": entry["count"],
+                               "bounds": tuple(entry["bounds"]), "ids": array('q', entry["ids"])}
+        self._index_ids()
+
+    @classmethod
+    def create(cls, filename, page_size=PAGE_SIZE):
+        """An empty tiled board, replacing whatever was at filename once written"""
+        return cls(filename, {"format": TILED_FORMAT, "version": TILED_VERSION, "page_size": page_size,
+                              "next_uid": 0, "pages": []})
+
+    def page_of(self, uid):
+        """Key of the page a shape was saved in, None if it is in none"""
+        i = bisect_left(self._ids, uid)
+        if i < len(self._ids) and self._ids[i] == uid:
+            return self._keys[self._id_pages[i]]
+        return None
+
+    def pages_in(self, box):
+        return [key for key, entry in self.pages.items() if _overlaps(entry["bounds"], box)]
+
+    def read_page(self, key):
+        return read_binary(os.path.join(self.directory, self.pages[key]["file"]))
+
+    def write(self, pages, next_uid):
+        """Write pages ({key: board data}, empty ones removed) and then the index.
+
+        Every page is encoded before any file is replaced, as descriptions
+        may still have to be read from the old files.
+        """
+        payloads = {key: encode_binary(data, compress=True) if data["shapes"] else None
+                    for key, data in pages.items()}
+        os.makedirs(self.directory, exist_ok=True)
+        for key, payload in payloads.items():
+            if payload is None:
+                entry = self.pages.pop(key, None)
+                if entry is not None and os.path.exists(os.path.join(self.directory, entry["file"])):
+                    os.remove(os.path.join(self.directory, entry["file"]))
+                continue
+            shapes = pages[key]["shapes"]
+            self.pages[key] = {"file": _page_file(key), "count": len(shapes), "bounds": tuple(_bounds(shapes)),
+                               "ids": array('q', sorted(shape_data["id"] for shape_data in shapes))}
+            atomic_write(os.path.join(self.directory, _page_file(key)), payload)
+        self.next_uid = next_uid
+        index = {
+            "format": TILED_FORMAT,
+            "version": TILED_VERSION,
+            "page_size": self.page_size,
+            "next_uid": next_uid,
+            "pages": [{"column": key[0], "row": key[1], "file": entry["file"], "count": entry["count"],
+                       "bounds": list(entry["bounds"]), "ids": entry["ids"].tolist()}
+                      for key, entry in sorted(self.pages.items())],
+        }
+        atomic_write(self.filename, json.dumps(index).encode("utf-8"))
+        self._index_ids()
+
+    def _index_ids(self):
+        # Every saved shape ID, sorted, with the number of its page alongside
+        self._keys = sorted(self.pages)
+        pairs = sorted((uid, number) for number, key in enumerate(self._keys) for uid in self.pages[key]["ids"])
+        self._ids = array('q', (uid for uid, _ in pairs))
+        self._id_pages = array('I', (number for _, number in pairs))
+
+
+class PageDescriptions:
+    """Description source over the files of the pages a PagedModel has loaded"""
+    def __init__(self, model):
+        self.model = model
+
+    def get(self, key, default=None):
+        for source in self.model.descriptions.values():
+            if key in source:
+                return source.get(key, default)
+        return default
+
+    def __contains__(self, key):
+        return any(key in source for source in self.model.descriptions.values())
+
+
+class PagedModel(TaskModel):
+    """A TaskModel holding only the pages of a tiled board that are in use.
+
+    load_area and require fault pages in, evict drops the least recently
+    used clean ones once more than memory_cap bytes' worth of records
+    are loaded. Edits mark pages dirty; dirty pages are never evicted,
+    and save writes them back. deleted remembers what was removed since
+    the last save, so pages read again do not bring it back.
+    """
+    def __init__(self, board, memory_cap=MEMORY_CAP):
+        super().__init__()
+        self.board = board
+        self.memory_cap = memory_cap
+        self.loaded = OrderedDict()  # page key -> IDs of its loaded shapes, least recently used first
+        self.page_of = {}  # Loaded shape ID -> page key
+        self.moved = {}  # Shape ID -> page key, for shapes in another page than the index says
+        self.dirty = set()  # Keys of pages changed since the last save
+        self.deleted = set()  # Shape and connection IDs removed since the last save
+        self.descriptions = {}  # Page key -> description source of its file
+        self.source = PageDescriptions(self)
+        self._in_use = set()  # Pages asked for by load_area since the last evict, never evicted by it
+
+    def load_area(self, box):
+        """Read in every page around box; they are kept through the next evict"""
+        keys = set(self.board.pages_in(box))
+        size = self.board.page_size
+        keys.update(key for key in self.loaded
+                    if _overlaps((key[0] * size, key[1] * size, (key[0] + 1) * size, (key[1] + 1) * size), box))
+        self._in_use.update(keys)
+        for key in keys:
+            self._load(key)
+
+    def require(self, uids):
+        for uid in uids:
+            if uid not in self.records and uid not in self.deleted:
+                key = self._locate(uid)
+                if key is not None:
+                    self._load(key)
+
+    def evict(self, pinned=()):
+        """Drop least recently used clean pages until the loaded records fit memory_cap"""
+        pinned_pages = {self.page_of[uid] for uid in pinned if uid in self.page_of}
+        for key in list(self.loaded):
+            if len(self.records) * RECORD_BYTES <= self.memory_cap:
+                break
+            if key not in self.dirty and key not in pinned_pages and key not in self._in_use:
+                self._unload(key)
+        self._in_use = set()
+
+    def count(self, box):
+        outside = sum(entry["count"] for key, entry in self.board.pages.items()
+                      if key not in self.loaded and _overlaps(entry["bounds"], box))
+        return super().count(box) + outside
+
+    def density(self, box):
+        # Pages not in memory are shaded as a whole, at their average density per cell
+        size = self.board.page_size
+        cells_per_page = (size / self.cell_size) ** 2
+        cells = super().density(box)
+        for key, entry in self.board.pages.items():
+            if key not in self.loaded and _overlaps(entry["bounds"], box):
+                cells.append((key[0] * size, key[1] * size, (key[0] + 1) * size, (key[1] + 1) * size,
+                              entry["count"] / cells_per_page))
+        return cells
+
+    def bounds(self):
+        boxes = [entry["bounds"] for entry in self.board.pages.values()]
+        loaded = super().bounds()
+        if loaded is not None:
+            boxes.append(loaded)
+        if not boxes:
+            return None
+        return (min(box[0] for box in boxes), min(box[1] for box in boxes),
+                max(box[2] for box in boxes), max(box[3] for box in boxes))
+
+    def add(self, record):
+        key = page_key(record.x, record.y, self.board.page_size)
+        self._load(key)
+        super().add(record)
+        self._place(record.uid, key)
+        self.deleted.discard(record.uid)
+
+    def move(self, uid, x, y):
+        super().move(uid, x, y)
+        self._refile(uid)
+
+    def update(self, shape_data):
+        super().update(shape_data)
+        self._refile(shape_data["id"])
+
+    def remove(self, uid):
+        key = self.page_of.get(uid)
+        connections = super().remove(uid)
+        if key is not None:
+            self.loaded[key].discard(uid)
+            self.dirty.add(key)
+        self.page_of.pop(uid, None)
+        self.moved.pop(uid, None)
+        self.deleted.add(uid)
+        return connections
+
+    def add_connection(self, uid, start, end):
+        super().add_connection(uid, start, end)
+        self._touch(start, end)
+        self.deleted.discard(uid)
+
+    def remove_connection(self, uid):
+        ends = self.connections.get(uid)
+        super().remove_connection(uid)
+        if ends is not None:
+            self._touch(*ends)
+            self.deleted.add(uid)
+
+    def board_data(self, descriptions):
+        """Every shape and connection, loaded or not, as one board for export.
+
+        descriptions is the source of texts for loaded shapes; the texts of
+        all shapes are returned in a plain dict.
+        """
+        shapes = {uid: record.to_data() for uid, record in self.records.items()}
+        connections = dict(self.connections)
+        texts = {}
+        for shape_data in shapes.values():
+            ref = shape_data["description_ref"]
+            if ref and ref not in texts:
+                texts[ref] = descriptions.get(ref, "")
+        for key in self.board.pages:
+            if key in self.loaded:
+                continue
+            data = self.board.read_page(key)
+            source = data.get("descriptions", {})
+            for shape_data in data["shapes"]:
+                uid = shape_data["id"]
+                if uid in shapes or uid in self.deleted or self._locate(uid) != key:
+                    continue
+                shapes[uid] = shape_data
+                ref = shape_data.get("description_ref")
+                if ref and ref not in texts:
+                    texts[ref] = source.get(ref, "")
+            for conn_data in data["connections"]:
+                if conn_data["id"] not in self.deleted:
+                    connections.setdefault(conn_data["id"], (conn_data["start"], conn_data["end"]))
+        return {
+            "shapes": [shapes[uid] for uid in sorted(shapes)],
+            "connections": [{"id": uid, "start": connections[uid][0], "end": connections[uid][1]}
+                            for uid in sorted(connections)],
+            "descriptions": texts
+        }
+
+    def save(self, descriptions, next_uid):
+        """Write the dirty pages and the index back; descriptions is the source of description texts"""
+        for key in list(self.dirty):
+            self._load(key)  # Changed only through a connection to one of its shapes
+        pages = {}
+        for key in self.dirty:
+            uids = sorted(self.loaded[key])
+            connections = sorted(self.connections_of(uids))
+            pages[key] = {
+                "shapes": [self.records[uid].to_data() for uid in uids],
+                "connections": [{"id": uid, "start": self.connections[uid][0], "end": self.connections[uid][1]}
+                                for uid in connections],
+                "descriptions": descriptions,
+            }
+        self.board.write(pages, next_uid)
+        for key in pages:
+            # Texts moved between the rewritten files; empty pages are gone
+            self.descriptions.pop(key, None)
+            if key in self.board.pages:
+                self.descriptions[key] = self.board.read_page(key).get("descriptions", {})
+        self.dirty.clear()
+        self.deleted.clear()
+        self.moved.clear()
+
+    def rebind(self, board):
+        """Carry on with board, just written whole from this model (see write_tiled); nothing is left unsaved"""
+        self.board = board
+        self.descriptions = {key: board.read_page(key).get("descriptions", {})
+                             for key in self.loaded if key in board.pages}
+        self.dirty.clear()
+        self.deleted.clear()
+        self.moved.clear()
+
+    def _locate(self, uid):
+        key = self.page_of.get(uid)
+        if key is None:
+            key = self.moved.get(uid)
+        if key is None:
+            key = self.board.page_of(uid)
+        return key
+
+    def _load(self, key):
+        if key in self.loaded:
+            self.loaded.move_to_end(key)
+            return
+        self.loaded[key] = set()
+        if key not in self.board.pages:
+            return  # A page nothing was saved in yet
+        data = self.board.read_page(key)
+        self.descriptions[key] = data.get("descriptions", {})
+        for shape_data in data["shapes"]:
+            uid = shape_data["id"]
+            # Skip what was removed or has moved on to another page since the last save
+            if uid in self.deleted or uid in self.records or self.moved.get(uid, key) != key:
+                continue
+            TaskModel.add(self, TaskRecord(shape_data))
+            self.page_of[uid] = key
+            self.loaded[key].add(uid)
+        for conn_data in data["connections"]:
+            uid = conn_data["id"]
+            if uid in self.deleted:
+                continue
+            ends = self.connections.setdefault(uid, (conn_data["start"], conn_data["end"]))
+            for shape in set(ends):
+                incident = self.incident.setdefault(shape, []) if shape in self.records else None
+                if incident is not None and uid not in incident:
+                    incident.append(uid)
+
+    def _unload(self, key):
+        uids = self.loaded.pop(key)
+        self.descriptions.pop(key, None)
+        for uid in uids:
+            for connection in list(self.incident.get(uid, ())):
+                start, end = self.connections[connection]
+                other = end if start == uid else start
+                if other in uids or other not in self.records:
+                    TaskModel.remove_connection(self, connection)
+            self.incident.pop(uid, None)
+            self._unfile(self.records.pop(uid))
+            del self.page_of[uid]
+
+    def _place(self, uid, key):
+        self.page_of[uid] = key
+        self.loaded[key].add(uid)
+        self.dirty.add(key)
+        if self.board.page_of(uid) != key:
+            self.moved[uid] = key
+        else:
+            self.moved.pop(uid, None)
+
+    def _refile(self, uid):
+        record = self.records.get(uid)
+        old = self.page_of.get(uid)
+        if record is None or old is None:
+            return
+        key = page_key(record.x, record.y, self.board.page_size)
+        self.dirty.add(old)
+        if key != old:
+            self.loaded[old].discard(uid)
+            self._load(key)
+            self._place(uid, key)
+
+    def _touch(self, *uids):
+        for uid in uids:
+            key = self._locate(uid)
+            if key is not None:
+                self.dirty.add(key)